@@ -27,11 +27,64 @@ class Settings(BaseSettings):
     MYSQL_USER_LOCAL: Optional[str] = None
     MYSQL_PASSWORD_LOCAL: Optional[str] = None
     
+    # 数据库连接池（同步引擎和异步引擎各自使用一个同样配置的连接池）
+    DB_POOL_SIZE: int = 10  # 连接池大小
+    DB_MAX_OVERFLOW: int = 20  # 最大溢出连接数
+    DB_POOL_TIMEOUT: int = 30  # 获取连接的等待时间（秒）
+    DB_POOL_RECYCLE: int = 3600  # 连接回收时间（秒）
+    
+    # 绿色金融支持项目目录缓存有效期（秒），目录由脚本离线更新，过期后自动重新加载
+    GREEN_CATEGORY_CACHE_TTL_SECONDS: int = 300
+    
+    # 机构层级树缓存有效期（秒），系统管理中新增机构时立即失效，脚本修改机构后过期自动重新加载
+    ORG_TREE_CACHE_TTL_SECONDS: int = 300
+    
+    # 已认证用户缓存：有效期（秒）和最大缓存用户数，修改/禁用/删除用户时立即失效
+    USER_CACHE_TTL_SECONDS: int = 30
+    USER_CACHE_MAXSIZE: int = 1024
+    
+    # 任务详情缓存：有效期（秒）和最大缓存条数，任务流转、认定或附件变更提交后立即失效
+    TASK_DETAIL_CACHE_TTL_SECONDS: int = 30
+    TASK_DETAIL_CACHE_MAXSIZE: int = 1024
+    
+    # 同步接口线程池大小：数据库相关接口都是同步函数，由 FastAPI 放到该线程池执行
+    THREADPOOL_WORKERS: int = 40
+    
+    # 登录线程池：同时执行的登录数（bcrypt 校验）和最大排队数，超过排队数时返回 503
+    LOGIN_WORKER_THREADS: int = 4
+    LOGIN_MAX_PENDING: int = 64
+    
+    # 速率限制存储：memory 为进程内存储（每个 worker 各自计数），
+    # shared 为同一主机上多个 worker 共享的内存映射文件（限额对整台主机生效）
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_SHARED_PATH: str = "/dev/shm/gfms_rate_limit"  # 共享存储文件路径
+    RATE_LIMIT_SHARED_SLOTS: int = 65536  # 共享存储槽位数（每个槽位 24 字节）
+    # 每个 IP 每分钟的请求限额（压测时可通过环境变量调高，见 tests/load_test.py）
+    RATE_LIMIT_LOGIN_PER_MINUTE: int = 5  # 登录接口
+    RATE_LIMIT_API_PER_MINUTE: int = 100  # 其他 API 接口
+    
+    # SQL 查询预算：单个请求中同一形状的 SQL 执行超过该次数时记录告警（0 表示不检查）
+    QUERY_BUDGET_WARN_REPEATS: int = 0
+    
+    # /metrics 性能指标：列表中的地址（如 Prometheus 抓取端）可免登录访问，其他请求需要管理员令牌
+    METRICS_ALLOWED_IPS: list = []
+    
+    # 日志批量写入队列
+    LOG_SINK_QUEUE_SIZE: int = 10000  # 队列容量
+    LOG_SINK_BATCH_SIZE: int = 200  # 每批最多写入条数
+    LOG_SINK_FLUSH_INTERVAL: float = 1.0  # 最长攒批时间（秒）
+    LOG_SINK_OVERFLOW_POLICY: str = "block"  # 队列满时的策略：block、drop_oldest、drop_new
+    LOG_SINK_PUT_TIMEOUT: float = 1.0  # block 策略下最长等待时间（秒），超时丢弃
+    
+    # 后台导出任务
+    EXPORT_DIR: str = "exports"  # 导出文件目录（不能放在 /uploads 静态目录下，只能通过导出任务的下载接口鉴权下载）
+    EXPORT_JOB_WORKERS: int = 2  # 同时执行的导出任务数
+    EXPORT_JOB_RETENTION_SECONDS: int = 86400  # 导出文件保留时间（秒）
+    
     # CORS
     CORS_ORIGINS: list = ["http://localhost:5173", "http://localhost:3000", "http://localhost:8082"]
     
-    @property
-    def DATABASE_URL(self) -> str:
+    def _database_url(self, driver: str) -> str:
         # 如果设置了本地环境变量，优先使用本地配置
         if self.IS_DOCKER == False and self.MYSQL_HOST_LOCAL:
             host = self.MYSQL_HOST_LOCAL
@@ -44,7 +97,16 @@ class Settings(BaseSettings):
             user = self.MYSQL_USER
             password = self.MYSQL_PASSWORD
         
-        return f"mysql+pymysql://{user}:{password}@{host}:{port}/{self.MYSQL_DATABASE}"
+        return f"mysql+{driver}://{user}:{password}@{host}:{port}/{self.MYSQL_DATABASE}"
+    
+    @property
+    def DATABASE_URL(self) -> str:
+        return self._database_url("pymysql")
+    
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        """异步引擎使用的连接地址（aiomysql 驱动）"""
+        return self._database_url("aiomysql")
     
     class Config:
         env_file = ".env"
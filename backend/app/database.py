@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
@@ -12,10 +13,11 @@ logger = logging.getLogger(__name__)
 engine = create_engine(
     settings.DATABASE_URL,
     poolclass=QueuePool,
-    pool_size=10,  # 连接池大小
-    max_overflow=20,  # 最大溢出连接数
+    pool_size=settings.DB_POOL_SIZE,  # 连接池大小
+    max_overflow=settings.DB_MAX_OVERFLOW,  # 最大溢出连接数
+    pool_timeout=settings.DB_POOL_TIMEOUT,  # 获取连接的等待时间（秒）
     pool_pre_ping=True,  # 连接前检查连接是否有效
-    pool_recycle=3600,  # 连接回收时间（秒）
+    pool_recycle=settings.DB_POOL_RECYCLE,  # 连接回收时间（秒）
     echo=False,  # 生产环境关闭SQL日志
     connect_args={
         "charset": "utf8mb4",
@@ -27,6 +29,29 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 创建异步数据库引擎（连接池配置与同步引擎相同），供高频只读接口使用，
+# 数据库 I/O 期间不占用线程，单个 worker 可以同时处理大量进行中的查询
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    echo=False,
+    connect_args={
+        "charset": "utf8mb4",
+        "connect_timeout": 10,
+    }
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
 
@@ -46,6 +71,19 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """
+    获取异步数据库会话
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception as e:
+            logger.error(f"Database error: {e}")
+            await db.rollback()
+            raise
+
+
 def test_connection():
     """
     测试数据库连接
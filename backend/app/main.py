@@ -1,10 +1,20 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from fastapi.staticfiles import StaticFiles
+from sqlalchemy.orm import Session
+from typing import Optional
 from app.config import settings
-from app.database import engine, Base
+from app.database import engine, async_engine, Base, get_db
 from app.routers import auth, green_finance, system, workflow, workflow_variables, files, log, announcement
 from app.scheduler import start_scheduler, stop_scheduler
+from app.services.export_jobs import export_job_manager
+from app.services.login_executor import login_executor
+from app.services.log_sink import log_sink
+from app.services.auth import get_current_principal
+from app.services.metrics import request_metrics
+import anyio
 import atexit
 import logging
 import os
@@ -48,6 +58,10 @@ from app.middleware.rate_limit import RateLimitMiddleware, BlockUnsafeMethodsMid
 app.add_middleware(RateLimitMiddleware)
 app.add_middleware(BlockUnsafeMethodsMiddleware)
 
+# 添加请求性能指标中间件（最后添加即最外层，统计包含其他中间件在内的完整耗时）
+from app.middleware.metrics import MetricsMiddleware
+app.add_middleware(MetricsMiddleware)
+
 # 注册路由
 app.include_router(auth.router)
 app.include_router(green_finance.router)
@@ -77,10 +91,32 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
+    db: Session = Depends(get_db)
+):
+    """请求性能指标（Prometheus 文本格式）
+
+    METRICS_ALLOWED_IPS 中的地址（如 Prometheus 抓取端）可直接访问，其他请求需要管理员令牌
+    """
+    client_ip = request.client.host if request.client else None
+    if client_ip not in settings.METRICS_ALLOWED_IPS:
+        if credentials is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+        if not get_current_principal(credentials, db).is_superuser:
+            raise HTTPException(status_code=403, detail="无权访问")
+    return PlainTextResponse(request_metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.on_event("startup")
 async def startup_event():
     """应用启动事件"""
     logger.info("应用启动中...")
+    # 设置同步接口线程池大小（默认 40）
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_WORKERS
+    await log_sink.start()
     start_scheduler()
     logger.info("应用启动完成")
 
@@ -90,6 +126,10 @@ async def shutdown_event():
     """应用关闭事件"""
     logger.info("应用关闭中...")
     stop_scheduler()
+    export_job_manager.shutdown()
+    login_executor.shutdown()
+    await log_sink.stop()
+    await async_engine.dispose()
     logger.info("应用关闭完成")
 
 
@@ -2,15 +2,18 @@
 日志记录中间件
 """
 from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import re
+import time
 
-from app.utils.logger import record_operation_log
+from app.models.log import OperationLog
+from app.services.log_sink import log_sink
+from app.utils.logger import operation_log_values
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """日志记录中间件"""
+class LoggingMiddleware:
+    """日志记录中间件（纯 ASGI 实现，不包装响应流，响应发送完成后再记录日志）"""
     
     # 不需要记录日志的路径
     EXCLUDE_PATHS = [
@@ -39,6 +42,9 @@ class LoggingMiddleware(BaseHTTPMiddleware):
         '/api/files': '文件管理',
     }
     
+    # 需要记录日志的请求方法
+    LOG_METHODS = ('POST', 'PUT', 'DELETE', 'PATCH')
+    
     # HTTP方法到操作类型的映射
     OPERATION_TYPE_MAP = {
         'GET': '查询',
@@ -48,18 +54,34 @@ class LoggingMiddleware(BaseHTTPMiddleware):
         'PATCH': '更新'
     }
     
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """处理请求并记录日志"""
-        # 获取响应
-        response = await call_next(request)
+        # 只记录修改操作 (POST, PUT, DELETE, PATCH)，其他请求直接放行
+        if scope["type"] != "http" or scope["method"] not in self.LOG_METHODS:
+            await self.app(scope, receive, send)
+            return
         
-        # 检查是否需要记录日志
-        if self.should_log(request, response):
-            await self.log_request(request, response)
+        status_code = None
+        start_time = time.perf_counter()
         
-        return response
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        await self.app(scope, receive, send_with_status)
+        request_duration = time.perf_counter() - start_time
+        
+        # 检查是否需要记录日志
+        request = Request(scope)
+        if status_code is not None and self.should_log(request, status_code):
+            await self.log_request(request, status_code, request_duration)
     
-    def should_log(self, request: Request, response) -> bool:
+    def should_log(self, request: Request, status_code: int) -> bool:
         """判断是否需要记录日志"""
         # 检查是否在排除列表中
         for exclude_path in self.EXCLUDE_PATHS:
@@ -67,7 +89,7 @@ class LoggingMiddleware(BaseHTTPMiddleware):
                 return False
         
         # 只记录成功的请求
-        if response.status_code >= 400:
+        if status_code >= 400:
             return False
         
         # 只记录需要认证的请求
@@ -76,51 +98,55 @@ class LoggingMiddleware(BaseHTTPMiddleware):
             return False
         
         # 只记录修改操作 (POST, PUT, DELETE, PATCH)
-        if request.method not in ['POST', 'PUT', 'DELETE', 'PATCH']:
+        if request.method not in self.LOG_METHODS:
             return False
         
         return True
     
-    async def log_request(self, request: Request, response):
-        """记录请求日志"""
+    async def log_request(self, request: Request, status_code: int, request_duration: float = None):
+        """记录请求日志
+
+        用户信息优先取自用户缓存，日志放入日志写入队列批量写入，请求不等待数据库
+        """
+        from fastapi.security import HTTPBearer
+        from app.services.auth import peek_cached_user
+        security = HTTPBearer()
+        
+        try:
+            credentials = await security(request)
+            cached = peek_cached_user(credentials)
+            if cached is not None:
+                if not cached.is_active:
+                    return
+                user_account = cached.values["username"]
+                user_name = cached.values["real_name"]
+            else:
+                user = await run_in_threadpool(self.load_user, credentials)
+                user_account = user.username
+                user_name = user.real_name
+        except Exception:
+            return
+        
+        # 记录操作日志
+        await log_sink.put(OperationLog, operation_log_values(
+            user_account=user_account,
+            user_name=user_name or user_account,
+            operation_menu=self.get_operation_menu(request.url.path),
+            request_method=request.method,
+            request_url=str(request.url),
+            ip_address=request.client.host if hasattr(request, 'client') else None,
+            user_agent=request.headers.get('user-agent', None),
+            status_code=status_code,
+            request_duration=request_duration
+        ))
+    
+    def load_user(self, credentials):
+        """用户缓存未命中时查询数据库校验令牌"""
+        from app.database import SessionLocal
+        from app.services.auth import verify_token
+        db = SessionLocal()
         try:
-            # 从请求状态中获取数据库会话
-            from app.database import get_db
-            db = next(get_db())
-            
-            # 从token中获取用户信息
-            from app.services.auth import verify_token
-            from fastapi.security import HTTPBearer
-            security = HTTPBearer()
-            
-            try:
-                credentials = await security(request)
-                user = verify_token(credentials, db)
-            except:
-                return
-            
-            # 获取操作信息
-            operation_type = self.OPERATION_TYPE_MAP.get(request.method, request.method)
-            operation_menu = self.get_operation_menu(request.url.path)
-            operation_desc = self.get_operation_desc(request)
-            
-            # 记录操作日志
-            record_operation_log(
-                db=db,
-                user_id=user.id,
-                user_account=user.username,
-                user_name=user.real_name or user.username,
-                operation_menu=operation_menu,
-                operation_desc=operation_desc,
-                request_method=request.method,
-                request_url=str(request.url),
-                ip_address=request.client.host if hasattr(request, 'client') else None,
-                user_agent=request.headers.get('user-agent', None),
-                status_code=response.status_code
-            )
-            
-        except Exception as e:
-            print(f"记录操作日志失败: {e}")
+            return verify_token(credentials, db)
         finally:
             db.close()
     
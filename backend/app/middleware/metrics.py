@@ -0,0 +1,69 @@
+"""
+请求性能指标中间件
+统计每个请求的耗时、SQL 语句数及耗时、响应大小，按路由模板汇总（见 app.services.metrics），
+并在响应头中添加 Server-Timing，便于在浏览器开发者工具中直接查看；
+配置了 QUERY_BUDGET_WARN_REPEATS 时同时检查查询预算，发现 N+1 查询时记录告警
+"""
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.services.metrics import RequestStats, current_request_stats, request_metrics
+from app.services.query_budget import QueryBudget
+
+# 未匹配到路由（404、静态文件等）的请求统一归到该标签下，避免按原始路径产生大量指标
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def get_route_template(scope: Scope) -> str:
+    """获取请求匹配到的路由模板（如 /api/tasks/{task_id}）"""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return path if path else UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """请求性能指标中间件（纯 ASGI 实现，应放在最外层以覆盖其他中间件的耗时）"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        budget = None
+        if settings.QUERY_BUDGET_WARN_REPEATS > 0:
+            budget = QueryBudget(max_repeats=settings.QUERY_BUDGET_WARN_REPEATS, on_exceed="warn")
+            budget.start()
+        status_code = 500
+        response_size = 0
+
+        async def send_with_timing(message: Message):
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'app;dur={stats.elapsed * 1000:.1f}, '
+                    f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.sql_count} queries"'
+                )
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request_stats.reset(token)
+            route = get_route_template(scope)
+            request_metrics.record(scope["method"], route, status_code, stats, response_size)
+            if budget is not None:
+                budget.stop()
+                budget.name = f"{scope['method']} {route}"
+                budget.check()
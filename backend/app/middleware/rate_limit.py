@@ -3,29 +3,52 @@
 用于防止暴力破解攻击
 """
 
-from fastapi import Request, HTTPException, status
+from fastapi import status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from typing import Dict
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Callable
+import math
 import time
-from collections import defaultdict
-import threading
+
+from app.config import settings
+from app.middleware.rate_limit_backend import MemoryRateLimitBackend, create_rate_limit_backend
 
 class RateLimiter:
-    """简单的内存速率限制器"""
+    """令牌桶速率限制器
+
+    桶容量为 max_requests，令牌按 max_requests / window_seconds 的速度匀速补充，
+    即最多突发 max_requests 次，之后每 window_seconds / max_requests 秒允许一次。
+    令牌桶状态保存在存储后端中（每个限制键只保存令牌数和更新时间），
+    不同限制器通过 name 区分，可以共用一个存储后端
+    """
     
-    def __init__(self, max_requests: int = 5, window_seconds: int = 60):
+    def __init__(
+        self,
+        max_requests: int = 5,
+        window_seconds: int = 60,
+        name: str = "default",
+        backend=None,
+        clock: Callable[[], float] = time.monotonic
+    ):
         """
         初始化速率限制器
         
         Args:
             max_requests: 时间窗口内最大请求数
             window_seconds: 时间窗口（秒）
+            name: 限制器名称（存储后端中的键前缀）
+            backend: 存储后端，默认为进程内存储
+            clock: 时钟函数（单调递增，单位秒）
         """
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self.requests: Dict[str, list] = defaultdict(list)
-        self.lock = threading.Lock()
+        self.name = name
+        self.backend = backend if backend is not None else MemoryRateLimitBackend()
+        self._clock = clock
+    
+    def _key(self, key: str) -> str:
+        return f"{self.name}:{key}"
     
     def is_allowed(self, key: str) -> bool:
         """
@@ -37,27 +60,23 @@ class RateLimiter:
         Returns:
             bool: 是否允许请求
         """
-        current_time = time.time()
+        return self.backend.acquire(self._key(key), self.max_requests, self.window_seconds, self._clock())
+    
+    def get_remaining(self, key: str) -> int:
+        """
+        获取当前还允许的请求数
         
-        with self.lock:
-            # 获取该键的请求记录
-            request_times = self.requests[key]
-            
-            # 移除超出时间窗口的请求
-            request_times = [t for t in request_times if current_time - t < self.window_seconds]
-            self.requests[key] = request_times
-            
-            # 检查请求数量
-            if len(request_times) >= self.max_requests:
-                return False
+        Args:
+            key: 限制键
             
-            # 记录当前请求
-            request_times.append(current_time)
-            return True
+        Returns:
+            int: 剩余请求数
+        """
+        return int(self.backend.get_tokens(self._key(key), self.max_requests, self.window_seconds, self._clock()))
     
     def get_remaining_time(self, key: str) -> int:
         """
-        获取剩余限制时间（秒）
+        获取剩余限制时间（秒），即距离下一次允许请求的时间
         
         Args:
             key: 限制键
@@ -65,98 +84,116 @@ class RateLimiter:
         Returns:
             int: 剩余秒数
         """
-        current_time = time.time()
-        
-        with self.lock:
-            request_times = self.requests[key]
-            
-            if not request_times:
-                return 0
-            
-            # 找到最早的有效请求时间
-            earliest_time = request_times[0]
-            remaining_time = int(self.window_seconds - (current_time - earliest_time))
-            
-            return max(0, remaining_time)
+        tokens = self.backend.get_tokens(self._key(key), self.max_requests, self.window_seconds, self._clock())
+        if tokens >= 1:
+            return 0
+        return math.ceil((1 - tokens) * self.window_seconds / self.max_requests)
+
 
+# 速率限制存储（由 RATE_LIMIT_BACKEND 配置，shared 时多个 worker 进程共享限额）
+rate_limit_backend = create_rate_limit_backend()
 
 # 创建速率限制器实例
-# 登录接口：5 次/分钟
-login_rate_limiter = RateLimiter(max_requests=5, window_seconds=60)
+# 登录接口：默认 5 次/分钟
+login_rate_limiter = RateLimiter(
+    max_requests=settings.RATE_LIMIT_LOGIN_PER_MINUTE, window_seconds=60, name="login", backend=rate_limit_backend
+)
 
-# 通用 API 接口：100 次/分钟
-api_rate_limiter = RateLimiter(max_requests=100, window_seconds=60)
+# 通用 API 接口：默认 100 次/分钟
+api_rate_limiter = RateLimiter(
+    max_requests=settings.RATE_LIMIT_API_PER_MINUTE, window_seconds=60, name="api", backend=rate_limit_backend
+)
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """速率限制中间件"""
+class RateLimitMiddleware:
+    """速率限制中间件（纯 ASGI 实现，不包装响应流）"""
     
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """
         对登录接口和 API 接口实施速率限制
         """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
         # 获取客户端 IP
-        client_ip = request.client.host if request.client else "unknown"
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
+        path = scope["path"]
+        is_login = "/api/auth/login" in path
         
         # 检查是否是登录接口
-        if "/api/auth/login" in request.url.path:
+        if is_login:
             if not login_rate_limiter.is_allowed(client_ip):
                 remaining_time = login_rate_limiter.get_remaining_time(client_ip)
-                return JSONResponse(
+                response = JSONResponse(
                     status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                     content={
                         "detail": "登录尝试次数过多，请稍后再试",
                         "retry_after": remaining_time
                     }
                 )
+                await response(scope, receive, send)
+                return
         
         # 检查是否是 API 接口
-        elif request.url.path.startswith("/api/"):
+        elif path.startswith("/api/"):
             if not api_rate_limiter.is_allowed(client_ip):
                 remaining_time = api_rate_limiter.get_remaining_time(client_ip)
-                return JSONResponse(
+                response = JSONResponse(
                     status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                     content={
                         "detail": "请求频率过高，请稍后再试",
                         "retry_after": remaining_time
                     }
                 )
+                await response(scope, receive, send)
+                return
         
-        # 继续处理请求
-        response = await call_next(request)
+        if not is_login:
+            await self.app(scope, receive, send)
+            return
         
-        # 添加速率限制相关的响应头
-        if "/api/auth/login" in request.url.path:
-            remaining = login_rate_limiter.get_remaining_time(client_ip)
-            if remaining > 0:
-                response.headers["X-RateLimit-Limit"] = str(login_rate_limiter.max_requests)
-                response.headers["X-RateLimit-Remaining"] = "0"
-                response.headers["X-RateLimit-Reset"] = str(int(time.time()) + remaining)
-            else:
-                with login_rate_limiter.lock:
-                    request_times = login_rate_limiter.requests[client_ip]
-                    response.headers["X-RateLimit-Limit"] = str(login_rate_limiter.max_requests)
-                    response.headers["X-RateLimit-Remaining"] = str(max(0, login_rate_limiter.max_requests - len(request_times)))
-                    response.headers["X-RateLimit-Reset"] = str(int(time.time()) + login_rate_limiter.window_seconds)
+        async def send_with_headers(message: Message):
+            # 添加速率限制相关的响应头
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                remaining = login_rate_limiter.get_remaining(client_ip)
+                headers["X-RateLimit-Limit"] = str(login_rate_limiter.max_requests)
+                headers["X-RateLimit-Remaining"] = str(remaining)
+                if remaining > 0:
+                    headers["X-RateLimit-Reset"] = str(int(time.time()) + login_rate_limiter.window_seconds)
+                else:
+                    headers["X-RateLimit-Reset"] = str(int(time.time()) + login_rate_limiter.get_remaining_time(client_ip))
+            await send(message)
         
-        return response
+        # 继续处理请求
+        await self.app(scope, receive, send_with_headers)
 
 
-class BlockUnsafeMethodsMiddleware(BaseHTTPMiddleware):
-    """阻止不安全的 HTTP 方法"""
+class BlockUnsafeMethodsMiddleware:
+    """阻止不安全的 HTTP 方法（纯 ASGI 实现）"""
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
     
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """
         禁用 TRACE 方法（OPTIONS 用于 CORS 预检，由 CORS 中间件处理）
         """
         # 禁用 TRACE 方法（可能泄露敏感信息）
-        if request.method.upper() == "TRACE":
-            return JSONResponse(
+        if scope["type"] == "http" and scope["method"].upper() == "TRACE":
+            response = JSONResponse(
                 status_code=status.HTTP_405_METHOD_NOT_ALLOWED,
                 content={
-                    "detail": f"Method '{request.method}' not allowed"
+                    "detail": f"Method '{scope['method']}' not allowed"
                 }
             )
+            await response(scope, receive, send)
+            return
         
         # 继续处理请求
-        return await call_next(request)
\ No newline at end of file
+        await self.app(scope, receive, send)
@@ -0,0 +1,221 @@
+"""
+速率限制状态存储
+令牌桶的状态（令牌数、更新时间）保存在存储后端中，限流算法见 rate_limit.RateLimiter：
+- MemoryRateLimitBackend：进程内存储（默认），多个 worker 进程各自计数
+- SharedMemoryRateLimitBackend：同一主机上多个 worker 进程共享的内存映射文件，限额对整台主机生效
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import List, Tuple
+
+from app.config import settings
+
+
+def refill_tokens(tokens: float, updated_at: float, now: float, capacity: int, window_seconds: float) -> float:
+    """计算补充后的令牌数（先乘后除，整数秒的补充量没有浮点误差）
+
+    其他线程/进程可能在本次取时间之后、加锁之前更新过令牌桶，此时 now 早于 updated_at，不补充令牌
+    """
+    refill = max(0.0, now - updated_at) * capacity / window_seconds
+    return min(capacity, tokens + refill)
+
+
+class _Bucket:
+    """单个限制键的令牌桶"""
+    __slots__ = ("tokens", "updated_at")
+
+    def __init__(self, tokens: float, updated_at: float):
+        self.tokens = tokens
+        self.updated_at = updated_at
+
+
+class MemoryRateLimitBackend:
+    """进程内令牌桶存储
+
+    限制键按哈希分片加锁；空闲超过一个时间窗口的键（桶已补满，与新键等价）在访问时顺带清理，
+    每个分片的键数超过上限时淘汰最久未访问的键
+    """
+
+    def __init__(self, shards: int = 16, max_keys: int = 100000):
+        self.max_keys_per_shard = max(1, max_keys // shards)
+        self._shards: List[Tuple[threading.Lock, "OrderedDict[str, _Bucket]"]] = [
+            (threading.Lock(), OrderedDict()) for _ in range(shards)
+        ]
+
+    def _shard(self, key: str) -> Tuple[threading.Lock, "OrderedDict[str, _Bucket]"]:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def _evict_idle(self, buckets: "OrderedDict[str, _Bucket]", now: float, window_seconds: float):
+        """清理空闲键（按访问时间排序，只需检查最前面的键）"""
+        while buckets:
+            key, bucket = next(iter(buckets.items()))
+            if now - bucket.updated_at < window_seconds and len(buckets) <= self.max_keys_per_shard:
+                break
+            buckets.popitem(last=False)
+
+    def acquire(self, key: str, capacity: int, window_seconds: float, now: float) -> bool:
+        """尝试取走一个令牌"""
+        lock, buckets = self._shard(key)
+
+        with lock:
+            bucket = buckets.pop(key, None)
+            if bucket is None:
+                bucket = _Bucket(capacity, now)
+            else:
+                bucket.tokens = refill_tokens(bucket.tokens, bucket.updated_at, now, capacity, window_seconds)
+                bucket.updated_at = max(bucket.updated_at, now)
+
+            # 重新插入到末尾（最近访问）
+            buckets[key] = bucket
+            self._evict_idle(buckets, now, window_seconds)
+
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return True
+            return False
+
+    def get_tokens(self, key: str, capacity: int, window_seconds: float, now: float) -> float:
+        """查询当前令牌数（不消耗令牌）"""
+        lock, buckets = self._shard(key)
+
+        with lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                return capacity
+            return refill_tokens(bucket.tokens, bucket.updated_at, now, capacity, window_seconds)
+
+    def __len__(self) -> int:
+        """当前保存的限制键数"""
+        return sum(len(buckets) for _, buckets in self._shards)
+
+
+class SharedMemoryRateLimitBackend:
+    """多进程共享的令牌桶存储（同一主机）
+
+    令牌桶保存在内存映射文件中的定长哈希表里，每个槽位 24 字节（键哈希、令牌数、更新时间）。
+    槽位按 STRIPE_SIZE 个一组，每组用一把进程内线程锁加一把文件区域锁（fcntl）保护，
+    键只在所属组内线性探测；组内没有空位时覆盖最久未访问的槽位。
+    时间使用系统范围的单调时钟（Linux 下各进程一致）
+    """
+
+    SLOT = struct.Struct("<Qdd")
+    STRIPE_SIZE = 64
+    PROBES = 8
+
+    def __init__(self, path: str, slots: int = 65536):
+        import fcntl
+        self._fcntl = fcntl
+
+        self.stripes = max(1, slots // self.STRIPE_SIZE)
+        self.slots = self.stripes * self.STRIPE_SIZE
+        size = self.slots * self.SLOT.size
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        # 多个 worker 同时启动时只由一个进程扩展文件大小（新扩展的区域全为 0，即空槽位）
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+        self._map = mmap.mmap(self._fd, size)
+        self._locks = [threading.Lock() for _ in range(self.stripes)]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        """跨进程稳定的 64 位键哈希（0 表示空槽位）"""
+        value = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+        return value or 1
+
+    def _locate(self, key_hash: int, now: float, window_seconds: float) -> Tuple[int, bool]:
+        """在组内查找键所在槽位，返回 (槽位偏移, 是否已存在)；不存在时返回可用（或最久未访问）的槽位"""
+        stripe = key_hash % self.stripes
+        base = stripe * self.STRIPE_SIZE
+        start = (key_hash // self.stripes) % self.STRIPE_SIZE
+
+        candidate = None
+        oldest = None
+        for i in range(self.PROBES):
+            offset = (base + (start + i) % self.STRIPE_SIZE) * self.SLOT.size
+            slot_hash, tokens, updated_at = self.SLOT.unpack_from(self._map, offset)
+            if slot_hash == key_hash:
+                return offset, True
+            idle = slot_hash == 0 or now - updated_at >= window_seconds or self._is_stale(updated_at, now, window_seconds)
+            if idle and candidate is None:
+                candidate = offset
+            if oldest is None or updated_at < oldest[1]:
+                oldest = (offset, updated_at)
+        return (candidate if candidate is not None else oldest[0]), False
+
+    @staticmethod
+    def _is_stale(updated_at: float, now: float, window_seconds: float) -> bool:
+        """更新时间远晚于当前时间，说明是主机重启（单调时钟归零）前遗留的数据"""
+        return updated_at - now > window_seconds
+
+    def _lock(self, key_hash: int):
+        stripe = key_hash % self.stripes
+        start = stripe * self.STRIPE_SIZE * self.SLOT.size
+        return self._locks[stripe], start, self.STRIPE_SIZE * self.SLOT.size
+
+    def acquire(self, key: str, capacity: int, window_seconds: float, now: float) -> bool:
+        """尝试取走一个令牌"""
+        key_hash = self._hash(key)
+        thread_lock, start, length = self._lock(key_hash)
+
+        with thread_lock:
+            self._fcntl.lockf(self._fd, self._fcntl.LOCK_EX, length, start)
+            try:
+                offset, found = self._locate(key_hash, now, window_seconds)
+                tokens = capacity
+                updated_at = now
+                if found:
+                    _, stored_tokens, stored_at = self.SLOT.unpack_from(self._map, offset)
+                    if not self._is_stale(stored_at, now, window_seconds):
+                        tokens = refill_tokens(stored_tokens, stored_at, now, capacity, window_seconds)
+                        updated_at = max(stored_at, now)
+
+                allowed = tokens >= 1
+                if allowed:
+                    tokens -= 1
+                self.SLOT.pack_into(self._map, offset, key_hash, tokens, updated_at)
+                return allowed
+            finally:
+                self._fcntl.lockf(self._fd, self._fcntl.LOCK_UN, length, start)
+
+    def get_tokens(self, key: str, capacity: int, window_seconds: float, now: float) -> float:
+        """查询当前令牌数（不消耗令牌）"""
+        key_hash = self._hash(key)
+        thread_lock, start, length = self._lock(key_hash)
+
+        with thread_lock:
+            self._fcntl.lockf(self._fd, self._fcntl.LOCK_SH, length, start)
+            try:
+                offset, found = self._locate(key_hash, now, window_seconds)
+                if not found:
+                    return capacity
+                _, tokens, updated_at = self.SLOT.unpack_from(self._map, offset)
+                if self._is_stale(updated_at, now, window_seconds):
+                    return capacity
+                return refill_tokens(tokens, updated_at, now, capacity, window_seconds)
+            finally:
+                self._fcntl.lockf(self._fd, self._fcntl.LOCK_UN, length, start)
+
+
+def create_rate_limit_backend():
+    """根据配置创建速率限制存储"""
+    if settings.RATE_LIMIT_BACKEND == "shared":
+        return SharedMemoryRateLimitBackend(
+            path=settings.RATE_LIMIT_SHARED_PATH,
+            slots=settings.RATE_LIMIT_SHARED_SLOTS
+        )
+    return MemoryRateLimitBackend()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Numeric, Text, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Numeric, Text, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -59,6 +59,14 @@ class GreenIdentification(Base):
     
     # Relationships
     workflow_instances = relationship("WorkflowInstance", back_populates="identification")
+    
+    # 复合索引（已有数据库通过 migrations/add_task_composite_indexes.py 添加）
+    __table_args__ = (
+        # 按状态查询任务列表，按创建时间倒序分页
+        Index("ix_green_identifications_status_created", "status", "created_at"),
+        # 已归档列表，按办结时间、创建时间倒序分页
+        Index("ix_green_identifications_status_completed", "status", "completed_at", "created_at"),
+    )
 
 
 class WorkflowInstance(Base):
@@ -111,6 +119,18 @@ class WorkflowTask(Base):
     
     identification_id = Column(Integer, ForeignKey("green_identifications.id"))
     identification = relationship("GreenIdentification", foreign_keys=[identification_id])
+    
+    # 复合覆盖索引（已有数据库通过 migrations/add_task_composite_indexes.py 添加）
+    __table_args__ = (
+        # 待办/已办列表：按办理人和状态过滤，按开始时间倒序取每个认定的最新任务（显式包含 id 以保证排序由索引完成）
+        Index("ix_workflow_tasks_assignee_status_started", "assignee_id", "status", "started_at", "id", "identification_id"),
+        # 工作流历史、任务详情，以及每个认定最新一条带分类的任务
+        Index("ix_workflow_tasks_ident_started_category", "identification_id", "started_at", "formatted_category"),
+        # 每个认定最新一条已完成且带分类的任务
+        Index("ix_workflow_tasks_ident_status_completed_category", "identification_id", "status", "completed_at", "formatted_category"),
+        # 撤回时按流程实例、状态、节点查找任务
+        Index("ix_workflow_tasks_instance_status_key", "workflow_instance_id", "status", "task_key"),
+    )
 
 
 class TaskAttachment(Base):
@@ -19,7 +19,7 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
 @router.get("/", response_model=List[AnnouncementSchema])
-async def get_announcements(
+def get_announcements(
     skip: int = 0,
     limit: int = 100,
     is_active: bool = None,
@@ -34,7 +34,7 @@ async def get_announcements(
 
 
 @router.get("/{announcement_id}", response_model=AnnouncementSchema)
-async def get_announcement(announcement_id: int, db: Session = Depends(get_db)):
+def get_announcement(announcement_id: int, db: Session = Depends(get_db)):
     """获取公告详情"""
     announcement = db.query(Announcement).filter(Announcement.id == announcement_id).first()
     if not announcement:
@@ -43,7 +43,7 @@ async def get_announcement(announcement_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/", response_model=AnnouncementSchema)
-async def create_announcement(
+def create_announcement(
     announcement: AnnouncementCreate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -63,7 +63,7 @@ async def create_announcement(
 
 
 @router.put("/{announcement_id}", response_model=AnnouncementSchema)
-async def update_announcement(
+def update_announcement(
     announcement_id: int,
     announcement: AnnouncementUpdate,
     current_user: User = Depends(get_current_user),
@@ -87,7 +87,7 @@ async def update_announcement(
 
 
 @router.delete("/{announcement_id}")
-async def delete_announcement(
+def delete_announcement(
     announcement_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -112,7 +112,7 @@ async def delete_announcement(
 
 
 @router.get("/scroll/active", response_model=List[AnnouncementSchema])
-async def get_scroll_announcements(db: Session = Depends(get_db)):
+def get_scroll_announcements(db: Session = Depends(get_db)):
     """获取启用的公告用于滚动展示"""
     announcements = db.query(Announcement).filter(
         Announcement.is_active == True
@@ -121,7 +121,7 @@ async def get_scroll_announcements(db: Session = Depends(get_db)):
 
 
 @router.post("/upload")
-async def upload_cover_image(
+def upload_cover_image(
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_user)
 ):
@@ -136,7 +136,7 @@ async def upload_cover_image(
     
     # 保存文件
     with open(file_path, "wb") as buffer:
-        content = await file.read()
+        content = file.file.read()
         buffer.write(content)
     
     # 返回访问URL
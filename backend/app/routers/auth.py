@@ -7,7 +7,8 @@ from app.config import settings
 from app.database import get_db
 from app.models.user import User
 from app.schemas.user import LoginRequest, Token
-from app.services.auth import authenticate_user, create_access_token, get_current_user
+from app.services.auth import authenticate_user, create_access_token, create_principal_claims, get_current_user
+from app.services.login_executor import login_executor
 
 router = APIRouter(prefix="/api/auth", tags=["认证"])
 
@@ -26,6 +27,27 @@ async def login(request: Request, login_data: LoginRequest, db: Session = Depend
     client_ip = request.client.host if hasattr(request, 'client') else None
     user_agent = request.headers.get('user-agent', None)
     
+    # 密码校验（bcrypt）和数据库读写都是阻塞操作，放到登录线程池中执行，不占用事件循环
+    return await login_executor.run(
+        _perform_login,
+        db,
+        login_data,
+        client_ip,
+        user_agent,
+        str(request.url),
+        request.method
+    )
+
+
+def _perform_login(
+    db: Session,
+    login_data: LoginRequest,
+    client_ip: str,
+    user_agent: str,
+    request_url: str,
+    request_method: str
+) -> Token:
+    """执行登录（在登录线程池中运行）"""
     user = authenticate_user(db, login_data.username, login_data.password)
     
     if not user:
@@ -52,8 +74,8 @@ async def login(request: Request, login_data: LoginRequest, db: Session = Depend
             exception_type='AuthenticationError',
             exception_message='用户名或密码错误',
             exception_traceback=None,
-            request_url=str(request.url),
-            request_method=request.method,
+            request_url=request_url,
+            request_method=request_method,
             ip_address=client_ip
         )
         
@@ -81,7 +103,7 @@ async def login(request: Request, login_data: LoginRequest, db: Session = Depend
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=create_principal_claims(db, user), expires_delta=access_token_expires
     )
     
     from app.schemas.user import User as UserSchema
@@ -100,20 +122,20 @@ async def login(request: Request, login_data: LoginRequest, db: Session = Depend
     )
 
 @router.get("/me")
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+def get_current_user_info(current_user: User = Depends(get_current_user)):
     """获取当前用户信息"""
     from app.schemas.user import User as UserSchema
     return UserSchema.model_validate(current_user)
 
 
 @router.post("/logout")
-async def logout(current_user: User = Depends(get_current_user)):
+def logout(current_user: User = Depends(get_current_user)):
     """用户登出"""
     return {"message": "登出成功"}
 
 
 @router.get("/captcha")
-async def get_captcha():
+def get_captcha():
     """获取验证码"""
     import random
     import string
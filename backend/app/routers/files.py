@@ -4,7 +4,6 @@ from sqlalchemy.orm import Session
 import os
 import uuid
 from datetime import datetime
-import aiofiles
 
 from app.database import get_db
 from app.models.user import User
@@ -30,7 +29,7 @@ def is_allowed_file(filename: str) -> bool:
 
 
 @router.post("/upload")
-async def upload_file(
+def upload_file(
     file: UploadFile = File(...),
     task_id: int = None,
     current_user: User = Depends(get_current_user),
@@ -46,7 +45,7 @@ async def upload_file(
             )
         
         # 读取文件内容
-        content = await file.read()
+        content = file.file.read()
         
         # 检查文件大小
         if len(content) > MAX_FILE_SIZE:
@@ -64,8 +63,8 @@ async def upload_file(
         file_path = os.path.join(UPLOAD_DIR, unique_filename)
         
         # 保存文件
-        async with aiofiles.open(file_path, 'wb') as f:
-            await f.write(content)
+        with open(file_path, 'wb') as f:
+            f.write(content)
         
         # 如果提供了 task_id，保存附件信息到数据库
         attachment_id = None
@@ -115,7 +114,7 @@ async def upload_file(
 
 
 @router.get("/download/{filename}")
-async def download_file(
+def download_file(
     filename: str,
     current_user: User = Depends(get_current_user)
 ):
@@ -148,7 +147,7 @@ async def download_file(
 
 
 @router.get("/attachments/identification/{identification_id}")
-async def get_attachments_by_identification(
+def get_attachments_by_identification(
     identification_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -186,7 +185,7 @@ async def get_attachments_by_identification(
 
 
 @router.delete("/delete/{filename}")
-async def delete_file(
+def delete_file(
     filename: str,
     current_user: User = Depends(get_current_user)
 ):
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import select, func
 from typing import Optional, List
 from datetime import datetime
 from decimal import Decimal
+import os
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models.user import User
 from app.models.green_finance import GreenIdentification, WorkflowTask, WorkflowInstance, GreenLoanIndicator, TaskStatus
 from app.models.workflow import ProcessDefinition
@@ -23,31 +25,57 @@ from app.schemas.green_finance import (
     DashboardStats,
     TodoItem
 )
-from app.services.auth import get_current_user
+from app.services.auth import Principal, get_current_user, get_current_principal
 from app.services.workflow import WorkflowEngine, get_user_tasks, query_tasks, get_formatted_category
+from app.services.green_category import green_category_catalog, SerializedCatalog
+from app.services.process_model import process_model_cache
+from app.services.org_tree import org_tree_cache
+from app.services.task_detail import load_task_detail
+from app.services.task_export import ExportFilters, build_export_query, iter_export_csv
+from app.services.export_jobs import ExportJob, ExportJobStatus, export_job_manager
+from app.utils.range_response import range_file_response
 
 router = APIRouter(prefix="/api", tags=["绿色金融"])
 
 
-def get_workflow_version(db: Session, process_definition_id: Optional[int]) -> int:
-    """获取流程定义版本"""
-    if not process_definition_id:
-        return 1
-    process_def = db.query(ProcessDefinition).filter(ProcessDefinition.id == process_definition_id).first()
-    return process_def.version if process_def else 1
+def get_workflow_versions(db: Session, process_definition_ids) -> dict:
+    """一次查询获取多个流程定义的版本，返回流程定义 ID 到版本的映射"""
+    ids = {definition_id for definition_id in process_definition_ids if definition_id}
+    if not ids:
+        return {}
+    rows = db.query(ProcessDefinition.id, ProcessDefinition.version).filter(ProcessDefinition.id.in_(ids)).all()
+    return {definition_id: version for definition_id, version in rows}
+
+
+def get_task_name_map(db: Session) -> dict:
+    """获取启用流程中任务标识到节点名称的映射（节点名称取自编译缓存，不再每次解析 XML）"""
+    process_definition = WorkflowEngine.get_active_process_definition(db)
+    if not process_definition:
+        return {}
+    process = process_model_cache.get(process_definition)
+    return {task_key: node.name for task_key, node in process.task_nodes.items()}
+
+
+def get_user_map(db: Session, user_ids) -> dict:
+    """一次查询加载多个用户（含岗位），返回用户 ID 到用户的映射，避免在循环中逐个查询"""
+    ids = {user_id for user_id in user_ids if user_id}
+    if not ids:
+        return {}
+    users = db.query(User).options(selectinload(User.role)).filter(User.id.in_(ids)).all()
+    return {user.id: user for user in users}
 
 
 @router.get("/dashboard", response_model=DashboardData)
 async def get_dashboard(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取工作台数据"""
     
     # 获取最新指标数据
-    indicator = db.query(GreenLoanIndicator).order_by(
-        GreenLoanIndicator.stat_date.desc()
-    ).first()
+    indicator = (await db.execute(
+        select(GreenLoanIndicator).order_by(GreenLoanIndicator.stat_date.desc()).limit(1)
+    )).scalars().first()
     
     if indicator:
         stats = DashboardStats(
@@ -75,43 +103,23 @@ async def get_dashboard(
     # 获取待办统计
     todos = []
     
-    # 统计各类型待办任务
-    from app.models.green_finance import WorkflowTask as WorkflowTaskModel
-    from app.models.workflow import ProcessDefinition
-    from app.services.workflow import WorkflowEngine
-    from app.services.bpmn_parser import BPMNParser
-    
-    pending_tasks = db.query(WorkflowTaskModel).filter(
-        WorkflowTaskModel.status == "待处理",
-        WorkflowTaskModel.assignee_id == current_user.id
-    ).all()
-    
-    # 按任务类型统计
-    task_counts = {}
-    for task in pending_tasks:
-        task_key = task.task_key
-        task_counts[task_key] = task_counts.get(task_key, 0) + 1
+    # 按任务类型统计待办任务数（在数据库中分组计数）
+    task_counts = (await db.execute(
+        select(WorkflowTask.task_key, func.count(WorkflowTask.id)).where(
+            WorkflowTask.status == "待处理",
+            WorkflowTask.assignee_id == current_user.id
+        ).group_by(WorkflowTask.task_key)
+    )).all()
     
     # 从流程定义中动态获取节点名称
     task_name_map = {}
-    
-    # 获取启用状态的流程定义
-    process_definition = db.query(ProcessDefinition).filter(
-        ProcessDefinition.name == "绿色认定",
-        ProcessDefinition.status == "active"
-    ).first()
-    
-    if process_definition and process_definition.bpmn_xml:
+    if task_counts:
         try:
-            parsed_process = BPMNParser.parse(process_definition.bpmn_xml)
-            for node in parsed_process['nodes']:
-                if node.type == 'task':
-                    task_key = WorkflowEngine._map_node_name_to_task_key(node.name)
-                    task_name_map[task_key] = node.name
+            task_name_map = await db.run_sync(get_task_name_map)
         except Exception as e:
             print(f"解析流程定义失败: {str(e)}")
     
-    for task_key, count in task_counts.items():
+    for task_key, count in task_counts:
         todos.append(TodoItem(
             category=task_name_map.get(task_key, task_key),
             count=count
@@ -124,16 +132,13 @@ async def get_dashboard(
 async def get_pending_tasks(
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取待办任务列表"""
-    tasks = get_user_tasks(db, current_user, "待处理")
-    
-    total = len(tasks)
-    start = (page - 1) * page_size
-    end = start + page_size
-    items = tasks[start:end]
+    # 任务列表查询复用同步实现，通过 run_sync 在异步会话的连接上执行
+    # 注意：run_sync 中的数据库访问会让出事件循环，途经的缓存不能持有线程锁加载数据
+    items, total = await db.run_sync(get_user_tasks, current_user, "待处理", page=page, page_size=page_size)
     
     return TaskListResponse(
         items=items,
@@ -144,19 +149,14 @@ async def get_pending_tasks(
 
 
 @router.get("/tasks/completed", response_model=TaskListResponse)
-async def get_completed_tasks(
+def get_completed_tasks(
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """获取已办任务列表"""
-    tasks = get_user_tasks(db, current_user, "已完成")
-    
-    total = len(tasks)
-    start = (page - 1) * page_size
-    end = start + page_size
-    items = tasks[start:end]
+    items, total = get_user_tasks(db, current_user, "已完成", page=page, page_size=page_size)
     
     return TaskListResponse(
         items=items,
@@ -167,7 +167,7 @@ async def get_completed_tasks(
 
 
 @router.get("/tasks/archived", response_model=TaskListResponse)
-async def get_archived_tasks(
+def get_archived_tasks(
     customer_name: Optional[str] = None,
     business_type: Optional[str] = None,
     loan_account: Optional[str] = None,
@@ -181,7 +181,7 @@ async def get_archived_tasks(
     deadline_end: Optional[datetime] = None,
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """获取办结任务列表"""
@@ -203,14 +203,13 @@ async def get_archived_tasks(
     # 超级用户可以查看所有机构的办结任务
     # 其他用户只能查看自己经办的已办结任务（在工作流中有任务记录的任务）
     # 当restrict_to_assigned=True时，不使用org_id过滤，因为用户经办的任务可能属于不同机构
-    items, total = query_tasks(db, query, "办结", current_user, org_id=None, restrict_to_assigned=True)
-    
-    start = (page - 1) * page_size
-    end = start + page_size
-    paginated_items = items[start:end]
+    items, total = query_tasks(
+        db, query, "办结", current_user, org_id=None, restrict_to_assigned=True,
+        page=page, page_size=page_size
+    )
     
     return TaskListResponse(
-        items=paginated_items,
+        items=items,
         total=total,
         page=page,
         page_size=page_size
@@ -218,7 +217,7 @@ async def get_archived_tasks(
 
 
 @router.get("/tasks/search")
-async def search_tasks(
+def search_tasks(
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
     customer_name: Optional[str] = None,
@@ -227,32 +226,27 @@ async def search_tasks(
     loan_date_start: Optional[str] = None,
     loan_date_end: Optional[str] = None,
     status: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
+    include_history: bool = Query(True, description="是否返回工作流历史和附件（列表视图可关闭）"),
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
-    """综合查询任务"""
-    from app.models.user import Organization
-    
+    """综合查询任务
+
+    当前页的工作流历史、办理人和附件各用一次批量查询加载后在内存中分组，查询次数与分页大小无关
+    """
     # 构建查询
     query = db.query(GreenIdentification)
     
     # 权限控制：根据用户机构级别过滤数据
     if not current_user.is_superuser:
-        user_org = db.query(Organization).filter(Organization.id == current_user.org_id).first()
+        user_org = org_tree_cache.get(db).get(current_user.org_id)
         if user_org:
             # Level 1（总行）：可以查看所有数据
             # Level 2（分行）：可以查看本级及下属支行的数据
             # Level 3（支行）：只能查看本级的数据
             if user_org.level == 2:
-                # 获取该分行及其所有下属机构的ID
-                org_ids = [user_org.id]
-                child_orgs = db.query(Organization).filter(Organization.parent_id == user_org.id).all()
-                for child in child_orgs:
-                    org_ids.append(child.id)
-                    # 获取支行的下属机构（如果有）
-                    grandchild_orgs = db.query(Organization).filter(Organization.parent_id == child.id).all()
-                    for grandchild in grandchild_orgs:
-                        org_ids.append(grandchild.id)
+                # 获取该分行及其所有下属机构的ID（从机构树缓存中获取）
+                org_ids = org_tree_cache.get(db).descendant_ids(user_org.id)
                 query = query.filter(GreenIdentification.org_id.in_(org_ids))
             elif user_org.level == 3:
                 # 支行只能查看本级的数据
@@ -279,14 +273,46 @@ async def search_tasks(
     offset = (page - 1) * page_size
     identifications = query.offset(offset).limit(page_size).all()
     
+    ident_ids = [ident.id for ident in identifications]
+    
+    # 工作流历史（按认定分组，组内按时间排序）
+    history_tasks = []
+    if include_history and ident_ids:
+        history_tasks = db.query(WorkflowTask).filter(
+            WorkflowTask.identification_id.in_(ident_ids)
+        ).order_by(WorkflowTask.started_at, WorkflowTask.id).all()
+    history_by_ident = {ident_id: [] for ident_id in ident_ids}
+    for history_task in history_tasks:
+        history_by_ident[history_task.identification_id].append(history_task)
+    
+    # 附件（连同上传人一起加载，按认定分组）
+    attachments_by_ident = {ident_id: [] for ident_id in ident_ids}
+    if history_tasks:
+        from app.models.green_finance import TaskAttachment
+        task_ident_map = {history_task.id: history_task.identification_id for history_task in history_tasks}
+        attachments = db.query(TaskAttachment).options(
+            selectinload(TaskAttachment.uploader)
+        ).filter(
+            TaskAttachment.task_id.in_(list(task_ident_map))
+        ).order_by(TaskAttachment.id).all()
+        for attachment in attachments:
+            attachments_by_ident[task_ident_map[attachment.task_id]].append(attachment)
+    
+    # 发起人和办理人一次性加载
+    users = get_user_map(
+        db,
+        [ident.initiator_id for ident in identifications] + [history_task.assignee_id for history_task in history_tasks]
+    )
+    
+    from app.services.workflow import get_formatted_category
+    
     # 转换为任务列表格式
     result = []
     for ident in identifications:
         # 获取发起人
-        initiator = db.query(User).filter(User.id == ident.initiator_id).first()
+        initiator = users.get(ident.initiator_id)
         
         # 获取格式化的绿色金融支持项目目录
-        from app.services.workflow import get_formatted_category
         formatted_category = get_formatted_category(db, ident)
         
         item = {
@@ -302,18 +328,14 @@ async def search_tasks(
             "assignee_name": initiator.real_name if initiator else "",
             "created_at": str(ident.created_at) if ident.created_at else "",
             "completed_at": str(ident.completed_at) if ident.completed_at else "",
-            "workflow_history": []
+            "workflow_history": [],
+            "attachments": []
         }
         
         # 获取工作流历史
-        # 按时间排序工作流历史
-        history_tasks = db.query(WorkflowTask).filter(
-            WorkflowTask.identification_id == ident.id
-        ).order_by(WorkflowTask.started_at).all()
-        
         history_list = []
-        for history_task in history_tasks:
-            history_assignee = db.query(User).filter(User.id == history_task.assignee_id).first()
+        for history_task in history_by_ident[ident.id]:
+            history_assignee = users.get(history_task.assignee_id)
             # 获取该任务的分类信息
             formatted_category = None
             # 优先使用formatted_category字段（带编号格式）
@@ -354,13 +376,7 @@ async def search_tasks(
         item["workflow_history"] = history_list
         
         # 获取附件信息
-        from app.models.green_finance import TaskAttachment
-        attachments = db.query(TaskAttachment).filter(
-            TaskAttachment.task_id.in_([ht.id for ht in history_tasks])
-        ).all()
-        
-        item["attachments"] = []
-        for attachment in attachments:
+        for attachment in attachments_by_ident[ident.id]:
             item["attachments"].append({
                 "id": attachment.id,
                 "task_id": attachment.task_id,
@@ -382,7 +398,7 @@ async def search_tasks(
 
 
 @router.post("/tasks/{task_id}/complete")
-async def complete_task(
+def complete_task(
     task_id: int,
     task_data: WorkflowTaskCreate,
     current_user: User = Depends(get_current_user),
@@ -439,7 +455,7 @@ async def complete_task(
 
 
 @router.post("/tasks/{task_id}/withdraw")
-async def withdraw_task(
+def withdraw_task(
     task_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -472,7 +488,7 @@ async def withdraw_task(
         return {"message": "任务已撤回到待办任务列表"}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-async def withdraw_task(
+def withdraw_task(
     task_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -500,7 +516,7 @@ async def withdraw_task(
 
 
 @router.post("/tasks/{task_id}/return")
-async def return_task(
+def return_task(
     task_id: int,
     task_data: dict,
     current_user: User = Depends(get_current_user),
@@ -538,7 +554,7 @@ async def return_task(
 
 
 @router.post("/tasks/{task_id}/save")
-async def save_task(
+def save_task(
     task_id: int,
     task_data: dict,
     current_user: User = Depends(get_current_user),
@@ -606,7 +622,7 @@ async def save_task(
 
 
 @router.put("/tasks/{task_id}/category")
-async def update_task_category(
+def update_task_category(
     task_id: int,
     data: dict,
     current_user: User = Depends(get_current_user),
@@ -655,7 +671,7 @@ async def update_task_category(
 
 
 @router.get("/tasks/export")
-async def export_tasks(
+def export_tasks(
     customer_name: Optional[str] = Query(None),
     business_type: Optional[str] = Query(None),
     loan_account: Optional[str] = Query(None),
@@ -672,101 +688,27 @@ async def export_tasks(
     logger = logging.getLogger(__name__)
     logger.info(f"Export tasks called - customer_name={customer_name}, business_type={business_type}, loan_account={loan_account}, loan_date_start={loan_date_start}, loan_date_end={loan_date_end}, status={status}, limit={limit}")
     from fastapi.responses import StreamingResponse
-    from app.models.user import Organization
-    import io
-    import csv
     from datetime import datetime
     
-    # 构建查询
-    query = db.query(GreenIdentification)
-    
-    # 权限控制：根据用户机构级别过滤数据
-    if not current_user.is_superuser:
-        user_org = db.query(Organization).filter(Organization.id == current_user.org_id).first()
-        if user_org:
-            if user_org.level == 2:
-                org_ids = [user_org.id]
-                child_orgs = db.query(Organization).filter(Organization.parent_id == user_org.id).all()
-                for child in child_orgs:
-                    org_ids.append(child.id)
-                    grandchild_orgs = db.query(Organization).filter(Organization.parent_id == child.id).all()
-                    for grandchild in grandchild_orgs:
-                        org_ids.append(grandchild.id)
-                query = query.filter(GreenIdentification.org_id.in_(org_ids))
-            elif user_org.level == 3:
-                query = query.filter(GreenIdentification.org_id == current_user.org_id)
-    
-    # 添加查询条件
-    if customer_name:
-        query = query.filter(GreenIdentification.customer_name.like(f"%{customer_name}%"))
-    if business_type:
-        query = query.filter(GreenIdentification.business_type == business_type)
-    if loan_account:
-        query = query.filter(GreenIdentification.loan_account.like(f"%{loan_account}%"))
-    if loan_date_start:
-        query = query.filter(GreenIdentification.disbursement_date >= loan_date_start)
-    if loan_date_end:
-        query = query.filter(GreenIdentification.disbursement_date <= loan_date_end)
-    if status:
-        query = query.filter(GreenIdentification.status == status)
-    
-    # 获取数据,限制最大数量
-    # 如果只导出有完整数据的记录,添加过滤条件
-    if only_complete:
-        query = query.filter(
-            GreenIdentification.completed_at.isnot(None),
-            GreenIdentification.initiator_id.isnot(None)
-        )
-    
-    identifications = query.order_by(GreenIdentification.created_at.desc()).limit(limit).all()
-    
-    logger.info(f"Exporting {len(identifications)} records (only_complete={only_complete})")
-    
-    # 预加载所有发起人信息,避免N+1查询
-    initiator_ids = [ident.initiator_id for ident in identifications if ident.initiator_id]
-    initiators = {}
-    if initiator_ids:
-        users = db.query(User).filter(User.id.in_(initiator_ids)).all()
-        initiators = {user.id: user.real_name for user in users}
-    
-    # 转换为CSV格式
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # 写入表头
-    writer.writerow([
-        '任务ID', '客户名称', '业务品种', '贷款账号', '放款金额', '放款日期',
-        '绿色金融支持项目目录', '发起人', '状态', '创建时间', '完成时间'
-    ])
-    
-    # 写入数据
-    from app.services.workflow import get_formatted_category
-    for ident in identifications:
-        formatted_category = get_formatted_category(db, ident)
-        initiator_name = initiators.get(ident.initiator_id, "")
-        
-        writer.writerow([
-            ident.id,
-            ident.customer_name,
-            ident.business_type,
-            ident.loan_account,
-            str(ident.loan_amount) if ident.loan_amount else "0",
-            str(ident.disbursement_date) if ident.disbursement_date else "",
-            formatted_category or ident.project_category_medium or "",
-            initiator_name,
-            ident.status,
-            str(ident.created_at) if ident.created_at else "",
-            str(ident.completed_at) if ident.completed_at else ""
-        ])
-    
-    # 创建响应
-    output.seek(0)
+    # 构建查询（只查询导出需要的列）
+    query = build_export_query(db, current_user, ExportFilters(
+        customer_name=customer_name,
+        business_type=business_type,
+        loan_account=loan_account,
+        loan_date_start=loan_date_start,
+        loan_date_end=loan_date_end,
+        status=status,
+        limit=limit,
+        only_complete=only_complete
+    ))
+    
+    # 创建响应：边读取边写出 CSV，不在内存中缓存整个文件
     from urllib.parse import quote
     filename = f'green_finance_tasks_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
     filename_utf8 = f'绿色金融任务导出_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
     
     response = StreamingResponse(
-        io.BytesIO(output.getvalue().encode('utf-8-sig')),
+        iter_export_csv(query),
         media_type='text/csv; charset=utf-8-sig',
         headers={
             'Content-Disposition': f'attachment; filename="{filename}"; filename*=UTF-8\'\'{quote(filename_utf8)}'
@@ -776,8 +718,94 @@ async def export_tasks(
     return response
 
 
+@router.post("/tasks/export/jobs")
+def create_export_job(
+    customer_name: Optional[str] = Query(None),
+    business_type: Optional[str] = Query(None),
+    loan_account: Optional[str] = Query(None),
+    loan_date_start: Optional[str] = Query(None),
+    loan_date_end: Optional[str] = Query(None),
+    status: Optional[str] = Query(None),
+    limit: int = Query(10000, ge=1, le=100000, description="最大导出数量,默认10000条,最大100000条"),
+    only_complete: bool = Query(False, description="是否只导出有完整数据的记录(有完成时间、发起人和分类信息)"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """创建后台导出任务（筛选条件与 /tasks/export 相同），立即返回任务ID"""
+    filters = ExportFilters(
+        customer_name=customer_name,
+        business_type=business_type,
+        loan_account=loan_account,
+        loan_date_start=loan_date_start,
+        loan_date_end=loan_date_end,
+        status=status,
+        limit=limit,
+        only_complete=only_complete
+    )
+    query = build_export_query(db, current_user, filters)
+    job = export_job_manager.submit(current_user.id, filters, query)
+    
+    return {"job_id": job.id, "status": job.status}
+
+
+def get_user_export_job(job_id: str, current_user: User) -> ExportJob:
+    """获取当前用户的导出任务"""
+    job = export_job_manager.get(job_id)
+    if not job or job.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="导出任务不存在")
+    return job
+
+
+@router.get("/tasks/export/jobs/{job_id}")
+def get_export_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """查询导出任务进度"""
+    job = get_user_export_job(job_id, current_user)
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "progress": job.progress,
+        "total": job.total,
+        "processed": job.processed,
+        "file_size": job.file_size,
+        "error": job.error,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at
+    }
+
+
+@router.get("/tasks/export/jobs/{job_id}/download")
+def download_export_job(
+    job_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """下载导出文件（支持 Range 断点续传）"""
+    from urllib.parse import quote
+    
+    job = get_user_export_job(job_id, current_user)
+    file_path = export_job_manager.file_path(job.id)
+    if job.status != ExportJobStatus.COMPLETED or not os.path.exists(file_path):
+        raise HTTPException(status_code=409, detail="导出文件尚未生成")
+    
+    created = datetime.fromisoformat(job.created_at).strftime("%Y%m%d_%H%M%S")
+    filename = f'green_finance_tasks_{created}.csv'
+    filename_utf8 = f'绿色金融任务导出_{created}.csv'
+    
+    return range_file_response(
+        request,
+        file_path,
+        media_type='text/csv; charset=utf-8-sig',
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"; filename*=UTF-8\'\'{quote(filename_utf8)}'
+        }
+    )
+
+
 @router.get("/tasks/online-report")
-async def get_online_report(
+def get_online_report(
     level1_branch: Optional[str] = Query(None, description="一级分行"),
     level2_branch: Optional[str] = Query(None, description="二级分行"),
     branch: Optional[str] = Query(None, description="支行"),
@@ -792,24 +820,19 @@ async def get_online_report(
     db: Session = Depends(get_db)
 ):
     """获取在线功能报表"""
-    from app.models.user import Organization
+    org_tree = org_tree_cache.get(db)
     
-    # 构建查询
-    query = db.query(GreenIdentification)
+    # 构建查询（发起人姓名随主查询一起取出，不再逐条加载）
+    query = db.query(GreenIdentification, User.real_name.label("initiator_name"))
     
     # 关联查询用户表获取发起人信息
     query = query.join(User, GreenIdentification.initiator_id == User.id, isouter=True)
     
-    # 关联查询机构表
-    query = query.join(Organization, GreenIdentification.org_id == Organization.id, isouter=True)
-    
     # 应用筛选条件
-    if level1_branch:
-        query = query.filter(Organization.name.like(f"%{level1_branch}%"))
-    if level2_branch:
-        query = query.filter(Organization.name.like(f"%{level2_branch}%"))
-    if branch:
-        query = query.filter(Organization.name.like(f"%{branch}%"))
+    # 一级分行、二级分行、支行按机构树的分行路径投影分别匹配，转换为机构ID过滤
+    if level1_branch or level2_branch or branch:
+        org_ids = org_tree.match_branch_path(level1_branch, level2_branch, branch)
+        query = query.filter(GreenIdentification.org_id.in_(org_ids))
     if loan_account:
         query = query.filter(GreenIdentification.loan_account.like(f"%{loan_account}%"))
     if green_large:
@@ -822,7 +845,7 @@ async def get_online_report(
         query = query.filter(User.real_name.like(f"%{initiator}%"))
     
     # 获取总数
-    total = query.count()
+    total = query.with_entities(func.count(GreenIdentification.id)).scalar()
     
     # 排序规则：按照完成时间倒序排列，完成时间为空的排列到最后
     from sqlalchemy import case
@@ -836,51 +859,11 @@ async def get_online_report(
     ).offset((page - 1) * page_size).limit(page_size).all()
     
     # 转换为报表数据格式
+    branch_paths = org_tree.branch_paths()
     report_data = []
-    for record in records:
-        # 获取机构信息
-        org = record.organization
-        
-        # 根据机构层级设置一级分行、二级分行、支行
-        level1_name = ''  # 一级分行
-        level2_name = ''  # 二级分行
-        branch_name = ''  # 支行
-        
-        if org:
-            # 根据实际的机构关系判断层级
-            # 支行：level=3
-            # 一级分行：level=2 且 parent_level=1
-            # 二级分行：level=2 且 parent_level=2
-            
-            if org.level == 3:
-                # 支行
-                branch_name = org.name
-                if org.parent:
-                    # 如果父机构是level=2且父机构的父机构是总行（level=1），说明父机构是一级分行
-                    if org.parent.level == 2 and org.parent.parent and org.parent.parent.level == 1:
-                        # 父机构是一级分行，二级分行为空
-                        level1_name = org.parent.name
-                    else:
-                        # 其他情况，父机构是二级分行
-                        level2_name = org.parent.name
-                        if org.parent.parent:
-                            level1_name = org.parent.parent.name
-            elif org.level == 2:
-                if org.parent and org.parent.level == 1:
-                    # 一级分行：level=2 且 parent_level=1
-                    level1_name = org.name
-                elif org.parent and org.parent.level == 2:
-                    # 二级分行：level=2 且 parent_level=2
-                    level2_name = org.name
-                    level1_name = org.parent.name
-                else:
-                    # 没有父机构，默认为一级分行
-                    level1_name = org.name
-            # level=1 总行不显示在一级分行列
-        
-        # 确保一级分行列不显示"总行"
-        if '总行' in level1_name:
-            level1_name = ''
+    for record, initiator_name in records:
+        # 根据机构层级设置一级分行、二级分行、支行（取自机构树的分行路径投影）
+        level1_name, level2_name, branch_name = branch_paths.get(record.org_id, ('', '', ''))
         
         report_data.append({
             "id": record.id,
@@ -892,7 +875,7 @@ async def get_online_report(
             "green_large": record.project_category_large,
             "green_medium": record.project_category_medium,
             "green_small": record.project_category_small,
-            "initiator": record.initiator.real_name if record.initiator else '',
+            "initiator": initiator_name or '',
             "customer_name": record.customer_name,
             "business_type": record.business_type,
             "loan_date": record.disbursement_date.strftime('%Y-%m-%d') if record.disbursement_date else '',
@@ -914,182 +897,16 @@ async def get_online_report(
 async def get_task_detail(
     task_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取任务详情"""
-    # task_id 可能是 green_identification 的 ID，也可能是 workflow_task 的 ID
-    # 先检查是否存在该ID的workflow_task
-    task = db.query(WorkflowTask).filter(WorkflowTask.id == task_id).first()
-    
-    # 再检查是否存在该ID的identification
-    identification = db.query(GreenIdentification).filter(GreenIdentification.id == task_id).first()
-    
-    # 如果两者都存在，优先使用workflow_task（因为TaskCompleted.vue传的是task_id）
-    # 如果只有task存在，使用task
-    # 如果只有identification存在，使用identification
-    if task:
-        # 找到了task，获取对应的identification
-        identification = db.query(GreenIdentification).filter(
-            GreenIdentification.id == task.identification_id
-        ).first()
-    elif identification:
-        # 只有identification存在，获取对应的第一个task
-        task = db.query(WorkflowTask).filter(WorkflowTask.identification_id == task_id).first()
-    
-    if not identification or not task:
-        raise HTTPException(status_code=404, detail="任务不存在")
-    
-    # 获取格式化的带编号的分类名称
-    from app.services.workflow import get_formatted_category
-    formatted_category = get_formatted_category(db, identification)
-    
-    # 获取发起人名称
-    initiator = db.query(User).filter(User.id == identification.initiator_id).first()
-    initiator_name = initiator.real_name if initiator else ""
-    
-    # 获取机构名称
-    org_name = identification.organization.name if identification.organization else ""
-    
-    # 构建返回结果
-    result = {
-        "id": identification.id,
-        "identification_id": identification.id,  # 添加identification_id字段，与id相同
-        "loan_code": identification.loan_code,
-        "customer_name": identification.customer_name,
-        "customer_id": identification.customer_id,
-        "business_type": identification.business_type,
-        "loan_account": identification.loan_account,
-        "loan_amount": identification.loan_amount,
-        "disbursement_date": identification.disbursement_date,
-        "maturity_date": identification.maturity_date,
-        "interest_rate": identification.interest_rate,
-        "green_percentage": identification.green_percentage,
-        "green_loan_balance": identification.green_loan_balance,
-        "project_category_large": identification.project_category_large,
-        "project_category_medium": identification.project_category_medium,
-        "project_category_small": identification.project_category_small,
-        "formatted_category": formatted_category,
-        "esg_risk_level": identification.esg_risk_level,
-        "esg_performance_level": identification.esg_performance_level,
-        "status": identification.status,
-        "initiator_id": identification.initiator_id,
-        "initiator_name": initiator_name,
-        "current_handler_id": identification.current_handler_id,
-        "org_id": identification.org_id,
-        "org_name": org_name,
-        "created_at": identification.created_at,
-        "updated_at": identification.updated_at,
-        "completed_at": identification.completed_at,
-        "deadline": identification.deadline,
-        "started_at": task.workflow_instance.started_at if task.workflow_instance else None,
-        "attachments": []
-    }
-    
-    # 获取该认定记录的所有工作流任务
-    workflow_tasks = db.query(WorkflowTask).filter(
-        WorkflowTask.identification_id == identification.id
-    ).order_by(WorkflowTask.started_at).all()
-    
-    # 检查是否有当前待处理任务
-    current_task = [t for t in workflow_tasks if t.status == "待处理"]
-    if current_task:
-        # 如果有当前待处理任务，使用当前待处理任务的分类
-        current_pending_task = current_task[0]
-        if current_pending_task.formatted_category:
-            result["project_category_large"] = current_pending_task.project_category_large
-            result["project_category_medium"] = current_pending_task.project_category_medium
-            result["project_category_small"] = current_pending_task.project_category_small
-            result["formatted_category"] = current_pending_task.formatted_category
-    else:
-        # 如果没有当前待处理任务，获取上个节点最新的绿色分类（排除当前任务，只选择已完成的任务）
-        previous_tasks = [t for t in workflow_tasks if t.id != task.id and t.status == "已完成"]
-        if previous_tasks:
-            # 按完成时间倒序排列，取最新的
-            previous_tasks.sort(key=lambda x: x.completed_at if x.completed_at else x.started_at, reverse=True)
-            latest_previous_task = previous_tasks[0]
-            
-            # 如果上个任务有分类信息，使用上个任务的分类
-            if latest_previous_task.formatted_category:
-                result["project_category_large"] = latest_previous_task.project_category_large
-                result["project_category_medium"] = latest_previous_task.project_category_medium
-                result["project_category_small"] = latest_previous_task.project_category_small
-                result["formatted_category"] = latest_previous_task.formatted_category
-    
-    # 获取附件信息
-    from app.models.green_finance import TaskAttachment
-    import logging
-    logging.info(f"DEBUG: task_id={task_id}, identification_id={identification.id}")
-    logging.info(f"DEBUG: workflow_tasks={[ht.id for ht in workflow_tasks]}")
-    
-    attachments = db.query(TaskAttachment).filter(
-        TaskAttachment.task_id.in_([ht.id for ht in workflow_tasks])
-    ).all()
-    
-    logging.info(f"DEBUG: attachments查询结果数量={len(attachments)}")
-    
-    for attachment in attachments:
-        result["attachments"].append({
-            "id": attachment.id,
-            "task_id": attachment.task_id,
-            "task_key": attachment.task_key,
-            "task_name": attachment.task_name,
-            "uploader_name": attachment.uploader.real_name if attachment.uploader else "",
-            "original_filename": attachment.original_filename,
-            "file_size": attachment.file_size,
-            "download_url": attachment.download_url,
-            "created_at": attachment.created_at.isoformat() if attachment.created_at else ""
-        })
-    
-    logging.info(f"DEBUG: result['attachments']数量={len(result['attachments'])}")
-    
-    # 根据分类名称查找对应的code
-    if result.get("project_category_large") or result.get("project_category_medium") or result.get("project_category_small"):
-        large_code = None
-        medium_code = None
-        small_code = None
-        
-        if result.get("project_category_large"):
-            large_result = db.execute(text("""
-                SELECT large_code
-                FROM green_project_categories
-                WHERE large_name = :large
-                ORDER BY large_code DESC
-                LIMIT 1
-            """), {"large": result["project_category_large"]}).fetchone()
-            if large_result:
-                large_code = large_result[0]
-        
-        if result.get("project_category_medium") and large_code:
-            medium_result = db.execute(text("""
-                SELECT medium_code
-                FROM green_project_categories
-                WHERE large_code = :large_code AND medium_name = :medium
-                ORDER BY medium_code DESC
-                LIMIT 1
-            """), {"large_code": large_code, "medium": result["project_category_medium"]}).fetchone()
-            if medium_result:
-                medium_code = medium_result[0]
-        
-        if result.get("project_category_small") and medium_code:
-            small_result = db.execute(text("""
-                SELECT small_code
-                FROM green_project_categories
-                WHERE large_code = :large_code AND medium_code = :medium_code AND small_name = :small
-                ORDER BY small_code DESC
-                LIMIT 1
-            """), {"large_code": large_code, "medium_code": medium_code, "small": result["project_category_small"]}).fetchone()
-            if small_result:
-                small_code = small_result[0]
-        
-        result["project_category_large_code"] = large_code
-        result["project_category_medium_code"] = medium_code
-        result["project_category_small_code"] = small_code
-    
-    return result
+    # 详情读模型使用同步会话接口，通过 run_sync 在异步会话的连接上执行
+    # （途经的缓存同样不能持有线程锁加载数据，见 get_pending_tasks）
+    return await db.run_sync(load_task_detail, task_id)
 
 
 @router.get("/identifications/{id}/workflow", response_model=List[WorkflowTaskSchema])
-async def get_workflow_history(
+def get_workflow_history(
     id: str,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -1111,10 +928,11 @@ async def get_workflow_history(
         WorkflowTask.identification_id == identification_id
     ).order_by(WorkflowTask.started_at).all()
     
-    # 增加用户信息
+    # 增加用户信息（办理人一次性加载）
+    assignees = get_user_map(db, [task.assignee_id for task in tasks])
     result = []
     for task in tasks:
-        assignee = db.query(User).filter(User.id == task.assignee_id).first()
+        assignee = assignees.get(task.assignee_id)
         position_name = None
         if assignee and assignee.role:
             position_name = assignee.role.name
@@ -1155,7 +973,7 @@ async def get_workflow_history(
 
 
 @router.get("/identifications/{id}/workflow-instance", response_model=WorkflowInstanceSchema)
-async def get_workflow_instance(
+def get_workflow_instance(
     id: str,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -1179,7 +997,7 @@ async def get_workflow_instance(
 
 
 @router.get("/workflow-instances")
-async def get_workflow_instances(
+def get_workflow_instances(
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
     status: Optional[str] = None,
@@ -1211,6 +1029,8 @@ async def get_workflow_instances(
         desc(WorkflowInstance.started_at)
     ).offset(offset).limit(page_size).all()
     
+    versions = get_workflow_versions(db, [instance.process_definition_id for instance, _ in instances])
+    
     result_data = []
     for instance, identification in instances:
         result_data.append({
@@ -1229,7 +1049,7 @@ async def get_workflow_instances(
                 "id": instance.process_definition_id,
                 "key": instance.process_key,
                 "name": "绿色认定流程",
-                "version": get_workflow_version(db, instance.process_definition_id)
+                "version": versions.get(instance.process_definition_id, 1)
             }
         })
     
@@ -1240,7 +1060,7 @@ async def get_workflow_instances(
 
 
 @router.get("/workflow-instances/{instance_id}/tasks")
-async def get_workflow_instance_tasks(
+def get_workflow_instance_tasks(
     instance_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -1255,9 +1075,10 @@ async def get_workflow_instance_tasks(
         WorkflowTask.workflow_instance_id == instance_id
     ).order_by(WorkflowTask.started_at).all()
     
+    assignees = get_user_map(db, [task.assignee_id for task in tasks])
     result = []
     for task in tasks:
-        assignee = db.query(User).filter(User.id == task.assignee_id).first()
+        assignee = assignees.get(task.assignee_id)
         task_dict = {
             "id": task.id,
             "task_name": task.task_name,
@@ -1273,7 +1094,7 @@ async def get_workflow_instance_tasks(
 
 
 @router.delete("/workflow-instances/{instance_id}")
-async def delete_workflow_instance(
+def delete_workflow_instance(
     instance_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -1314,77 +1135,51 @@ async def delete_workflow_instance(
         raise HTTPException(status_code=500, detail=error_detail)
 
 
+def catalog_response(request: Request, serialized: SerializedCatalog) -> Response:
+    """返回目录数据，支持 If-None-Match 协商缓存和 gzip 压缩"""
+    headers = {
+        "ETag": serialized.etag,
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding, Authorization"
+    }
+    
+    # 客户端缓存仍然有效，直接返回304
+    if_none_match = request.headers.get("if-none-match", "")
+    client_etags = [tag.strip() for tag in if_none_match.split(",") if tag.strip()]
+    if "*" in client_etags or any(tag.removeprefix("W/") == serialized.etag.removeprefix("W/") for tag in client_etags):
+        return Response(status_code=304, headers=headers)
+    
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=serialized.gzip_body, media_type="application/json", headers=headers)
+    
+    return Response(content=serialized.body, media_type="application/json", headers=headers)
+
+
 @router.get("/green-project-categories")
-async def get_green_project_categories(
-    current_user: User = Depends(get_current_user),
+def get_green_project_categories(
+    request: Request,
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """获取绿色金融支持项目目录列表"""
-    result = db.execute(text("""
-        SELECT id, large_code, large_name, medium_code, medium_name, 
-               small_code, small_name, formatted_name
-        FROM green_project_categories
-        ORDER BY 
-          CAST(large_code AS UNSIGNED),
-          CAST(medium_code AS UNSIGNED),
-          CAST(small_code AS UNSIGNED)
-    """)).fetchall()
-    
-    categories = []
-    for row in result:
-        categories.append({
-            "id": row[0],
-            "large_code": row[1],
-            "large_name": row[2],
-            "medium_code": row[3],
-            "medium_name": row[4],
-            "small_code": row[5],
-            "small_name": row[6],
-            "formatted_name": row[7]
-        })
-    
-    return categories
+    snapshot = green_category_catalog.get(db)
+    return catalog_response(request, snapshot.serialized(include_id=True))
 
 
 @router.get("/green-categories")
-async def get_green_categories(
-    current_user: User = Depends(get_current_user),
+def get_green_categories(
+    request: Request,
+    current_user: Principal = Depends(get_current_principal),
     db: Session = Depends(get_db)
 ):
     """获取绿色金融支持项目目录"""
-    result = db.execute(text("""
-        SELECT 
-            large_code,
-            large_name,
-            medium_code,
-            medium_name,
-            small_code,
-            small_name,
-            formatted_name
-        FROM green_project_categories
-        ORDER BY 
-          CAST(large_code AS UNSIGNED),
-          CAST(medium_code AS UNSIGNED),
-          CAST(small_code AS UNSIGNED)
-    """))
-    
-    categories = []
-    for row in result:
-        categories.append({
-            "large_code": row[0],
-            "large_name": row[1],
-            "medium_code": row[2],
-            "medium_name": row[3],
-            "small_code": row[4],
-            "small_name": row[5],
-            "formatted_name": row[6]
-        })
-    
-    return categories
+    snapshot = green_category_catalog.get(db)
+    return catalog_response(request, snapshot.serialized())
 
 
 @router.post("/tasks/{task_id}/mark-non-green")
-async def mark_task_as_non_green(
+def mark_task_as_non_green(
     task_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -1432,18 +1227,18 @@ async def mark_task_as_non_green(
 
 @router.get("/charts/loan-balance-trend")
 async def get_loan_balance_trend(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取最近12个月认定绿色贷款余额趋势"""
     from sqlalchemy import extract, func as sql_func
     
     # 获取最近12个月的数据
-    result = db.query(
+    result = (await db.execute(select(
         extract('year', GreenIdentification.completed_at).label('year'),
         extract('month', GreenIdentification.completed_at).label('month'),
         sql_func.sum(GreenIdentification.green_loan_balance).label('total_balance')
-    ).filter(
+    ).where(
         GreenIdentification.status == TaskStatus.ARCHIVED.value,
         GreenIdentification.completed_at.isnot(None),
         GreenIdentification.green_loan_balance.isnot(None)
@@ -1453,7 +1248,7 @@ async def get_loan_balance_trend(
     ).order_by(
         extract('year', GreenIdentification.completed_at),
         extract('month', GreenIdentification.completed_at)
-    ).limit(12).all()
+    ).limit(12))).all()
     
     # 转换为前端需要的格式
     months = []
@@ -1473,18 +1268,18 @@ async def get_loan_balance_trend(
 
 @router.get("/charts/disbursement-trend")
 async def get_disbursement_trend(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取最近12个月放款金额趋势"""
     from sqlalchemy import extract, func as sql_func
     
     # 获取最近12个月的数据
-    result = db.query(
+    result = (await db.execute(select(
         extract('year', GreenIdentification.disbursement_date).label('year'),
         extract('month', GreenIdentification.disbursement_date).label('month'),
         sql_func.sum(GreenIdentification.loan_amount).label('total_amount')
-    ).filter(
+    ).where(
         GreenIdentification.disbursement_date.isnot(None),
         GreenIdentification.loan_amount.isnot(None)
     ).group_by(
@@ -1493,7 +1288,7 @@ async def get_disbursement_trend(
     ).order_by(
         extract('year', GreenIdentification.disbursement_date),
         extract('month', GreenIdentification.disbursement_date)
-    ).limit(12).all()
+    ).limit(12))).all()
     
     # 转换为前端需要的格式
     months = []
@@ -1513,23 +1308,23 @@ async def get_disbursement_trend(
 
 @router.get("/charts/green-category-distribution")
 async def get_green_category_distribution(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取截止当前时点绿色大类占比"""
     from sqlalchemy import func as sql_func
     
     # 按绿色大类统计当前余额
-    result = db.query(
+    result = (await db.execute(select(
         GreenIdentification.project_category_large.label('category'),
         sql_func.sum(GreenIdentification.green_loan_balance).label('total_balance')
-    ).filter(
+    ).where(
         GreenIdentification.status == TaskStatus.ARCHIVED.value,
         GreenIdentification.green_loan_balance.isnot(None),
         GreenIdentification.project_category_large.isnot(None)
     ).group_by(
         GreenIdentification.project_category_large
-    ).all()
+    ))).all()
     
     # 转换为前端需要的格式
     categories = []
@@ -29,7 +29,7 @@ class OperationLogResponse(BaseModel):
 
 
 @router.get("/operations", response_model=dict)
-async def get_operation_logs(
+def get_operation_logs(
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(10, ge=1, le=100, description="每页数量"),
     operator_account: Optional[str] = Query(None, description="操作人账号"),
@@ -64,7 +64,7 @@ async def get_operation_logs(
 
 
 @router.delete("/operations/{log_id}")
-async def delete_operation_log(log_id: int, db: Session = Depends(get_db)):
+def delete_operation_log(log_id: int, db: Session = Depends(get_db)):
     """删除操作日志"""
     log = db.query(OperationLog).filter(OperationLog.id == log_id).first()
     if not log:
@@ -76,7 +76,7 @@ async def delete_operation_log(log_id: int, db: Session = Depends(get_db)):
 
 
 @router.delete("/operations")
-async def batch_delete_operation_logs(log_ids: List[int], db: Session = Depends(get_db)):
+def batch_delete_operation_logs(log_ids: List[int], db: Session = Depends(get_db)):
     """批量删除操作日志"""
     db.query(OperationLog).filter(OperationLog.id.in_(log_ids)).delete(synchronize_session=False)
     db.commit()
@@ -104,7 +104,7 @@ class LoginLogResponse(BaseModel):
 
 
 @router.get("/logins", response_model=dict)
-async def get_login_logs(
+def get_login_logs(
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(10, ge=1, le=100, description="每页数量"),
     user_account: Optional[str] = Query(None, description="用户账号"),
@@ -139,7 +139,7 @@ async def get_login_logs(
 
 
 @router.delete("/logins/{log_id}")
-async def delete_login_log(log_id: int, db: Session = Depends(get_db)):
+def delete_login_log(log_id: int, db: Session = Depends(get_db)):
     """删除登录日志"""
     log = db.query(LoginLog).filter(LoginLog.id == log_id).first()
     if not log:
@@ -151,7 +151,7 @@ async def delete_login_log(log_id: int, db: Session = Depends(get_db)):
 
 
 @router.delete("/logins")
-async def batch_delete_login_logs(log_ids: List[int], db: Session = Depends(get_db)):
+def batch_delete_login_logs(log_ids: List[int], db: Session = Depends(get_db)):
     """批量删除登录日志"""
     db.query(LoginLog).filter(LoginLog.id.in_(log_ids)).delete(synchronize_session=False)
     db.commit()
@@ -183,7 +183,7 @@ class ExceptionLogResponse(BaseModel):
 
 
 @router.get("/exceptions", response_model=dict)
-async def get_exception_logs(
+def get_exception_logs(
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(10, ge=1, le=100, description="每页数量"),
     exception_module: Optional[str] = Query(None, description="异常模块"),
@@ -218,7 +218,7 @@ async def get_exception_logs(
 
 
 @router.get("/exceptions/{log_id}", response_model=ExceptionLogResponse)
-async def get_exception_log_detail(log_id: int, db: Session = Depends(get_db)):
+def get_exception_log_detail(log_id: int, db: Session = Depends(get_db)):
     """获取异常日志详情"""
     log = db.query(ExceptionLog).filter(ExceptionLog.id == log_id).first()
     if not log:
@@ -228,7 +228,7 @@ async def get_exception_log_detail(log_id: int, db: Session = Depends(get_db)):
 
 
 @router.patch("/exceptions/{log_id}/resolve")
-async def resolve_exception_log(
+def resolve_exception_log(
     log_id: int,
     resolved_note: Optional[str] = Query(None, description="解决备注"),
     current_user_id: int = Query(..., description="当前用户ID"),
@@ -249,7 +249,7 @@ async def resolve_exception_log(
 
 
 @router.delete("/exceptions/{log_id}")
-async def delete_exception_log(log_id: int, db: Session = Depends(get_db)):
+def delete_exception_log(log_id: int, db: Session = Depends(get_db)):
     """删除异常日志"""
     log = db.query(ExceptionLog).filter(ExceptionLog.id == log_id).first()
     if not log:
@@ -261,7 +261,7 @@ async def delete_exception_log(log_id: int, db: Session = Depends(get_db)):
 
 
 @router.delete("/exceptions")
-async def batch_delete_exception_logs(log_ids: List[int], db: Session = Depends(get_db)):
+def batch_delete_exception_logs(log_ids: List[int], db: Session = Depends(get_db)):
     """批量删除异常日志"""
     db.query(ExceptionLog).filter(ExceptionLog.id.in_(log_ids)).delete(synchronize_session=False)
     db.commit()
@@ -271,7 +271,7 @@ async def batch_delete_exception_logs(log_ids: List[int], db: Session = Depends(
 # ==================== 统计信息 ====================
 
 @router.get("/statistics")
-async def get_log_statistics(db: Session = Depends(get_db)):
+def get_log_statistics(db: Session = Depends(get_db)):
     """获取日志统计信息"""
     # 今日操作日志数
     today = datetime.now().date()
@@ -6,12 +6,14 @@ from app.database import get_db
 from app.models.user import User, Role as RoleModel, Organization as OrganizationModel
 from app.schemas.user import UserCreate, UserUpdate, User as UserSchema, RoleCreate, Role as RoleSchema, OrganizationCreate, Organization
 from app.services.auth import get_current_user, get_password_hash
+from app.services.org_tree import org_tree_cache
+from app.services.user_cache import user_principal_cache
 
 router = APIRouter(prefix="/api/system", tags=["系统管理"])
 
 
 @router.get("/users", response_model=List[UserSchema])
-async def get_users(
+def get_users(
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
     current_user: User = Depends(get_current_user),
@@ -29,7 +31,7 @@ async def get_users(
 
 
 @router.post("/users", response_model=UserSchema)
-async def create_user(
+def create_user(
     user_data: UserCreate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -69,7 +71,7 @@ async def create_user(
 
 
 @router.put("/users/{user_id}", response_model=UserSchema)
-async def update_user(
+def update_user(
     user_id: int,
     user_data: UserUpdate,
     current_user: User = Depends(get_current_user),
@@ -104,11 +106,14 @@ async def update_user(
     db.commit()
     db.refresh(user)
     
+    # 用户信息已变更（可能被禁用或调整机构、角色），使已认证用户缓存失效
+    user_principal_cache.invalidate(user.username)
+    
     return user
 
 
 @router.delete("/users/{user_id}")
-async def delete_user(
+def delete_user(
     user_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -121,14 +126,16 @@ async def delete_user(
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
     
+    username = user.username
     db.delete(user)
     db.commit()
+    user_principal_cache.invalidate(username)
     
     return {"message": "用户已删除"}
 
 
 @router.post("/users/{user_id}/reset-password")
-async def reset_user_password(
+def reset_user_password(
     user_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -155,7 +162,7 @@ async def reset_user_password(
 
 
 @router.get("/roles", response_model=List[RoleSchema])
-async def get_roles(
+def get_roles(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -165,7 +172,7 @@ async def get_roles(
 
 
 @router.post("/roles", response_model=RoleSchema)
-async def create_role(
+def create_role(
     role_data: RoleCreate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -203,7 +210,7 @@ async def create_role(
 
 
 @router.get("/roles/{role_id}", response_model=RoleSchema)
-async def get_role_detail(
+def get_role_detail(
     role_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -220,7 +227,7 @@ async def get_role_detail(
 
 
 @router.put("/roles/{role_id}", response_model=RoleSchema)
-async def update_role(
+def update_role(
     role_id: int,
     role_data: RoleCreate,
     current_user: User = Depends(get_current_user),
@@ -242,11 +249,14 @@ async def update_role(
     db.commit()
     db.refresh(role)
     
+    # 角色权限变更会改变该角色下用户的权限版本，使已认证用户缓存失效
+    user_principal_cache.invalidate()
+    
     return role
 
 
 @router.delete("/roles/{role_id}")
-async def delete_role(
+def delete_role(
     role_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -271,7 +281,7 @@ async def delete_role(
 
 
 @router.get("/organizations")
-async def get_organizations(
+def get_organizations(
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=1000),
     name: Optional[str] = Query(None),
@@ -321,7 +331,7 @@ async def get_organizations(
 
 
 @router.post("/organizations", response_model=Organization)
-async def create_organization(
+def create_organization(
     org_data: OrganizationCreate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -360,6 +370,9 @@ async def create_organization(
         db.commit()
         db.refresh(org)
         
+        # 机构树发生变化，使机构树缓存失效
+        org_tree_cache.invalidate()
+        
         return org
     except Exception as e:
         db.rollback()
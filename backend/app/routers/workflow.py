@@ -10,6 +10,7 @@ from app.models.user import User
 from app.models.workflow import ProcessDefinition, ProcessInstance, ProcessTask, TaskNode
 from app.services.bpmn_engine import BpmnWorkflowEngine
 from app.services.auth import get_current_user
+from app.services.process_model import process_model_cache
 
 router = APIRouter(prefix="/api/workflow", tags=["流程管理"])
 
@@ -64,7 +65,7 @@ class TaskCompleteRequest(BaseModel):
 # ==================== 流程定义管理 ====================
 
 @router.post("/definitions", response_model=ProcessDefinitionResponse)
-async def create_definition(
+def create_definition(
     data: ProcessDefinitionCreate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -99,7 +100,7 @@ async def create_definition(
 
 
 @router.get("/definitions", response_model=List[ProcessDefinitionResponse])
-async def get_definitions(
+def get_definitions(
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
     status: Optional[str] = None,
@@ -126,7 +127,7 @@ async def get_definitions(
 
 
 @router.get("/definitions/{definition_id}", response_model=ProcessDefinitionResponse)
-async def get_definition(
+def get_definition(
     definition_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -159,7 +160,7 @@ async def get_definition(
 
 
 @router.put("/definitions/{definition_id}")
-async def update_definition(
+def update_definition(
     definition_id: int,
     data: ProcessDefinitionUpdate,
     current_user: User = Depends(get_current_user),
@@ -186,11 +187,14 @@ async def update_definition(
     definition.updated_at = datetime.now()
     db.commit()
     
+    # 使编译后的流程模型缓存失效
+    process_model_cache.invalidate(definition_id)
+    
     return definition
 
 
 @router.delete("/definitions/{definition_id}")
-async def delete_definition(
+def delete_definition(
     definition_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -227,6 +231,7 @@ async def delete_definition(
         # 删除流程定义
         db.delete(definition)
         db.commit()
+        process_model_cache.invalidate(definition_id)
         
         return {"message": "流程定义删除成功"}
     except HTTPException:
@@ -239,7 +244,7 @@ async def delete_definition(
 
 
 @router.post("/definitions/{definition_id}/activate")
-async def activate_definition(
+def activate_definition(
     definition_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -268,7 +273,7 @@ async def activate_definition(
 
 
 @router.post("/definitions/{definition_id}/deactivate")
-async def deactivate_definition(
+def deactivate_definition(
     definition_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -302,7 +307,7 @@ async def deactivate_definition(
 
 
 @router.post("/definitions/{definition_id}/nodes")
-async def create_task_nodes(
+def create_task_nodes(
     definition_id: int,
     nodes: List[TaskNodeCreate],
     current_user: User = Depends(get_current_user),
@@ -335,7 +340,7 @@ async def create_task_nodes(
 
 
 @router.get("/definitions/{definition_id}/nodes")
-async def get_task_nodes(
+def get_task_nodes(
     definition_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -350,7 +355,7 @@ async def get_task_nodes(
 # ==================== 流程实例管理 ====================
 
 @router.post("/instances")
-async def start_instance(
+def start_instance(
     data: ProcessInstanceCreate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -367,7 +372,7 @@ async def start_instance(
 
 
 @router.get("/instances")
-async def get_instances(
+def get_instances(
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
     status: Optional[str] = None,
@@ -418,7 +423,7 @@ async def get_instances(
 
 
 @router.delete("/instances/{instance_id}")
-async def delete_instance(
+def delete_instance(
     instance_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -447,7 +452,7 @@ async def delete_instance(
 
 
 @router.get("/instances/{instance_id}")
-async def get_instance(
+def get_instance(
     instance_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -469,7 +474,7 @@ async def get_instance(
 # ==================== 任务管理 ====================
 
 @router.get("/tasks/my-tasks")
-async def get_my_tasks(
+def get_my_tasks(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -480,7 +485,7 @@ async def get_my_tasks(
 
 
 @router.post("/tasks/{task_id}/complete")
-async def complete_task(
+def complete_task(
     task_id: int,
     data: TaskCompleteRequest,
     current_user: User = Depends(get_current_user),
@@ -498,7 +503,7 @@ async def complete_task(
 
 
 @router.get("/instances/{instance_id}/tasks")
-async def get_instance_tasks(
+def get_instance_tasks(
     instance_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
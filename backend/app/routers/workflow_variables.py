@@ -11,7 +11,7 @@ router = APIRouter(prefix="/api/workflow-variables", tags=["流程变量"])
 
 
 @router.get("", response_model=List[WorkflowVariableResponse])
-async def get_variables(
+def get_variables(
     definition_id: Optional[int] = Query(None, description="流程定义ID"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -49,7 +49,7 @@ async def get_variables(
 
 
 @router.post("", response_model=WorkflowVariableResponse)
-async def create_variable(
+def create_variable(
     data: WorkflowVariableCreate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -80,7 +80,7 @@ async def create_variable(
 
 
 @router.get("/{variable_id}", response_model=WorkflowVariableResponse)
-async def get_variable(
+def get_variable(
     variable_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -96,7 +96,7 @@ async def get_variable(
 
 
 @router.put("/{variable_id}", response_model=WorkflowVariableResponse)
-async def update_variable(
+def update_variable(
     variable_id: int,
     data: WorkflowVariableUpdate,
     current_user: User = Depends(get_current_user),
@@ -131,7 +131,7 @@ async def update_variable(
 
 
 @router.delete("/{variable_id}")
-async def delete_variable(
+def delete_variable(
     variable_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
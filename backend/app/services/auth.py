@@ -1,8 +1,11 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
+import hashlib
+import json
 from jose import JWTError, jwt
 import bcrypt
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
@@ -10,10 +13,24 @@ from app.config import settings
 from app.database import get_db
 from app.models.user import User
 from app.schemas.user import User as UserSchema
+from app.services.user_cache import CachedUser, user_principal_cache
+from app.services.org_tree import org_tree_cache
 
 security = HTTPBearer()
 
 
+@dataclass(frozen=True)
+class Principal:
+    """令牌中携带的用户身份，供只读接口鉴权使用，无需加载 User 对象"""
+    id: int
+    username: str
+    org_id: Optional[int]
+    org_level: Optional[int]
+    role_id: Optional[int]
+    is_superuser: bool
+    permission_version: str
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     # 使用 bcrypt 直接验证密码
     try:
@@ -40,13 +57,36 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def verify_token(credentials: HTTPAuthorizationCredentials, db: Session) -> User:
+def compute_permission_version(user: User, permissions: Optional[list]) -> str:
+    """计算用户的权限版本：角色、机构、超级用户标志或角色权限变化时版本随之变化"""
+    raw = json.dumps(
+        [user.role_id, user.org_id, bool(user.is_superuser), permissions or []],
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def create_principal_claims(db: Session, user: User) -> dict:
+    """生成令牌中的用户身份声明"""
+    permissions = user.role.permissions if user.role else []
+    org = org_tree_cache.get(db).get(user.org_id)
+    return {
+        "sub": user.username,
+        "uid": user.id,
+        "org": user.org_id,
+        "lvl": org.level if org else None,
+        "rid": user.role_id,
+        "su": bool(user.is_superuser),
+        "pv": compute_permission_version(user, permissions)
+    }
+
+
+def _decode_token(credentials: HTTPAuthorizationCredentials) -> dict:
     try:
-        print(f"DEBUG: verify_token called - token={credentials.credentials[:20] if credentials else 'None'}...")
         payload = jwt.decode(credentials.credentials, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        print(f"DEBUG: JWT decoded successfully - username={username}")
-        if username is None:
+        if payload.get("sub") is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="无效的认证凭据",
@@ -56,29 +96,90 @@ def verify_token(credentials: HTTPAuthorizationCredentials, db: Session) -> User
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="无效的认证凭据",
         )
-    
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="用户不存在",
-        )
-    if not user.is_active:
+    return payload
+
+
+def _get_cached_user(db: Session, username: str) -> CachedUser:
+    """获取用户快照：优先使用缓存，未命中时查询数据库并缓存"""
+    cached = user_principal_cache.get(username)
+    if cached is None:
+        user = db.query(User).options(joinedload(User.role)).filter(User.username == username).first()
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="用户不存在",
+            )
+        permissions = user.role.permissions if user.role else []
+        cached = user_principal_cache.put(user, compute_permission_version(user, permissions))
+    if not cached.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户已被禁用",
         )
-    return user
+    return cached
 
 
-async def get_current_user(
+def peek_cached_user(credentials: HTTPAuthorizationCredentials) -> Optional[CachedUser]:
+    """只从用户缓存获取令牌对应的用户，未命中时返回 None（不访问数据库）"""
+    payload = _decode_token(credentials)
+    return user_principal_cache.get(payload["sub"])
+
+
+def verify_token(credentials: HTTPAuthorizationCredentials, db: Session) -> User:
+    payload = _decode_token(credentials)
+    return _get_cached_user(db, payload["sub"]).to_user()
+
+
+def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> User:
-    print(f"DEBUG: get_current_user called - credentials={credentials.credentials[:20] if credentials else 'None'}...")
     return verify_token(credentials, db)
 
 
+def get_current_principal(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> Principal:
+    """获取令牌中的用户身份（只读接口使用）
+
+    用户状态和权限版本从用户缓存中校验，缓存命中时不访问数据库；
+    用户被禁用、或角色/机构/权限变更后，旧令牌会被拒绝
+    """
+    payload = _decode_token(credentials)
+    cached = _get_cached_user(db, payload["sub"])
+    values = cached.values
+    
+    # 兼容不含身份声明的旧令牌：使用缓存中的用户信息
+    if "pv" not in payload:
+        org = org_tree_cache.get(db).get(values["org_id"])
+        return Principal(
+            id=values["id"],
+            username=values["username"],
+            org_id=values["org_id"],
+            org_level=org.level if org else None,
+            role_id=values["role_id"],
+            is_superuser=bool(values["is_superuser"]),
+            permission_version=cached.permission_version
+        )
+    
+    if payload["pv"] != cached.permission_version or payload.get("uid") != values["id"]:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="用户权限已变更，请重新登录",
+        )
+    
+    return Principal(
+        id=payload["uid"],
+        username=payload["sub"],
+        org_id=payload.get("org"),
+        org_level=payload.get("lvl"),
+        role_id=payload.get("rid"),
+        is_superuser=bool(payload.get("su")),
+        permission_version=payload["pv"]
+    )
+
+
 def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
     user = db.query(User).filter(User.username == username).first()
     if not user:
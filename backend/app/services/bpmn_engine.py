@@ -239,9 +239,14 @@ class BpmnWorkflowEngine:
     def get_instance_history(self, instance_id: int) -> List[Dict]:
         """获取实例历史记录"""
         tasks = self.get_instance_tasks(instance_id)
+        # 办理人一次性加载
+        assignee_ids = {task.assignee_id for task in tasks if task.assignee_id}
+        assignees = {
+            user.id: user for user in self.db.query(User).filter(User.id.in_(assignee_ids)).all()
+        } if assignee_ids else {}
         history = []
         for task in tasks:
-            assignee = self.db.query(User).get(task.assignee_id) if task.assignee_id else None
+            assignee = assignees.get(task.assignee_id)
             history.append({
                 "task_id": task.id,
                 "task_name": task.task_name,
@@ -17,6 +17,30 @@ class BPMNNode:
     task_key: Optional[str] = None  # 任务键，用于匹配处理人
 
 
+def map_node_name_to_task_key(node_name: str) -> str:
+    """将 BPMN 节点名称映射到 task_key（节点未声明 taskKey 扩展属性时的后备规则）
+
+    根据节点名称中的关键词映射到对应的 task_key：
+    - "客户经理" -> "manager_identification"
+    - "二级分行" -> "branch_review"
+    - "一级分行" -> "first_approval"
+    - "复核" -> "final_review"
+    """
+    if "客户经理" in node_name:
+        return "manager_identification"
+    elif "二级分行" in node_name:
+        return "branch_review"
+    elif "一级分行" in node_name and "复核" in node_name:
+        return "final_review"
+    elif "一级分行" in node_name:
+        return "first_approval"
+    elif "复核" in node_name:
+        return "final_review"
+    else:
+        # 默认返回节点名称的拼音首字母或简化版本
+        return node_name.lower().replace(" ", "_")
+
+
 @dataclass
 class BPMNFlow:
     """BPMN 序列流"""
@@ -37,6 +61,9 @@ class BPMNParser:
         'di': 'http://www.omg.org/spec/DD/20100524/DI'
     }
     
+    # 任务节点的扩展属性名，如 <bpmn:userTask gfms:taskKey="branch_review"/>（任意命名空间前缀均可）
+    TASK_KEY_ATTRIBUTE = 'taskKey'
+    
     @staticmethod
     def parse(xml_string: str) -> Dict[str, any]:
         """解析 BPMN XML"""
@@ -59,13 +86,18 @@ class BPMNParser:
             # 识别流程起始节点
             start_nodes = [n for n in nodes if n.type == 'start']
             
+            # 构建 task_key 与任务节点的双向索引
+            task_nodes, node_task_keys = BPMNParser._build_task_index(nodes)
+            
             return {
                 'name': process_name,
                 'id': process_id,
                 'nodes': nodes,
                 'flows': flows,
                 'flow_graph': flow_graph,
-                'start_nodes': start_nodes
+                'start_nodes': start_nodes,
+                'task_nodes': task_nodes,
+                'node_task_keys': node_task_keys
             }
         except Exception as e:
             raise ValueError(f"解析 BPMN XML 失败: {str(e)}")
@@ -124,26 +156,26 @@ class BPMNParser:
                 # 提取用户任务
                 for user_task in process.findall(f'{{{namespace}}}userTask'):
                     node_id = user_task.get('id')
-                    task_key = user_task.get('id', '').replace('UserTask_', '').lower()
+                    node_name = user_task.get('name', node_id)
                     
                     nodes.append(BPMNNode(
                         id=node_id,
-                        name=user_task.get('name', node_id),
+                        name=node_name,
                         type='task',
-                        task_key=task_key
+                        task_key=BPMNParser._extract_task_key(user_task, node_name)
                     ))
                 
                 # 提取其他任务类型（serviceTask等）
                 for task_type in ['task', 'serviceTask', 'scriptTask', 'businessRuleTask', 'receiveTask', 'sendTask', 'manualTask']:
                     for task in process.findall(f'{{{namespace}}}{task_type}'):
                         node_id = task.get('id')
-                        task_key = task.get('id', '').replace(f'{task_type[:-4]}_', '').lower()
+                        node_name = task.get('name', node_id)
                         
                         nodes.append(BPMNNode(
                             id=node_id,
-                            name=task.get('name', node_id),
+                            name=node_name,
                             type='task',
-                            task_key=task_key
+                            task_key=BPMNParser._extract_task_key(task, node_name)
                         ))
                 
                 # 提取网关
@@ -165,6 +197,33 @@ class BPMNParser:
         
         return nodes
     
+    @staticmethod
+    def _extract_task_key(element, node_name: str) -> str:
+        """提取任务节点的 task_key
+        
+        优先使用节点上声明的 taskKey 扩展属性；未声明时按节点名称关键词映射（兼容旧流程定义）
+        """
+        for attr_name, value in element.attrib.items():
+            # 带命名空间的属性名形如 {namespace}taskKey
+            if attr_name.rsplit('}', 1)[-1] == BPMNParser.TASK_KEY_ATTRIBUTE and value.strip():
+                return value.strip()
+        return map_node_name_to_task_key(node_name or '')
+    
+    @staticmethod
+    def _build_task_index(nodes: List[BPMNNode]):
+        """构建 task_key -> 任务节点、节点ID -> task_key 的双向索引
+        
+        同一 task_key 对应多个节点时取第一个
+        """
+        task_nodes = {}
+        node_task_keys = {}
+        for node in nodes:
+            if node.type != 'task':
+                continue
+            node_task_keys[node.id] = node.task_key
+            task_nodes.setdefault(node.task_key, node)
+        return task_nodes, node_task_keys
+    
     @staticmethod
     def _extract_flows(root) -> List[BPMNFlow]:
         """提取所有序列流"""
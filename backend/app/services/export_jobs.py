@@ -0,0 +1,199 @@
+"""
+后台导出任务
+导出请求只登记任务并立即返回任务ID，由后台线程池生成 CSV 文件写入导出目录，
+前端轮询进度，完成后下载文件（支持 HTTP Range 断点续传）
+
+任务状态同时写入导出目录下的 <job_id>.json，多个 worker 进程部署时任意进程都能查询进度
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Query
+
+from app.config import settings
+from app.database import SessionLocal
+from app.services.task_export import ExportFilters, iter_export_csv
+
+logger = logging.getLogger(__name__)
+
+
+class ExportJobStatus:
+    """导出任务状态"""
+    PENDING = "pending"  # 排队中
+    RUNNING = "running"  # 生成中
+    COMPLETED = "completed"  # 已完成
+    FAILED = "failed"  # 失败
+
+
+@dataclass
+class ExportJob:
+    """导出任务"""
+    id: str
+    user_id: int
+    filters: Dict
+    status: str = ExportJobStatus.PENDING
+    total: Optional[int] = None  # 预计导出行数
+    processed: int = 0  # 已导出行数
+    file_size: int = 0
+    error: Optional[str] = None
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+    finished_at: Optional[str] = None
+
+    @property
+    def progress(self) -> int:
+        """导出进度（百分比）"""
+        if self.status == ExportJobStatus.COMPLETED:
+            return 100
+        if not self.total:
+            return 0
+        return min(99, int(self.processed * 100 / self.total))
+
+    def to_dict(self) -> Dict:
+        data = asdict(self)
+        data["progress"] = self.progress
+        return data
+
+
+class ExportJobManager:
+    """导出任务管理器：线程池执行导出，任务状态保存在内存并同步到状态文件"""
+
+    def __init__(self, export_dir: str, max_workers: int = 2, retention_seconds: int = 86400):
+        self.export_dir = export_dir
+        self.max_workers = max_workers
+        self.retention_seconds = retention_seconds
+        self._jobs: Dict[str, ExportJob] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="export-job")
+            return self._executor
+
+    def file_path(self, job_id: str) -> str:
+        """导出文件路径"""
+        return os.path.join(self.export_dir, f"{job_id}.csv")
+
+    def _status_path(self, job_id: str) -> str:
+        return os.path.join(self.export_dir, f"{job_id}.json")
+
+    def submit(self, user_id: int, filters: ExportFilters, query: Query) -> ExportJob:
+        """登记导出任务并提交到线程池"""
+        os.makedirs(self.export_dir, exist_ok=True)
+        self.cleanup()
+
+        job = ExportJob(id=uuid.uuid4().hex, user_id=user_id, filters=asdict(filters))
+        with self._lock:
+            self._jobs[job.id] = job
+        self._save(job)
+
+        self._get_executor().submit(self._run, job, query)
+        return job
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        """查询导出任务，本进程内没有时从状态文件读取"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+
+        # job_id 只允许十六进制字符，防止路径穿越
+        if not job_id or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        try:
+            with open(self._status_path(job_id), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        data.pop("progress", None)
+        return ExportJob(**data)
+
+    def _run(self, job: ExportJob, query: Query):
+        """在线程池中生成导出文件"""
+        file_path = self.file_path(job.id)
+        temp_path = f"{file_path}.part"
+        try:
+            job.status = ExportJobStatus.RUNNING
+            db = SessionLocal()
+            try:
+                job.total = query.with_session(db).count()
+            finally:
+                db.close()
+            self._save(job)
+
+            def on_progress(count: int):
+                job.processed = count
+                self._save(job)
+
+            with open(temp_path, "wb") as f:
+                for chunk in iter_export_csv(query, on_progress=on_progress):
+                    f.write(chunk)
+
+            # 写完后再重命名，下载方不会读到未完成的文件
+            os.replace(temp_path, file_path)
+            job.file_size = os.path.getsize(file_path)
+            job.status = ExportJobStatus.COMPLETED
+            logger.info(f"导出任务 {job.id} 完成，共 {job.processed} 条")
+        except Exception as e:
+            logger.error(f"导出任务 {job.id} 失败: {e}")
+            job.status = ExportJobStatus.FAILED
+            job.error = str(e)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        finally:
+            job.finished_at = datetime.now().isoformat()
+            self._save(job)
+
+    def _save(self, job: ExportJob):
+        """将任务状态写入状态文件（先写临时文件再替换，避免读到半个文件）"""
+        status_path = self._status_path(job.id)
+        temp_path = f"{status_path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(job.to_dict(), f, ensure_ascii=False)
+            os.replace(temp_path, status_path)
+        except OSError as e:
+            logger.error(f"保存导出任务状态失败: {e}")
+
+    def cleanup(self):
+        """删除超过保留时间的导出文件和状态文件"""
+        if not os.path.isdir(self.export_dir):
+            return
+        expire_before = time.time() - self.retention_seconds
+        for filename in os.listdir(self.export_dir):
+            path = os.path.join(self.export_dir, filename)
+            try:
+                if os.path.getmtime(path) < expire_before:
+                    os.remove(path)
+                    job_id = filename.split(".", 1)[0]
+                    with self._lock:
+                        job = self._jobs.get(job_id)
+                        if job is not None and job.status in (ExportJobStatus.COMPLETED, ExportJobStatus.FAILED):
+                            del self._jobs[job_id]
+            except OSError:
+                continue
+
+    def shutdown(self):
+        """关闭线程池（不等待正在执行的导出任务）"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# 全局导出任务管理器
+export_job_manager = ExportJobManager(
+    export_dir=settings.EXPORT_DIR,
+    max_workers=settings.EXPORT_JOB_WORKERS,
+    retention_seconds=settings.EXPORT_JOB_RETENTION_SECONDS
+)
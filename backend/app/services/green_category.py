@@ -0,0 +1,276 @@
+"""
+绿色金融支持项目目录缓存
+目录数据量小且很少变动，每个进程加载一次到内存并建立索引，
+分类名称格式化只需查字典，不再访问数据库
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+
+@dataclass(frozen=True)
+class GreenCategory:
+    """绿色金融支持项目目录条目"""
+    id: int
+    large_code: Optional[str]
+    large_name: Optional[str]
+    medium_code: Optional[str]
+    medium_name: Optional[str]
+    small_code: Optional[str]
+    small_name: Optional[str]
+    formatted_name: Optional[str]
+
+
+def _desc_key(*values):
+    """模拟 MySQL 的 ORDER BY ... DESC（NULL 排在最后）"""
+    return tuple((value is not None, value or "") for value in values)
+
+
+def _code_sort_key(code: Optional[str]) -> Tuple[int, ...]:
+    """按编号的数字顺序排序，如 1.2 < 1.10"""
+    if not code:
+        return ()
+    parts = []
+    for part in str(code).split('.'):
+        parts.append(int(part) if part.isdigit() else 0)
+    return tuple(parts)
+
+
+@dataclass(frozen=True)
+class SerializedCatalog:
+    """预先序列化的目录响应体"""
+    body: bytes
+    gzip_body: bytes
+    etag: str
+
+
+@dataclass
+class GreenCategorySnapshot:
+    """目录快照：加载后只读，按名称和编号建立索引"""
+    categories: List[GreenCategory]
+    loaded_at: float
+    by_names: Dict[Tuple, List[GreenCategory]] = field(default_factory=dict)
+    by_large_medium: Dict[Tuple, List[GreenCategory]] = field(default_factory=dict)
+    large_codes: Dict[str, Optional[str]] = field(default_factory=dict)
+    medium_codes: Dict[Tuple, Optional[str]] = field(default_factory=dict)
+    small_codes: Dict[Tuple, Optional[str]] = field(default_factory=dict)
+    _serialized: Dict[bool, SerializedCatalog] = field(default_factory=dict)
+
+    def __post_init__(self):
+        for category in self.categories:
+            self.by_names.setdefault(
+                (category.large_name, category.medium_name, category.small_name), []
+            ).append(category)
+            self.by_large_medium.setdefault(
+                (category.large_name, category.medium_name), []
+            ).append(category)
+
+            # 名称 -> 编号，同名时取编号最大的一条（与原 ORDER BY ... DESC LIMIT 1 一致）
+            if category.large_name is not None:
+                current = self.large_codes.get(category.large_name)
+                if category.large_name not in self.large_codes or _desc_key(category.large_code) > _desc_key(current):
+                    self.large_codes[category.large_name] = category.large_code
+
+            medium_key = (category.large_code, category.medium_name)
+            if category.medium_name is not None:
+                current = self.medium_codes.get(medium_key)
+                if medium_key not in self.medium_codes or _desc_key(category.medium_code) > _desc_key(current):
+                    self.medium_codes[medium_key] = category.medium_code
+
+            small_key = (category.large_code, category.medium_code, category.small_name)
+            if category.small_name is not None:
+                current = self.small_codes.get(small_key)
+                if small_key not in self.small_codes or _desc_key(category.small_code) > _desc_key(current):
+                    self.small_codes[small_key] = category.small_code
+
+    def category_codes(
+        self, large: Optional[str], medium: Optional[str], small: Optional[str]
+    ) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """按名称逐级查找大类、中类、小类编号（同名时取编号最大的一条，上一级编号未找到时下一级不再查找）"""
+        large_code = self.large_codes.get(large) if large else None
+        medium_code = self.medium_codes.get((large_code, medium)) if medium and large_code else None
+        small_code = self.small_codes.get((large_code, medium_code, small)) if small and medium_code else None
+        return large_code, medium_code, small_code
+
+    def sorted_categories(self) -> List[GreenCategory]:
+        """按大类、中类、小类编号排序的目录列表"""
+        return sorted(self.categories, key=lambda c: (
+            _code_sort_key(c.large_code),
+            _code_sort_key(c.medium_code),
+            _code_sort_key(c.small_code),
+            c.id
+        ))
+
+    def serialized(self, include_id: bool = False) -> SerializedCatalog:
+        """获取排好序的目录 JSON 及其 gzip 压缩体和 ETag（每个快照只计算一次）"""
+        cached = self._serialized.get(include_id)
+        if cached is not None:
+            return cached
+
+        items = []
+        for category in self.sorted_categories():
+            item = {} if not include_id else {"id": category.id}
+            item.update({
+                "large_code": category.large_code,
+                "large_name": category.large_name,
+                "medium_code": category.medium_code,
+                "medium_name": category.medium_name,
+                "small_code": category.small_code,
+                "small_name": category.small_name,
+                "formatted_name": category.formatted_name
+            })
+            items.append(item)
+
+        # 与 FastAPI JSONResponse 的编码方式保持一致
+        body = json.dumps(items, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        cached = SerializedCatalog(
+            body=body,
+            gzip_body=gzip.compress(body, mtime=0),
+            etag=f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+        )
+        self._serialized[include_id] = cached
+        return cached
+
+    def format(self, large: Optional[str], medium: Optional[str], small: Optional[str]) -> Optional[str]:
+        """获取格式化的带编号的分类名称（规则与原逐条 SQL 查询一致）"""
+        if not large and not medium and not small:
+            return None
+
+        # 尝试匹配完整的三级分类
+        if large is not None and medium is not None and small is not None:
+            matches = self.by_names.get((large, medium, small))
+            if matches:
+                return matches[0].formatted_name
+
+        # 如果没有找到三级分类，尝试匹配二级分类
+        if large is not None and medium is not None:
+            for category in self.by_large_medium.get((large, medium), []):
+                if category.small_code is None:
+                    return category.formatted_name
+
+        # 如果还是没有，手动拼接带编号的格式
+        large_code = None
+        medium_code = None
+        small_code = None
+
+        if large:
+            large_code = self.large_codes.get(large)
+
+        if medium and large is not None:
+            candidates = self.by_large_medium.get((large, medium), [])
+            match = None
+            if large_code:
+                match = next((c for c in candidates if c.large_code == large_code), None)
+            elif candidates:
+                match = max(candidates, key=lambda c: _desc_key(c.large_code, c.medium_code))
+
+            if match:
+                medium_code = match.medium_code
+                # 如果之前没有large_code，使用查询到的large_code
+                if not large_code:
+                    large_code = match.large_code
+
+        if small and large is not None and medium is not None:
+            candidates = self.by_names.get((large, medium, small), [])
+            match = None
+            if large_code and medium_code:
+                match = next(
+                    (c for c in candidates if c.large_code == large_code and c.medium_code == medium_code),
+                    None
+                )
+            elif candidates:
+                match = max(candidates, key=lambda c: _desc_key(c.large_code, c.medium_code, c.small_code))
+
+            if match:
+                small_code = match.small_code
+                # 验证并更新large_code和medium_code以确保一致性
+                if match.large_code:
+                    large_code = match.large_code
+                if match.medium_code:
+                    medium_code = match.medium_code
+
+        parts = []
+        if large_code and large:
+            parts.append(f"{large_code} {large}")
+        elif large:
+            parts.append(large)
+
+        if medium_code and medium:
+            parts.append(f"{medium_code} {medium}")
+        elif medium:
+            parts.append(medium)
+
+        if small_code and small:
+            parts.append(f"{small_code} {small}")
+        elif small:
+            parts.append(small)
+
+        return '/'.join(parts) if parts else None
+
+
+class GreenCategoryCatalog:
+    """进程内的绿色金融支持项目目录缓存
+
+    首次使用时加载，超过 TTL 后在下一次访问时重新加载；
+    目录数据变更后调用 invalidate() 可立即失效。
+    """
+
+    def __init__(self, ttl_seconds: int = 300):
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[GreenCategorySnapshot] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> GreenCategorySnapshot:
+        """获取目录快照，缓存为空或已过期时从数据库加载"""
+        snapshot = self._snapshot
+        if snapshot is not None and not self._is_expired(snapshot):
+            return snapshot
+
+        # 加载数据库时不持有锁：在 run_sync 中执行时加载过程会让出事件循环，
+        # 持锁会使同一事件循环上的其他请求阻塞在 acquire() 上而死锁
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        snapshot = self._load(db)
+
+        with self._lock:
+            # 加载期间缓存被失效或有更新的加载时，本次结果只用于当前调用
+            if generation == self._generation:
+                self._snapshot = snapshot
+        return snapshot
+
+    def invalidate(self):
+        """使缓存失效，下一次访问时重新加载"""
+        with self._lock:
+            self._generation += 1
+            self._snapshot = None
+
+    def _is_expired(self, snapshot: GreenCategorySnapshot) -> bool:
+        return self.ttl_seconds > 0 and time.monotonic() - snapshot.loaded_at >= self.ttl_seconds
+
+    @staticmethod
+    def _load(db: Session) -> GreenCategorySnapshot:
+        rows = db.execute(text("""
+            SELECT id, large_code, large_name, medium_code, medium_name,
+                   small_code, small_name, formatted_name
+            FROM green_project_categories
+            ORDER BY id
+        """)).fetchall()
+
+        categories = [GreenCategory(*row) for row in rows]
+        return GreenCategorySnapshot(categories=categories, loaded_at=time.monotonic())
+
+
+# 全局目录缓存实例
+green_category_catalog = GreenCategoryCatalog(ttl_seconds=settings.GREEN_CATEGORY_CACHE_TTL_SECONDS)
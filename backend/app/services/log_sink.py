@@ -0,0 +1,247 @@
+"""
+日志批量写入队列
+操作日志、登录日志、异常日志先放入有界的 asyncio 队列，由后台任务按批（条数或时间触发）一次性写入数据库，
+请求处理中记录日志只是入队，不再等待一次数据库提交
+
+队列满时按 LOG_SINK_OVERFLOW_POLICY 处理：
+- block：等待队列空出位置（最多 LOG_SINK_PUT_TIMEOUT 秒），超时后丢弃该条日志；
+  事件循环线程中的同步调用无法等待，按 drop_oldest 处理
+- drop_oldest：丢弃队列中最早的一条日志
+- drop_new：丢弃新日志
+
+后台任务未启动时（如脚本、定时任务中调用）直接同步写入；应用关闭时写完队列中剩余的日志
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple, Type
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import AsyncSessionLocal, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+LogEntry = Tuple[Type, Dict]
+
+# 停止后台任务的标记
+_STOP = object()
+
+
+class OverflowPolicy:
+    """队列满时的处理策略"""
+    BLOCK = "block"  # 等待队列空出位置
+    DROP_OLDEST = "drop_oldest"  # 丢弃最早的日志
+    DROP_NEW = "drop_new"  # 丢弃新日志
+
+
+class LogSink:
+    """日志批量写入队列"""
+
+    def __init__(
+        self,
+        queue_size: int = 10000,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        overflow_policy: str = OverflowPolicy.BLOCK,
+        put_timeout: float = 1.0
+    ):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.put_timeout = put_timeout
+        self.dropped = 0  # 因队列满丢弃的日志数
+        self.failed = 0  # 写入失败的日志数
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._reserved = 0  # 其他线程已预留、尚未入队的位置数
+        self._counter_lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """在当前事件循环中启动后台写入任务"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run())
+        logger.info("日志写入队列已启动")
+
+    async def stop(self):
+        """停止后台写入任务，写完队列中剩余的日志"""
+        if not self.running:
+            return
+        task = self._task
+        await self._queue.put(_STOP)
+        await task
+        self._task = None
+        logger.info(f"日志写入队列已停止（丢弃 {self.dropped} 条，写入失败 {self.failed} 条）")
+
+    def submit(self, model: Type, values: Dict, db: Optional[Session] = None):
+        """记录一条日志（可在任意线程中调用）
+
+        后台任务未运行时使用 db（未传时新建会话）同步写入
+        """
+        entry = (model, values)
+        if not self.running:
+            self._write_sync(db, [entry])
+            return
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is self._loop:
+            # 事件循环线程中的同步调用：直接入队
+            self._put_nowait(entry)
+            return
+
+        # 其他线程中的调用：先预留队列位置，再交给事件循环入队
+        with self._counter_lock:
+            reserved = self._queue.qsize() + self._reserved < self.queue_size
+            if reserved:
+                self._reserved += 1
+        if reserved:
+            self._loop.call_soon_threadsafe(self._put_reserved, entry)
+        elif self.overflow_policy == OverflowPolicy.BLOCK:
+            # 队列已满时阻塞当前线程等待，形成背压
+            future = asyncio.run_coroutine_threadsafe(self._put_wait(entry), self._loop)
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"日志入队失败: {e}")
+        else:
+            self._loop.call_soon_threadsafe(self._put_nowait, entry)
+
+    async def put(self, model: Type, values: Dict):
+        """在事件循环中记录一条日志，block 策略下队列满时等待"""
+        entry = (model, values)
+        if not self.running:
+            self._write_sync(None, [entry])
+        elif self.overflow_policy == OverflowPolicy.BLOCK:
+            await self._put_wait(entry)
+        else:
+            self._put_nowait(entry)
+
+    async def _put_wait(self, entry: LogEntry):
+        try:
+            await asyncio.wait_for(self._queue.put(entry), self.put_timeout)
+        except asyncio.TimeoutError:
+            self._drop()
+
+    def _put_reserved(self, entry: LogEntry):
+        with self._counter_lock:
+            self._reserved -= 1
+        self._put_nowait(entry)
+
+    def _put_nowait(self, entry: LogEntry):
+        try:
+            self._queue.put_nowait(entry)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        self._drop()
+        if self.overflow_policy == OverflowPolicy.DROP_NEW:
+            return
+        self._queue.get_nowait()
+        self._queue.put_nowait(entry)
+
+    def _drop(self):
+        with self._counter_lock:
+            self.dropped += 1
+            dropped = self.dropped
+        if dropped % 1000 == 1:
+            logger.warning(f"日志写入队列已满，累计丢弃 {dropped} 条日志")
+
+    async def _run(self):
+        """后台任务：攒够 batch_size 条或等待 flush_interval 秒后批量写入"""
+        stopping = False
+        while not stopping:
+            entry = await self._queue.get()
+            if entry is _STOP:
+                break
+
+            batch = [entry]
+            deadline = self._loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    entry = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - self._loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        entry = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            await self._write(batch)
+
+        # 写入停止标记之后仍在队列中的日志
+        remaining = []
+        while not self._queue.empty():
+            entry = self._queue.get_nowait()
+            if entry is not _STOP:
+                remaining.append(entry)
+        for start in range(0, len(remaining), self.batch_size):
+            await self._write(remaining[start:start + self.batch_size])
+
+    async def _write(self, batch: List[LogEntry]):
+        """在一个事务中批量写入日志（同一张表的日志用一条多行 INSERT 写入）"""
+        try:
+            async with AsyncSessionLocal() as db:
+                for model, rows in _group_by_model(batch):
+                    await db.execute(insert(model), rows)
+                await db.commit()
+        except Exception as e:
+            with self._counter_lock:
+                self.failed += len(batch)
+            logger.error(f"批量写入日志失败（{len(batch)} 条）: {e}")
+
+    def _write_sync(self, db: Optional[Session], batch: List[LogEntry]):
+        """同步写入日志"""
+        own_session = db is None
+        if own_session:
+            db = SessionLocal()
+        try:
+            for model, rows in _group_by_model(batch):
+                db.execute(insert(model), rows)
+            db.commit()
+        except Exception as e:
+            logger.error(f"写入日志失败: {e}")
+            db.rollback()
+        finally:
+            if own_session:
+                db.close()
+
+
+def _group_by_model(batch: List[LogEntry]) -> List[Tuple[Type, List[Dict]]]:
+    """按日志表（及字段）分组，保持各组内的先后顺序"""
+    groups: Dict[Tuple, List[Dict]] = {}
+    for model, values in batch:
+        groups.setdefault((model, tuple(values)), []).append(values)
+    return [(key[0], rows) for key, rows in groups.items()]
+
+
+# 全局日志写入队列
+log_sink = LogSink(
+    queue_size=settings.LOG_SINK_QUEUE_SIZE,
+    batch_size=settings.LOG_SINK_BATCH_SIZE,
+    flush_interval=settings.LOG_SINK_FLUSH_INTERVAL,
+    overflow_policy=settings.LOG_SINK_OVERFLOW_POLICY,
+    put_timeout=settings.LOG_SINK_PUT_TIMEOUT
+)
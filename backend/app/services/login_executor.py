@@ -0,0 +1,69 @@
+"""
+登录任务线程池
+bcrypt 密码校验是 CPU 密集型操作（约 250ms），登录相关的数据库查询和日志写入也是同步阻塞的，
+放在有界线程池中执行，避免登录高峰时阻塞事件循环上的其他请求
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+
+T = TypeVar("T")
+
+
+class LoginExecutor:
+    """有界的登录线程池：同时执行的登录数不超过 max_workers，排队数超过 max_pending 时直接拒绝"""
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 64):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="login")
+            return self._executor
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """在线程池中执行 func，排队过多时返回 503"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="登录请求过多，请稍后再试",
+                )
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            # 在当前上下文中执行，请求级的上下文变量（如 SQL 统计）在线程池中同样可用
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(
+                self._get_executor(), functools.partial(context.run, func, *args, **kwargs)
+            )
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def shutdown(self):
+        """关闭线程池"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+# 全局登录线程池
+login_executor = LoginExecutor(
+    max_workers=settings.LOGIN_WORKER_THREADS,
+    max_pending=settings.LOGIN_MAX_PENDING
+)
@@ -0,0 +1,176 @@
+"""
+请求性能指标
+按路由模板统计请求耗时、SQL 语句数及耗时、响应大小，以 Prometheus 文本格式输出
+
+SQL 统计通过 SQLAlchemy 的 before/after_cursor_execute 事件实现，监听所有引擎（包括异步引擎）；
+当前请求的统计对象保存在 contextvar 中，线程池中执行的同步接口同样能记到所属请求上。
+指标保存在进程内存中，多 worker 部署时每个 worker 各自输出
+"""
+
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@dataclass
+class RequestStats:
+    """单个请求的统计"""
+    started_at: float = field(default_factory=time.perf_counter)
+    sql_count: int = 0
+    sql_time: float = 0.0  # 秒
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+
+# 当前请求的统计（请求之外为 None）
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_request_stats.get() is not None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request_stats.get()
+    if stats is None:
+        return
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    stats.sql_count += 1
+    stats.sql_time += time.perf_counter() - start_times.pop()
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """按标签分组的直方图"""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: Dict[Tuple[str, ...], List] = {}  # 标签值 -> [各桶计数, 总和, 次数]
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(series[0]), series[1], series[2]) for labels, series in self._series.items()]
+        for labels, counts, total, count in sorted(snapshot):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class Counter:
+    """按标签分组的计数器"""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], int] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], amount: int = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        for labels, value in snapshot:
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class RequestMetrics:
+    """请求指标集合"""
+
+    LABELS = ("method", "route")
+
+    def __init__(self):
+        self.requests_total = Counter(
+            "gfms_http_requests_total", "HTTP 请求数", self.LABELS + ("status",)
+        )
+        self.request_duration = Histogram(
+            "gfms_http_request_duration_seconds", "HTTP 请求耗时（秒）", self.LABELS,
+            (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+        )
+        self.sql_statements = Histogram(
+            "gfms_http_request_sql_statements", "单个请求执行的 SQL 语句数", self.LABELS,
+            (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+        )
+        self.sql_duration = Histogram(
+            "gfms_http_request_sql_duration_seconds", "单个请求的 SQL 总耗时（秒）", self.LABELS,
+            (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+        )
+        self.response_size = Histogram(
+            "gfms_http_response_size_bytes", "响应体大小（字节）", self.LABELS,
+            (100, 1000, 10000, 100000, 1000000, 10000000)
+        )
+
+    def record(self, method: str, route: str, status_code: int, stats: RequestStats, response_size: int):
+        """记录一个请求"""
+        labels = (method, route)
+        self.requests_total.inc(labels + (str(status_code),))
+        self.request_duration.observe(labels, stats.elapsed)
+        self.sql_statements.observe(labels, stats.sql_count)
+        self.sql_duration.observe(labels, stats.sql_time)
+        self.response_size.observe(labels, response_size)
+
+    def render(self) -> str:
+        """输出 Prometheus 文本格式"""
+        lines = []
+        for metric in (self.requests_total, self.request_duration, self.sql_statements, self.sql_duration, self.response_size):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 全局请求指标
+request_metrics = RequestMetrics()
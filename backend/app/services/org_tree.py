@@ -0,0 +1,230 @@
+"""
+机构层级树缓存
+机构数量少且很少变动，每个进程加载一次全部机构并建立父子索引，
+"所有下级机构"、"上级/上上级机构"等层级查询直接在内存中完成，不再逐级查询数据库
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.user import Organization
+
+
+@dataclass(frozen=True)
+class OrgNode:
+    """机构节点"""
+    id: int
+    name: str
+    level: Optional[int]
+    parent_id: Optional[int]
+
+
+@dataclass
+class OrgTreeSnapshot:
+    """机构树快照：加载后只读"""
+    nodes: Dict[int, OrgNode]
+    version: int
+    loaded_at: float
+    children: Dict[int, List[int]] = field(default_factory=dict)
+    _branch_paths: Optional[Dict[int, Tuple[str, str, str]]] = None
+
+    def __post_init__(self):
+        for node in self.nodes.values():
+            if node.parent_id is not None:
+                self.children.setdefault(node.parent_id, []).append(node.id)
+
+    def get(self, org_id: Optional[int]) -> Optional[OrgNode]:
+        """根据ID获取机构"""
+        if org_id is None:
+            return None
+        return self.nodes.get(org_id)
+
+    def parent(self, org_id: Optional[int]) -> Optional[OrgNode]:
+        """获取上级机构"""
+        node = self.get(org_id)
+        return self.get(node.parent_id) if node else None
+
+    def ancestors(self, org_id: Optional[int]) -> List[OrgNode]:
+        """获取所有上级机构，由近及远（不含自身）"""
+        result = []
+        visited = set()  # 防止数据错误导致的循环
+        node = self.parent(org_id)
+        while node and node.id not in visited:
+            visited.add(node.id)
+            result.append(node)
+            node = self.get(node.parent_id)
+        return result
+
+    def ancestor(self, org_id: Optional[int], generations: int) -> Optional[OrgNode]:
+        """获取向上第 N 代机构（1 为上级，2 为上上级）"""
+        chain = self.ancestors(org_id)
+        return chain[generations - 1] if 0 < generations <= len(chain) else None
+
+    def ancestor_at_level(self, org_id: Optional[int], level: int) -> Optional[OrgNode]:
+        """获取指定层级的最近上级机构（含自身）"""
+        node = self.get(org_id)
+        if node and node.level == level:
+            return node
+        return next((n for n in self.ancestors(org_id) if n.level == level), None)
+
+    def descendant_ids(self, org_id: int, include_self: bool = True) -> List[int]:
+        """获取所有下级机构ID（广度优先，默认包含自身）"""
+        result = [org_id] if include_self else []
+        visited = {org_id}
+        queue = [org_id]
+        while queue:
+            current_id = queue.pop(0)
+            for child_id in self.children.get(current_id, []):
+                if child_id in visited:
+                    continue
+                visited.add(child_id)
+                result.append(child_id)
+                queue.append(child_id)
+        return result
+
+    def branch_path(self, org_id: Optional[int]) -> Tuple[str, str, str]:
+        """获取机构所属的（一级分行, 二级分行, 支行）名称
+
+        - 支行：level=3
+        - 一级分行：level=2 且上级 level=1
+        - 二级分行：level=2 且上级 level=2
+        总行（level=1）不显示在一级分行列
+        """
+        level1_name = ''  # 一级分行
+        level2_name = ''  # 二级分行
+        branch_name = ''  # 支行
+
+        org = self.get(org_id)
+        if org:
+            parent = self.get(org.parent_id)
+            grandparent = self.get(parent.parent_id) if parent else None
+
+            if org.level == 3:
+                # 支行
+                branch_name = org.name
+                if parent:
+                    # 如果父机构是level=2且父机构的父机构是总行（level=1），说明父机构是一级分行
+                    if parent.level == 2 and grandparent and grandparent.level == 1:
+                        # 父机构是一级分行，二级分行为空
+                        level1_name = parent.name
+                    else:
+                        # 其他情况，父机构是二级分行
+                        level2_name = parent.name
+                        if grandparent:
+                            level1_name = grandparent.name
+            elif org.level == 2:
+                if parent and parent.level == 1:
+                    # 一级分行：level=2 且 parent_level=1
+                    level1_name = org.name
+                elif parent and parent.level == 2:
+                    # 二级分行：level=2 且 parent_level=2
+                    level2_name = org.name
+                    level1_name = parent.name
+                else:
+                    # 没有父机构，默认为一级分行
+                    level1_name = org.name
+
+        # 确保一级分行列不显示"总行"
+        if '总行' in level1_name:
+            level1_name = ''
+
+        return level1_name, level2_name, branch_name
+
+    def branch_paths(self) -> Dict[int, Tuple[str, str, str]]:
+        """所有机构的（一级分行, 二级分行, 支行）名称投影（每个快照只计算一次）"""
+        if self._branch_paths is None:
+            self._branch_paths = {org_id: self.branch_path(org_id) for org_id in self.nodes}
+        return self._branch_paths
+
+    def match_branch_path(
+        self,
+        level1_branch: Optional[str] = None,
+        level2_branch: Optional[str] = None,
+        branch: Optional[str] = None
+    ) -> List[int]:
+        """按一级分行、二级分行、支行名称筛选机构ID，三个条件分别匹配各自的列（模糊匹配）"""
+        org_ids = []
+        for org_id, (level1_name, level2_name, branch_name) in self.branch_paths().items():
+            if level1_branch and level1_branch not in level1_name:
+                continue
+            if level2_branch and level2_branch not in level2_name:
+                continue
+            if branch and branch not in branch_name:
+                continue
+            org_ids.append(org_id)
+        return org_ids
+
+    def islvl2(self, org_id: Optional[int]) -> Optional[str]:
+        """计算流程变量 islvl2：根据机构上上级的层级判断是否经过二级分行
+
+        上上级为总行（level=1）时返回 '1'，为分行（level=2）时返回 '2'，否则返回 None
+        """
+        grandparent = self.ancestor(org_id, 2)
+        if grandparent:
+            if grandparent.level == 1:
+                return '1'
+            elif grandparent.level == 2:
+                return '2'
+        return None
+
+
+class OrgTreeCache:
+    """进程内的机构树缓存
+
+    首次使用时加载，超过 TTL 后在下一次访问时重新加载；
+    机构新增或修改后调用 invalidate() 可立即失效（版本号递增）。
+    """
+
+    def __init__(self, ttl_seconds: int = 300):
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[OrgTreeSnapshot] = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> OrgTreeSnapshot:
+        """获取机构树快照，缓存为空或已过期时从数据库加载"""
+        snapshot = self._snapshot
+        if snapshot is not None and not self._is_expired(snapshot):
+            return snapshot
+
+        # 加载数据库时不持有锁（原因见 GreenCategoryCatalog.get）
+        with self._lock:
+            self._version += 1
+            version = self._version
+        snapshot = self._load(db, version)
+
+        with self._lock:
+            # 加载期间缓存被失效或有更新的加载时，本次结果只用于当前调用
+            if version == self._version:
+                self._snapshot = snapshot
+        return snapshot
+
+    def invalidate(self):
+        """使缓存失效，下一次访问时重新加载"""
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+
+    def _is_expired(self, snapshot: OrgTreeSnapshot) -> bool:
+        return self.ttl_seconds > 0 and time.monotonic() - snapshot.loaded_at >= self.ttl_seconds
+
+    @staticmethod
+    def _load(db: Session, version: int) -> OrgTreeSnapshot:
+        rows = db.query(
+            Organization.id,
+            Organization.name,
+            Organization.level,
+            Organization.parent_id
+        ).all()
+
+        nodes = {row.id: OrgNode(row.id, row.name, row.level, row.parent_id) for row in rows}
+        return OrgTreeSnapshot(nodes=nodes, version=version, loaded_at=time.monotonic())
+
+
+# 全局机构树缓存实例
+org_tree_cache = OrgTreeCache(ttl_seconds=settings.ORG_TREE_CACHE_TTL_SECONDS)
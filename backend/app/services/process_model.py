@@ -0,0 +1,186 @@
+"""
+编译后的 BPMN 流程模型及其缓存
+流程定义的 XML 只在首次使用时解析一次，之后任务流转直接查预先构建的索引表
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app.services.bpmn_parser import BPMNParser, BPMNNode, map_node_name_to_task_key
+
+
+@dataclass
+class CompiledProcess:
+    """编译后的流程模型（只读）"""
+    parsed: Dict[str, any]
+    nodes_by_id: Dict[str, BPMNNode] = field(default_factory=dict)
+    successors: Dict[str, List[str]] = field(default_factory=dict)
+    predecessors: Dict[str, List[str]] = field(default_factory=dict)
+    start_node: Optional[BPMNNode] = None
+    first_task_node: Optional[BPMNNode] = None
+    task_nodes: Dict[str, BPMNNode] = field(default_factory=dict)
+    node_task_keys: Dict[str, str] = field(default_factory=dict)
+    valid_return_nodes: Dict[str, List[str]] = field(default_factory=dict)
+
+    @classmethod
+    def compile(cls, parsed: Dict[str, any]) -> "CompiledProcess":
+        """根据 BPMNParser.parse() 的结果构建索引表"""
+        process = cls(parsed=parsed)
+        nodes = parsed['nodes']
+
+        for node in nodes:
+            process.nodes_by_id.setdefault(node.id, node)
+        # task_key <-> 任务节点的双向索引由解析器构建
+        process.task_nodes = parsed['task_nodes']
+        process.node_task_keys = parsed['node_task_keys']
+
+        process.successors = parsed['flow_graph']
+        for node_id in process.successors:
+            process.predecessors.setdefault(node_id, [])
+        for source_id, target_ids in process.successors.items():
+            for target_id in dict.fromkeys(target_ids):
+                process.predecessors.setdefault(target_id, []).append(source_id)
+
+        start_nodes = [n for n in nodes if n.type == 'start']
+        if start_nodes:
+            process.start_node = start_nodes[0]
+            for node_id in process.successors.get(process.start_node.id, []):
+                node = process.nodes_by_id.get(node_id)
+                if node and node.type == 'task':
+                    process.first_task_node = node
+                    break
+
+        for task_key, node in process.task_nodes.items():
+            process.valid_return_nodes[task_key] = process._collect_return_nodes(node.id)
+
+        return process
+
+    def _collect_return_nodes(self, node_id: str) -> List[str]:
+        """递归查找所有前置用户任务节点（允许退回到所有前置任务节点，包括客户经理节点）"""
+        valid_nodes = []
+        visited = set()  # 防止循环
+        queue = [node_id]
+
+        while queue:
+            current_id = queue.pop(0)
+            if current_id in visited:
+                continue
+            visited.add(current_id)
+
+            for source_id in self.predecessors.get(current_id, []):
+                predecessor = self.nodes_by_id.get(source_id)
+                if not predecessor:
+                    continue
+                if predecessor.type == 'task':
+                    task_key = self.node_task_keys[predecessor.id]
+                    if task_key not in valid_nodes:
+                        valid_nodes.append(task_key)
+
+                # 无论什么类型，都继续向前查找（除了开始节点）
+                if predecessor.type != 'start' and predecessor.id not in visited:
+                    queue.append(predecessor.id)
+
+        return valid_nodes
+
+    def task_key_of(self, node: BPMNNode) -> str:
+        """获取任务节点的 task_key"""
+        return self.node_task_keys.get(node.id) or node.task_key or map_node_name_to_task_key(node.name)
+
+    def task_node(self, task_key: str) -> Optional[BPMNNode]:
+        """根据 task_key 获取任务节点"""
+        return self.task_nodes.get(task_key)
+
+    def task_name(self, task_key: str, default: Optional[str] = None) -> Optional[str]:
+        """根据 task_key 获取任务节点名称"""
+        node = self.task_nodes.get(task_key)
+        return node.name if node else default
+
+    def task_node_id(self, task_key: str, default: Optional[str] = None) -> Optional[str]:
+        """根据 task_key 获取任务节点ID"""
+        node = self.task_nodes.get(task_key)
+        return node.id if node else default
+
+    def _target_task_key(self, node_id: Optional[str], allow_end: bool) -> Optional[str]:
+        node = self.nodes_by_id.get(node_id) if node_id else None
+        if node and node.type == 'task':
+            return self.node_task_keys[node.id]
+        if allow_end and node and node.type == 'end':
+            return "end"
+        # 网关等其他节点类型暂不支持
+        return None
+
+    def next_task_key(self, task_key: str) -> Optional[str]:
+        """同意时的下一节点：当前节点的第一个后续节点（task_key 或 "end"）"""
+        node = self.task_nodes.get(task_key)
+        if not node:
+            return None
+        next_node_ids = self.successors.get(node.id, [])
+        return self._target_task_key(next_node_ids[0] if next_node_ids else None, allow_end=True)
+
+    def return_task_key(self, task_key: str) -> Optional[str]:
+        """不同意/退回时的下一节点：默认走最后一个后续节点（通常表示退回）"""
+        node = self.task_nodes.get(task_key)
+        if not node:
+            return None
+        next_node_ids = self.successors.get(node.id, [])
+        return self._target_task_key(next_node_ids[-1] if next_node_ids else None, allow_end=False)
+
+    def next_task_node(self, task_key: str) -> Optional[BPMNNode]:
+        """当前节点的第一个后续节点（仅当其为用户任务节点时返回）"""
+        node = self.task_nodes.get(task_key)
+        if not node:
+            return None
+        next_node_ids = self.successors.get(node.id, [])
+        next_node = self.nodes_by_id.get(next_node_ids[0]) if next_node_ids else None
+        return next_node if next_node and next_node.type == 'task' else None
+
+
+class ProcessModelCache:
+    """编译后流程模型的 LRU 缓存，按流程定义 ID 和版本缓存"""
+
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self._cache: "OrderedDict[Tuple, CompiledProcess]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(process_definition) -> Tuple:
+        # updated_at 变化说明 XML 被修改过（其他进程修改时也能感知）
+        return (process_definition.id, process_definition.version, process_definition.updated_at)
+
+    def get(self, process_definition) -> CompiledProcess:
+        """获取流程定义对应的编译模型，未命中时解析 XML 并编译
+
+        Raises:
+            ValueError: 解析 BPMN XML 失败
+        """
+        key = self._cache_key(process_definition)
+        with self._lock:
+            process = self._cache.get(key)
+            if process is not None:
+                self._cache.move_to_end(key)
+                return process
+
+        process = CompiledProcess.compile(BPMNParser.parse(process_definition.bpmn_xml))
+
+        with self._lock:
+            self._cache[key] = process
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return process
+
+    def invalidate(self, definition_id: Optional[int] = None):
+        """使缓存失效，不传 definition_id 时清空全部"""
+        with self._lock:
+            if definition_id is None:
+                self._cache.clear()
+                return
+            for key in [k for k in self._cache if k[0] == definition_id]:
+                del self._cache[key]
+
+
+# 全局流程模型缓存实例
+process_model_cache = ProcessModelCache()
@@ -0,0 +1,134 @@
+"""
+SQL 查询预算
+统计一段代码（通常是一个请求）中每种 SQL 语句形状的执行次数，同一形状执行次数超过预算时告警或抛出异常，
+用于发现循环中逐条查询（N+1）的问题
+
+语句形状：去掉字面量和参数占位符差异后的 SQL（IN 列表折叠为一项），
+例如 `WHERE users.id = 1` 和 `WHERE users.id = 2` 属于同一形状
+"""
+
+import logging
+import re
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|:\w+|\?")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)|\bIN\s*\(\s*\[POSTCOMPILE_\w+\]\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint_statement(statement: str) -> str:
+    """计算 SQL 语句形状"""
+    sql = _STRING_LITERAL.sub("?", statement)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _IN_LIST.sub("IN (?)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """同一形状的 SQL 执行次数超过预算"""
+
+
+class QueryBudget:
+    """SQL 查询预算（上下文管理器）
+
+    用法：
+        with QueryBudget(max_repeats=5, name="GET /api/tasks/search"):
+            ...
+
+    on_exceed 为 "raise" 时退出上下文时抛出 QueryBudgetExceeded，为 "warn" 时只记录告警日志。
+    预算对当前上下文中执行的所有 SQL 生效（包括线程池和 run_sync 中执行的 SQL）
+    """
+
+    def __init__(
+        self,
+        max_repeats: int = 5,
+        max_total: Optional[int] = None,
+        on_exceed: str = "raise",
+        name: str = ""
+    ):
+        """
+        Args:
+            max_repeats: 同一形状的 SQL 最多执行次数
+            max_total: SQL 总执行次数上限（None 表示不限制）
+            on_exceed: 超出预算时的处理方式（raise / warn）
+            name: 名称（用于告警和异常信息）
+        """
+        self.max_repeats = max_repeats
+        self.max_total = max_total
+        self.on_exceed = on_exceed
+        self.name = name
+        self.counts: Counter = Counter()
+        self._token = None
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def record(self, statement: str):
+        self.counts[fingerprint_statement(statement)] += 1
+
+    def violations(self) -> List[Tuple[str, int]]:
+        """超出预算的语句形状及执行次数（按次数倒序）"""
+        return [(sql, count) for sql, count in self.counts.most_common() if count > self.max_repeats]
+
+    def report(self) -> Optional[str]:
+        """超出预算时返回说明，否则返回 None"""
+        lines = []
+        if self.max_total is not None and self.total > self.max_total:
+            lines.append(f"共执行 {self.total} 条 SQL，超过上限 {self.max_total}")
+        for sql, count in self.violations():
+            lines.append(f"同一形状的 SQL 执行 {count} 次（上限 {self.max_repeats}）：{sql[:300]}")
+        if not lines:
+            return None
+        return f"{self.name or 'SQL'} 超出查询预算：\n" + "\n".join(f"  - {line}" for line in lines)
+
+    def check(self):
+        """检查是否超出预算"""
+        message = self.report()
+        if message is None:
+            return
+        if self.on_exceed == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+    def start(self):
+        """开始在当前上下文中统计"""
+        self._token = _current_budget.set(self)
+
+    def stop(self):
+        """停止统计"""
+        if self._token is not None:
+            _current_budget.reset(self._token)
+            self._token = None
+
+    def __enter__(self) -> "QueryBudget":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        # 代码块本身出错时不再检查预算，避免掩盖原始异常
+        if exc_type is None:
+            self.check()
+        return False
+
+
+# 当前生效的查询预算
+_current_budget: ContextVar[Optional[QueryBudget]] = ContextVar("current_query_budget", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    budget = _current_budget.get()
+    if budget is not None:
+        budget.record(statement)
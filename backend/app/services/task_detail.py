@@ -0,0 +1,256 @@
+"""
+任务详情读模型
+打开一个认定（任务详情）时，用固定的三次查询加载全部数据：
+1. 认定下的全部工作流任务，连同认定、发起人、机构、流程实例一起联表加载
+   （传入的 ID 可能是任务 ID，也可能是认定 ID，在同一次查询中一并解析）
+2. 附件
+3. 附件上传人
+分类编号从绿色金融支持项目目录缓存中查找，不再逐级查询数据库
+
+组装好的详情按认定缓存（短 TTL + LRU 上限）。工作流任务、认定、流程实例、附件在会话中
+新增、修改或删除并提交后，对应认定的缓存立即失效；其他进程中的缓存最迟在 TTL 后失效
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import event, or_, select
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from app.config import settings
+from app.models.green_finance import GreenIdentification, TaskAttachment, WorkflowInstance, WorkflowTask
+from app.services.green_category import green_category_catalog
+from app.services.workflow import get_formatted_category
+
+
+class TaskDetailCache:
+    """按请求 ID 缓存的任务详情（线程安全的 TTL + LRU 缓存），可按认定 ID 失效"""
+
+    def __init__(self, ttl_seconds: int = 30, maxsize: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        self._cache: "OrderedDict[int, Tuple[int, dict, float]]" = OrderedDict()  # 请求 ID -> (认定 ID, 详情, 过期时间)
+        self._keys_by_identification: Dict[int, Set[int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, task_id: int) -> Optional[dict]:
+        """获取缓存的详情，未命中或已过期时返回 None"""
+        if self.ttl_seconds <= 0:
+            return None
+        with self._lock:
+            entry = self._cache.get(task_id)
+            if entry is None:
+                return None
+            if time.monotonic() >= entry[2]:
+                self._remove(task_id)
+                return None
+            self._cache.move_to_end(task_id)
+            return entry[1]
+
+    def put(self, task_id: int, identification_id: int, detail: dict):
+        """缓存详情"""
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._remove(task_id)
+            self._cache[task_id] = (identification_id, detail, time.monotonic() + self.ttl_seconds)
+            self._keys_by_identification.setdefault(identification_id, set()).add(task_id)
+            while len(self._cache) > self.maxsize:
+                self._remove(next(iter(self._cache)))
+
+    def invalidate(self, identification_id: Optional[int] = None):
+        """使认定的详情缓存失效，不传 identification_id 时清空全部"""
+        with self._lock:
+            if identification_id is None:
+                self._cache.clear()
+                self._keys_by_identification.clear()
+                return
+            for task_id in list(self._keys_by_identification.get(identification_id, ())):
+                self._remove(task_id)
+
+    def _remove(self, task_id: int):
+        entry = self._cache.pop(task_id, None)
+        if entry is None:
+            return
+        keys = self._keys_by_identification.get(entry[0])
+        if keys is not None:
+            keys.discard(task_id)
+            if not keys:
+                del self._keys_by_identification[entry[0]]
+
+
+# 全局任务详情缓存
+task_detail_cache = TaskDetailCache(
+    ttl_seconds=settings.TASK_DETAIL_CACHE_TTL_SECONDS,
+    maxsize=settings.TASK_DETAIL_CACHE_MAXSIZE
+)
+
+
+def load_task_detail(db: Session, task_id: int) -> dict:
+    """获取任务详情（优先取缓存）"""
+    detail = task_detail_cache.get(task_id)
+    if detail is None:
+        detail = build_task_detail(db, task_id)
+        task_detail_cache.put(task_id, detail["identification_id"], detail)
+    return detail
+
+
+def build_task_detail(db: Session, task_id: int) -> dict:
+    """组装任务详情
+
+    task_id 可能是 workflow_task 的 ID，也可能是 green_identification 的 ID：
+    存在该 ID 的任务时优先使用该任务（TaskCompleted.vue 传的是任务 ID），
+    否则使用该认定的第一个任务
+    """
+    # 以 task_id 为任务 ID 时所属的认定
+    task_identification_id = select(WorkflowTask.identification_id).where(
+        WorkflowTask.id == task_id
+    ).scalar_subquery()
+
+    workflow_tasks = db.query(WorkflowTask).options(
+        joinedload(WorkflowTask.identification).joinedload(GreenIdentification.initiator),
+        joinedload(WorkflowTask.identification).joinedload(GreenIdentification.organization),
+        joinedload(WorkflowTask.workflow_instance)
+    ).filter(
+        or_(
+            WorkflowTask.identification_id == task_identification_id,
+            WorkflowTask.identification_id == task_id
+        )
+    ).order_by(WorkflowTask.started_at, WorkflowTask.id).all()
+
+    task = next((t for t in workflow_tasks if t.id == task_id), None)
+    if task is None:
+        task = min((t for t in workflow_tasks if t.identification_id == task_id), key=lambda t: t.id, default=None)
+    identification = task.identification if task else None
+
+    if not identification or not task:
+        raise HTTPException(status_code=404, detail="任务不存在")
+
+    # 两个 ID 恰好分属不同认定时，只保留所选任务所在认定的任务
+    workflow_tasks = [t for t in workflow_tasks if t.identification_id == identification.id]
+
+    initiator = identification.initiator
+    organization = identification.organization
+
+    result = {
+        "id": identification.id,
+        "identification_id": identification.id,  # 添加identification_id字段，与id相同
+        "loan_code": identification.loan_code,
+        "customer_name": identification.customer_name,
+        "customer_id": identification.customer_id,
+        "business_type": identification.business_type,
+        "loan_account": identification.loan_account,
+        "loan_amount": identification.loan_amount,
+        "disbursement_date": identification.disbursement_date,
+        "maturity_date": identification.maturity_date,
+        "interest_rate": identification.interest_rate,
+        "green_percentage": identification.green_percentage,
+        "green_loan_balance": identification.green_loan_balance,
+        "project_category_large": identification.project_category_large,
+        "project_category_medium": identification.project_category_medium,
+        "project_category_small": identification.project_category_small,
+        "formatted_category": get_formatted_category(db, identification),
+        "esg_risk_level": identification.esg_risk_level,
+        "esg_performance_level": identification.esg_performance_level,
+        "status": identification.status,
+        "initiator_id": identification.initiator_id,
+        "initiator_name": initiator.real_name if initiator else "",
+        "current_handler_id": identification.current_handler_id,
+        "org_id": identification.org_id,
+        "org_name": organization.name if organization else "",
+        "created_at": identification.created_at,
+        "updated_at": identification.updated_at,
+        "completed_at": identification.completed_at,
+        "deadline": identification.deadline,
+        "started_at": task.workflow_instance.started_at if task.workflow_instance else None,
+        "attachments": []
+    }
+
+    # 有当前待处理任务时使用其分类，否则使用上个节点最新的分类（排除当前任务，只选择已完成的任务）
+    category_task = next((t for t in workflow_tasks if t.status == "待处理"), None)
+    if category_task is None:
+        previous_tasks = [t for t in workflow_tasks if t.id != task.id and t.status == "已完成"]
+        if previous_tasks:
+            # 按完成时间倒序排列，取最新的
+            previous_tasks.sort(key=lambda x: x.completed_at if x.completed_at else x.started_at, reverse=True)
+            category_task = previous_tasks[0]
+
+    if category_task is not None and category_task.formatted_category:
+        result["project_category_large"] = category_task.project_category_large
+        result["project_category_medium"] = category_task.project_category_medium
+        result["project_category_small"] = category_task.project_category_small
+        result["formatted_category"] = category_task.formatted_category
+
+    # 附件（连同上传人一起加载）
+    attachments = db.query(TaskAttachment).options(
+        selectinload(TaskAttachment.uploader)
+    ).filter(
+        TaskAttachment.task_id.in_([t.id for t in workflow_tasks])
+    ).order_by(TaskAttachment.id).all()
+
+    for attachment in attachments:
+        result["attachments"].append({
+            "id": attachment.id,
+            "task_id": attachment.task_id,
+            "task_key": attachment.task_key,
+            "task_name": attachment.task_name,
+            "uploader_name": attachment.uploader.real_name if attachment.uploader else "",
+            "original_filename": attachment.original_filename,
+            "file_size": attachment.file_size,
+            "download_url": attachment.download_url,
+            "created_at": attachment.created_at.isoformat() if attachment.created_at else ""
+        })
+
+    # 根据分类名称查找对应的编号
+    large = result.get("project_category_large")
+    medium = result.get("project_category_medium")
+    small = result.get("project_category_small")
+    if large or medium or small:
+        large_code, medium_code, small_code = green_category_catalog.get(db).category_codes(large, medium, small)
+        result["project_category_large_code"] = large_code
+        result["project_category_medium_code"] = medium_code
+        result["project_category_small_code"] = small_code
+
+    return result
+
+
+# ---------- 缓存失效：提交涉及认定的修改后失效对应的详情缓存 ----------
+
+_CHANGED_KEY = "task_detail_changed_identifications"
+
+
+def _identification_id_of(obj) -> Optional[int]:
+    if isinstance(obj, GreenIdentification):
+        return obj.id
+    if isinstance(obj, (WorkflowTask, WorkflowInstance)):
+        return obj.identification_id
+    if isinstance(obj, TaskAttachment):
+        task = obj.task
+        return task.identification_id if task is not None else None
+    return None
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_identifications(session, flush_context):
+    changed = session.info.setdefault(_CHANGED_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (GreenIdentification, WorkflowTask, WorkflowInstance, TaskAttachment)):
+            changed.add(_identification_id_of(obj))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_identifications(session):
+    for identification_id in session.info.pop(_CHANGED_KEY, ()):
+        if identification_id is None:
+            # 无法确定所属认定（如附件的任务已删除），清空全部
+            task_detail_cache.invalidate()
+            return
+        task_detail_cache.invalidate(identification_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_identifications(session):
+    session.info.pop(_CHANGED_KEY, None)
@@ -0,0 +1,158 @@
+"""
+任务数据导出服务
+只查询导出需要的列，通过服务端游标分批读取，逐块生成 CSV，
+内存占用与导出行数无关
+"""
+
+import csv
+import io
+import logging
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional
+
+from sqlalchemy.orm import Query, Session
+
+from app.database import SessionLocal
+from app.models.green_finance import GreenIdentification
+from app.models.user import User
+from app.services.green_category import green_category_catalog
+from app.services.org_tree import org_tree_cache
+
+logger = logging.getLogger(__name__)
+
+# 服务端游标每批读取的行数，同时也是每个 CSV 块包含的行数
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_HEADERS = [
+    '任务ID', '客户名称', '业务品种', '贷款账号', '放款金额', '放款日期',
+    '绿色金融支持项目目录', '发起人', '状态', '创建时间', '完成时间'
+]
+
+
+@dataclass
+class ExportFilters:
+    """导出筛选条件"""
+    customer_name: Optional[str] = None
+    business_type: Optional[str] = None
+    loan_account: Optional[str] = None
+    loan_date_start: Optional[str] = None
+    loan_date_end: Optional[str] = None
+    status: Optional[str] = None
+    limit: int = 10000
+    only_complete: bool = False
+
+
+def build_export_query(db: Session, current_user: User, filters: ExportFilters) -> Query:
+    """构建导出查询（只查询导出需要的列，发起人姓名随主查询一起取出）"""
+    query = db.query(
+        GreenIdentification.id,
+        GreenIdentification.customer_name,
+        GreenIdentification.business_type,
+        GreenIdentification.loan_account,
+        GreenIdentification.loan_amount,
+        GreenIdentification.disbursement_date,
+        GreenIdentification.project_category_large,
+        GreenIdentification.project_category_medium,
+        GreenIdentification.project_category_small,
+        GreenIdentification.status,
+        GreenIdentification.created_at,
+        GreenIdentification.completed_at,
+        User.real_name.label("initiator_name")
+    ).outerjoin(User, GreenIdentification.initiator_id == User.id)
+
+    # 权限控制：根据用户机构级别过滤数据
+    if not current_user.is_superuser:
+        org_tree = org_tree_cache.get(db)
+        user_org = org_tree.get(current_user.org_id)
+        if user_org:
+            if user_org.level == 2:
+                query = query.filter(GreenIdentification.org_id.in_(org_tree.descendant_ids(user_org.id)))
+            elif user_org.level == 3:
+                query = query.filter(GreenIdentification.org_id == current_user.org_id)
+
+    # 添加查询条件
+    if filters.customer_name:
+        query = query.filter(GreenIdentification.customer_name.like(f"%{filters.customer_name}%"))
+    if filters.business_type:
+        query = query.filter(GreenIdentification.business_type == filters.business_type)
+    if filters.loan_account:
+        query = query.filter(GreenIdentification.loan_account.like(f"%{filters.loan_account}%"))
+    if filters.loan_date_start:
+        query = query.filter(GreenIdentification.disbursement_date >= filters.loan_date_start)
+    if filters.loan_date_end:
+        query = query.filter(GreenIdentification.disbursement_date <= filters.loan_date_end)
+    if filters.status:
+        query = query.filter(GreenIdentification.status == filters.status)
+
+    # 如果只导出有完整数据的记录,添加过滤条件
+    if filters.only_complete:
+        query = query.filter(
+            GreenIdentification.completed_at.isnot(None),
+            GreenIdentification.initiator_id.isnot(None)
+        )
+
+    return query.order_by(GreenIdentification.created_at.desc()).limit(filters.limit)
+
+
+def iter_export_rows(db: Session, query: Query) -> Iterator[List]:
+    """通过服务端游标逐行生成导出数据"""
+    # 目录在一次导出中只获取一次，分类名称直接查字典
+    catalog = green_category_catalog.get(db)
+
+    rows = query.with_session(db).execution_options(yield_per=EXPORT_BATCH_SIZE)
+    for row in rows:
+        formatted_category = catalog.format(
+            row.project_category_large,
+            row.project_category_medium,
+            row.project_category_small
+        )
+        yield [
+            row.id,
+            row.customer_name,
+            row.business_type,
+            row.loan_account,
+            str(row.loan_amount) if row.loan_amount else "0",
+            str(row.disbursement_date) if row.disbursement_date else "",
+            formatted_category or row.project_category_medium or "",
+            row.initiator_name or "",
+            row.status,
+            str(row.created_at) if row.created_at else "",
+            str(row.completed_at) if row.completed_at else ""
+        ]
+
+
+def iter_export_csv(query: Query, on_progress: Optional[Callable[[int], None]] = None) -> Iterator[bytes]:
+    """逐块生成 CSV 内容（UTF-8 带 BOM，便于 Excel 打开）
+
+    使用独立的数据库会话，不依赖请求会话在响应发送期间保持打开；
+    on_progress 在每块生成后以已导出行数调用
+    """
+    db = SessionLocal()
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_HEADERS)
+        count = 0
+
+        for row in iter_export_rows(db, query):
+            writer.writerow(row)
+            count += 1
+            if count % EXPORT_BATCH_SIZE == 0:
+                yield _take_chunk(buffer, first=count == EXPORT_BATCH_SIZE)
+                if on_progress:
+                    on_progress(count)
+
+        yield _take_chunk(buffer, first=count < EXPORT_BATCH_SIZE)
+        if on_progress:
+            on_progress(count)
+        logger.info(f"Exported {count} records")
+    finally:
+        db.close()
+
+
+def _take_chunk(buffer: io.StringIO, first: bool) -> bytes:
+    """取出缓冲区内容并清空，第一块带 BOM"""
+    chunk = buffer.getvalue().encode('utf-8-sig' if first else 'utf-8')
+    buffer.seek(0)
+    buffer.truncate(0)
+    return chunk
@@ -0,0 +1,92 @@
+"""
+已认证用户缓存
+verify_token 每个请求都要按用户名查询用户，这里按用户名缓存用户的列值快照（短 TTL + LRU 上限），
+大部分请求无需访问数据库；系统管理中修改、禁用、删除用户或修改角色时立即失效，
+其他进程中的缓存最迟在 TTL 后失效
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from app.config import settings
+from app.models.user import User
+
+# 缓存的用户列（不缓存密码哈希）
+_CACHED_COLUMNS = [
+    column.key for column in User.__table__.columns
+    if column.key != "password_hash"
+]
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """缓存的用户快照"""
+    values: Dict
+    permission_version: str
+    expires_at: float
+
+    @property
+    def is_active(self) -> bool:
+        return bool(self.values.get("is_active"))
+
+    def to_user(self) -> User:
+        """构建新的游离 User 对象（不属于任何会话），调用方修改它不会影响缓存"""
+        return User(**self.values)
+
+
+class UserPrincipalCache:
+    """按用户名缓存的用户快照（线程安全的 TTL + LRU 缓存）"""
+
+    def __init__(self, ttl_seconds: int = 30, maxsize: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        self._cache: "OrderedDict[str, CachedUser]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username: str) -> Optional[CachedUser]:
+        """获取缓存的用户，未命中或已过期时返回 None"""
+        if self.ttl_seconds <= 0:
+            return None
+        with self._lock:
+            entry = self._cache.get(username)
+            if entry is None:
+                return None
+            if time.monotonic() >= entry.expires_at:
+                del self._cache[username]
+                return None
+            self._cache.move_to_end(username)
+            return entry
+
+    def put(self, user: User, permission_version: str) -> CachedUser:
+        """缓存用户的列值快照及其权限版本"""
+        entry = CachedUser(
+            values={key: getattr(user, key) for key in _CACHED_COLUMNS},
+            permission_version=permission_version,
+            expires_at=time.monotonic() + self.ttl_seconds
+        )
+        if self.ttl_seconds <= 0:
+            return entry
+        with self._lock:
+            self._cache[user.username] = entry
+            self._cache.move_to_end(user.username)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return entry
+
+    def invalidate(self, username: Optional[str] = None):
+        """使缓存失效，不传 username 时清空全部"""
+        with self._lock:
+            if username is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(username, None)
+
+
+# 全局用户缓存实例
+user_principal_cache = UserPrincipalCache(
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+    maxsize=settings.USER_CACHE_MAXSIZE
+)
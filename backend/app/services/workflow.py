@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import Optional, List
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, text
+from typing import Optional, List, Dict
+from sqlalchemy.orm import Session, defer
+from sqlalchemy import and_, or_, func
 
 from app.models.green_finance import (
     GreenIdentification,
@@ -10,7 +10,9 @@ from app.models.green_finance import (
     TaskStatus
 )
 from app.models.workflow import ProcessDefinition
-from app.services.bpmn_parser import BPMNParser
+from app.services.green_category import green_category_catalog
+from app.services.process_model import CompiledProcess, process_model_cache
+from app.services.org_tree import org_tree_cache
 from app.models.user import User, Role, Organization
 from app.schemas.green_finance import (
     GreenIdentificationCreate,
@@ -28,9 +30,33 @@ class WorkflowEngine:
     1. 客户经理发起认定 -> 2. 二级分行绿色金融管理岗审核 -> 3. 一级分行绿色金融管理岗审批 -> 4. 绿色金融复核岗复核 -> 5. 结束
     """
     
-    # 流程定义缓存
-    _process_definition_cache = None
-    _process_definition_cache_time = None
+    @staticmethod
+    def get_active_process_definition(db: Session) -> Optional[ProcessDefinition]:
+        """获取启用状态的流程定义（延迟加载 bpmn_xml，仅在编译缓存未命中时读取）"""
+        return db.query(ProcessDefinition).options(
+            defer(ProcessDefinition.bpmn_xml)
+        ).filter(
+            ProcessDefinition.name == "绿色认定",
+            ProcessDefinition.status == "active"
+        ).first()
+    
+    @staticmethod
+    def get_compiled_process(db: Session, process_definition_id: Optional[int]) -> Optional[CompiledProcess]:
+        """获取流程定义对应的编译模型（带缓存）
+        
+        Raises:
+            ValueError: 解析 BPMN XML 失败
+        """
+        if not process_definition_id:
+            return None
+        process_definition = db.query(ProcessDefinition).options(
+            defer(ProcessDefinition.bpmn_xml)
+        ).filter(
+            ProcessDefinition.id == process_definition_id
+        ).first()
+        if not process_definition:
+            return None
+        return process_model_cache.get(process_definition)
     
     @staticmethod
     def calculate_business_deadline(start_date: datetime, business_days: int = 3) -> datetime:
@@ -61,50 +87,34 @@ class WorkflowEngine:
     def start_process(cls, db: Session, identification: GreenIdentification, initiator: User) -> WorkflowInstance:
         """启动工作流实例"""
         # 获取启用状态的流程定义（根据流程名称）
-        process_definition = db.query(ProcessDefinition).filter(
-            ProcessDefinition.name == "绿色认定",
-            ProcessDefinition.status == "active"
-        ).first()
+        process_definition = cls.get_active_process_definition(db)
         
         if not process_definition:
             raise ValueError("未找到启用状态的流程定义，请先启用一个流程版本")
         
-        # 解析 BPMN XML
+        # 获取编译后的流程模型（首次使用时解析 BPMN XML）
         try:
-            parsed_process = BPMNParser.parse(process_definition.bpmn_xml)
+            process = process_model_cache.get(process_definition)
         except Exception as e:
             raise ValueError(f"解析流程定义失败: {str(e)}")
         
         # 找到起始节点
-        start_nodes = [n for n in parsed_process['nodes'] if n.type == 'start']
-        if not start_nodes:
+        start_node = process.start_node
+        if not start_node:
             raise ValueError("流程定义中未找到开始节点")
         
-        start_node = start_nodes[0]
-        
         # 从流程图中找到起始节点的后续节点
-        flow_graph = parsed_process['flow_graph']
-        next_node_ids = flow_graph.get(start_node.id, [])
-        
-        if not next_node_ids:
+        if not process.successors.get(start_node.id):
             raise ValueError("流程定义中起始节点没有后续节点")
         
         # 获取第一个用户任务节点
-        first_task_node = None
-        for node_id in next_node_ids:
-            node = next((n for n in parsed_process['nodes'] if n.id == node_id), None)
-            if node and node.type == 'task':
-                first_task_node = node
-                break
+        first_task_node = process.first_task_node
         
         if not first_task_node:
             raise ValueError("流程定义中未找到用户任务节点")
         
         # 将节点名称映射到 task_key
-        task_key = cls._map_node_name_to_task_key(first_task_node.name)
-        
-        # 构建节点映射（从 task_key 到节点信息）
-        nodes_map = {n.id: n for n in parsed_process['nodes']}
+        task_key = process.task_key_of(first_task_node)
         
         # 创建工作流实例
         case_id = f"CASE_{datetime.now().strftime('%Y%m%d%H%M%S')}_{identification.id}"
@@ -147,15 +157,12 @@ class WorkflowEngine:
         # 获取流程定义
         workflow_instance = task.workflow_instance
         process_definition = None
-        parsed_process = None
+        process = None
         
         # 如果workflow_instance没有绑定流程定义，动态获取启用状态的流程定义
         if hasattr(workflow_instance, 'process_definition_id') and not workflow_instance.process_definition_id:
             # 动态获取启用状态的流程定义
-            process_definition = db.query(ProcessDefinition).filter(
-                ProcessDefinition.name == "绿色认定",
-                ProcessDefinition.status == "active"
-            ).first()
+            process_definition = cls.get_active_process_definition(db)
             
             if process_definition:
                 # 绑定流程定义到工作流实例
@@ -164,38 +171,27 @@ class WorkflowEngine:
                 print(f"已绑定流程版本v{process_definition.version}到工作流实例 {workflow_instance.id}")
         # 检查是否有process_definition_id字段（兼容旧系统）
         elif hasattr(workflow_instance, 'process_definition_id') and workflow_instance.process_definition_id:
-            process_definition = db.query(ProcessDefinition).filter(
+            process_definition = db.query(ProcessDefinition).options(
+                defer(ProcessDefinition.bpmn_xml)
+            ).filter(
                 ProcessDefinition.id == workflow_instance.process_definition_id
             ).first()
         
         if process_definition:
             try:
-                parsed_process = BPMNParser.parse(process_definition.bpmn_xml)
+                process = process_model_cache.get(process_definition)
             except Exception as e:
                 print(f"警告: 解析流程定义失败，使用硬编码节点: {str(e)}")
-                parsed_process = None
+                process = None
         
         # 获取提交人信息
         from app.models.user import User
         submitter = db.query(User).get(task.assignee_id)
         
-        # 计算islvl2变量
+        # 计算islvl2变量（根据提交人机构的上上级机构层级，从机构树缓存中获取）
         islvl2 = None
         if submitter and submitter.org_id:
-            from app.models.user import Organization
-            user_org = db.query(Organization).get(submitter.org_id)
-            
-            if user_org and user_org.parent_id:
-                parent_org = db.query(Organization).get(user_org.parent_id)
-                
-                if parent_org and parent_org.parent_id:
-                    grandparent_org = db.query(Organization).get(parent_org.parent_id)
-                    
-                    if grandparent_org:
-                        if grandparent_org.level == 1:
-                            islvl2 = '1'
-                        elif grandparent_org.level == 2:
-                            islvl2 = '2'
+            islvl2 = org_tree_cache.get(db).islvl2(submitter.org_id)
         
         # 设置islvl2变量
         if islvl2 is not None:
@@ -233,70 +229,18 @@ class WorkflowEngine:
         current_node = workflow.current_node
         
         # 必须有解析的流程定义，否则无法流转
-        if not parsed_process:
+        if not process:
             raise ValueError("流程定义未解析，无法完成任务")
         
         # 从流程图决定下一个节点
         next_node = None
         
-        # 在流程图中找到当前节点的后续节点
-        nodes_map = {n.id: n for n in parsed_process['nodes']}
-        flow_graph = parsed_process['flow_graph']
-        
-        # 找到当前节点对应的 BPMN 节点
-        current_bpmn_node = None
-        for node in parsed_process['nodes']:
-            if node.type == 'task' and cls._map_node_name_to_task_key(node.name) == current_node:
-                current_bpmn_node = node
-                break
-        
-        if current_bpmn_node:
-            # 从流程图获取后续节点
-            next_node_ids = flow_graph.get(current_bpmn_node.id, [])
-            
-            if approval_result == "同意":
-                # 特殊处理 manager_identification 节点
-                if current_node == "manager_identification":
-                    # 直接使用第一个后续节点
-                    if next_node_ids:
-                        first_next_node = nodes_map.get(next_node_ids[0])
-                        if first_next_node and first_next_node.type == 'task':
-                            next_node = cls._map_node_name_to_task_key(first_next_node.name)
-                        elif first_next_node and first_next_node.type == 'end':
-                            next_node = "end"
-                        else:
-                            next_node = None
-                    else:
-                        next_node = None
-                else:
-                    # 其他节点，走第一个后续节点
-                    if next_node_ids:
-                        first_next_node = nodes_map.get(next_node_ids[0])
-                        if first_next_node:
-                            if first_next_node.type == 'task':
-                                next_node = cls._map_node_name_to_task_key(first_next_node.name)
-                            elif first_next_node.type == 'end':
-                                next_node = "end"
-                            else:
-                                # 如果是网关，需要进一步处理
-                                next_node = None
-                        else:
-                            next_node = None
-                    else:
-                        next_node = None
-            elif approval_result in ["不同意", "退回"]:
-                # 退回逻辑：查找条件表达式或默认退回路径
-                # 这里简化处理，如果序列流中有条件表达式为 "return" 或类似的，则走该路径
-                # 否则走最后一个路径
-                if next_node_ids:
-                    # 默认走最后一个节点（通常表示退回）
-                    last_next_node = nodes_map.get(next_node_ids[-1])
-                    if last_next_node and last_next_node.type == 'task':
-                        next_node = cls._map_node_name_to_task_key(last_next_node.name)
-                    else:
-                        next_node = None
-                else:
-                    next_node = None
+        if approval_result == "同意":
+            # 走当前节点的第一个后续节点（任务节点或结束节点）
+            next_node = process.next_task_key(current_node)
+        elif approval_result in ["不同意", "退回"]:
+            # 退回逻辑：默认走最后一个后续节点（通常表示退回）
+            next_node = process.return_task_key(current_node)
         
         if not next_node:
             raise ValueError(f"无法找到当前节点 {current_node} 的后续节点")
@@ -337,19 +281,12 @@ class WorkflowEngine:
             raise ValueError(f"当前流程已有待处理任务（{existing_pending_task.task_name}），无法创建新任务")
         
         # 必须有解析的流程定义，否则无法创建任务
-        if not parsed_process:
+        if not process:
             raise ValueError("流程定义未解析，无法创建任务")
         
         # 从流程定义中获取节点信息（不使用硬编码）
-        task_name = next_node  # 默认值
-        node_id = f"UserTask_{next_node}"
-        
-        # 通过节点名称查找节点
-        for node in parsed_process['nodes']:
-            if node.type == 'task' and cls._map_node_name_to_task_key(node.name) == next_node:
-                task_name = node.name
-                node_id = node.id
-                break
+        task_name = process.task_name(next_node, next_node)
+        node_id = process.task_node_id(next_node, f"UserTask_{next_node}")
         
         # 根据当前认定的机构，查找下一节点的处理人
         assignee = cls._find_assignee(db, next_node, task.identification_id)
@@ -397,30 +334,6 @@ class WorkflowEngine:
         
         db.commit()
     
-    @classmethod
-    def _map_node_name_to_task_key(cls, node_name: str) -> str:
-        """将 BPMN 节点名称映射到 task_key
-        
-        根据节点名称中的关键词映射到对应的 task_key：
-        - "客户经理" -> "manager_identification"
-        - "二级分行" -> "branch_review"
-        - "一级分行" -> "first_approval"
-        - "复核" -> "final_review"
-        """
-        if "客户经理" in node_name:
-            return "manager_identification"
-        elif "二级分行" in node_name:
-            return "branch_review"
-        elif "一级分行" in node_name and "复核" in node_name:
-            return "final_review"
-        elif "一级分行" in node_name:
-            return "first_approval"
-        elif "复核" in node_name:
-            return "final_review"
-        else:
-            # 默认返回节点名称的拼音首字母或简化版本
-            return node_name.lower().replace(" ", "_")
-    
     @classmethod
     def _find_assignee(cls, db: Session, next_node: str, identification_id: int) -> Optional[User]:
         """根据机构层级查找合适的处理人"""
@@ -431,8 +344,9 @@ class WorkflowEngine:
         if not identification:
             return None
         
-        # 获取发起人的机构
-        initiator_org = db.query(Organization).filter(Organization.id == identification.org_id).first()
+        # 获取发起人的机构（从机构树缓存中获取）
+        org_tree = org_tree_cache.get(db)
+        initiator_org = org_tree.get(identification.org_id)
         if not initiator_org:
             return None
         
@@ -452,31 +366,23 @@ class WorkflowEngine:
                 WorkflowInstance.identification_id == identification_id
             ).first()
             
-            parsed_process = None
+            process = None
             if workflow_instance and workflow_instance.process_definition_id:
-                process_definition = db.query(ProcessDefinition).filter(
-                    ProcessDefinition.id == workflow_instance.process_definition_id
-                ).first()
-                if process_definition:
-                    try:
-                        from app.services.bpmn_engine import BPMNParser
-                        parsed_process = BPMNParser.parse(process_definition.bpmn_xml)
-                    except Exception as e:
-                        print(f"警告: 解析流程定义失败: {str(e)}")
+                try:
+                    process = cls.get_compiled_process(db, workflow_instance.process_definition_id)
+                except Exception as e:
+                    print(f"警告: 解析流程定义失败: {str(e)}")
             
             # 根据BPMN流程定义中的orgLevels属性查找处理人
             # 如果有解析的流程定义，使用其中的节点信息
-            if parsed_process:
+            if process:
                 # 查找当前节点信息
-                current_node_info = None
-                for node in parsed_process['nodes']:
-                    if node.type == 'task' and cls._map_node_name_to_task_key(node.name) == next_node:
-                        current_node_info = node
-                        break
+                current_node_info = process.task_node(next_node)
+                node_properties = getattr(current_node_info, 'properties', None)
                 
-                if current_node_info and current_node_info.properties:
-                    org_levels = current_node_info.properties.get('orgLevels', [])
-                    candidate_groups = current_node_info.properties.get('candidateGroups', [])
+                if current_node_info and node_properties:
+                    org_levels = node_properties.get('orgLevels', [])
+                    candidate_groups = node_properties.get('candidateGroups', [])
                     
                     # 根据机构层级和候选组查找处理人
                     if org_levels and candidate_groups:
@@ -488,14 +394,13 @@ class WorkflowEngine:
                             levels = []
                         
                         # 查找符合条件的机构
-                        org_query = db.query(Organization).filter(Organization.level.in_(levels))
-                        
                         # 根据发起人机构进行过滤：查找发起人机构的父机构
                         if initiator_org.parent_id:
                             # 查找发起人机构的父级机构（无论发起人机构是level=2还是level=3）
-                            org_query = org_query.filter(Organization.id == initiator_org.parent_id)
-                        
-                        valid_orgs = org_query.all()
+                            parent_org = org_tree.get(initiator_org.parent_id)
+                            valid_orgs = [parent_org] if parent_org and parent_org.level in levels else []
+                        else:
+                            valid_orgs = [org for org in org_tree.nodes.values() if org.level in levels]
                         
                         if valid_orgs:
                             # 查找这些机构中符合候选组的用户
@@ -519,7 +424,7 @@ class WorkflowEngine:
             # 如果BPMN引擎找不到，使用原有逻辑作为后备
             assignee = None
             if initiator_org.level == 3 and initiator_org.parent_id:
-                parent_org = db.query(Organization).filter(Organization.id == initiator_org.parent_id).first()
+                parent_org = org_tree.get(initiator_org.parent_id)
                 if parent_org and parent_org.level == 2:
                     assignee = db.query(User).filter(
                         User.org_id == parent_org.id,
@@ -534,7 +439,7 @@ class WorkflowEngine:
                 ).first()
             
             if not assignee and initiator_org.parent_id:
-                parent_org = db.query(Organization).filter(Organization.id == initiator_org.parent_id).first()
+                parent_org = org_tree.get(initiator_org.parent_id)
                 if parent_org:
                     assignee = db.query(User).filter(
                         User.org_id == parent_org.id,
@@ -550,11 +455,6 @@ class WorkflowEngine:
             if not role:
                 return None
             
-            # 获取发起人的机构
-            initiator_org = db.query(Organization).filter(Organization.id == identification.org_id).first()
-            if not initiator_org:
-                return None
-            
             # 一级分行绿色金融管理岗：查找parent_id指向level=1的level=2机构（一级分行）的绿色金融管理岗
             assignee = db.query(User).filter(
                 User.role_id == role.id,
@@ -612,56 +512,29 @@ class WorkflowEngine:
         if "final_review" in current_node:
             raise ValueError("一级分行复核完成后不能撤回")
         
-        # 获取流程定义
+        # 获取编译后的流程模型
         workflow = task.workflow_instance
-        process_definition = None
-        parsed_process = None
+        process = None
         
-        if workflow.process_definition_id:
-            process_definition = db.query(ProcessDefinition).filter(
-                ProcessDefinition.id == workflow.process_definition_id
-            ).first()
-        
-        if process_definition and process_definition.bpmn_xml:
-            try:
-                parsed_process = BPMNParser.parse(process_definition.bpmn_xml)
-            except Exception as e:
-                print(f"解析流程定义失败: {str(e)}")
+        try:
+            process = cls.get_compiled_process(db, workflow.process_definition_id)
+        except Exception as e:
+            print(f"解析流程定义失败: {str(e)}")
         
         # 从流程定义中获取当前节点的名称
         current_node_name = current_node
-        if parsed_process:
-            for node in parsed_process['nodes']:
-                if node.type == 'task' and cls._map_node_name_to_task_key(node.name) == current_node:
-                    current_node_name = node.name
-                    break
+        if process:
+            current_node_name = process.task_name(current_node, current_node)
         
-        # 从流程定义中获取下一个节点的信息
+        # 从流程定义中获取下一个节点的信息（当前节点的第一个后续用户任务节点）
         next_node = None
         next_node_name = None
         
-        if parsed_process:
-            # 在流程图中找到当前节点的后续节点
-            nodes_map = {n.id: n for n in parsed_process['nodes']}
-            flow_graph = parsed_process['flow_graph']
-            
-            # 找到当前节点对应的 BPMN 节点
-            current_bpmn_node = None
-            for node in parsed_process['nodes']:
-                if node.type == 'task' and cls._map_node_name_to_task_key(node.name) == current_node:
-                    current_bpmn_node = node
-                    break
-            
-            if current_bpmn_node:
-                # 从流程图获取后续节点
-                next_node_ids = flow_graph.get(current_bpmn_node.id, [])
-                
-                # 获取第一个用户任务节点
-                if next_node_ids:
-                    first_next_node = nodes_map.get(next_node_ids[0])
-                    if first_next_node and first_next_node.type == 'task':
-                        next_node = cls._map_node_name_to_task_key(first_next_node.name)
-                        next_node_name = first_next_node.name
+        if process:
+            first_next_node = process.next_task_node(current_node)
+            if first_next_node:
+                next_node = process.task_key_of(first_next_node)
+                next_node_name = first_next_node.name
         
         if next_node:
             # 检查下一节点是否有已完成任务（已经提交审批）
@@ -690,12 +563,8 @@ class WorkflowEngine:
         # 设置任务名称和节点ID
         task_name = current_node_name
         node_id = f"UserTask_{current_node}"
-        if parsed_process:
-            for node in parsed_process['nodes']:
-                if node.type == 'task' and cls._map_node_name_to_task_key(node.name) == current_node:
-                    task_name = node.name
-                    node_id = node.id
-                    break
+        if process:
+            node_id = process.task_node_id(current_node, node_id)
         
         # 创建新的待处理任务给当前用户，而不是修改当前任务的状态
         # 这样可以保留原本的"已完成"任务记录
@@ -757,25 +626,17 @@ class WorkflowEngine:
         if current_node == "manager_identification":
             raise ValueError("客户经理不能退回")
         
-        # 获取流程定义
+        # 获取编译后的流程模型
         workflow = task.workflow_instance
-        process_definition = None
-        parsed_process = None
-        
-        if workflow.process_definition_id:
-            process_definition = db.query(ProcessDefinition).filter(
-                ProcessDefinition.id == workflow.process_definition_id
-            ).first()
+        process = None
         
-        if process_definition and process_definition.bpmn_xml:
-            try:
-                parsed_process = BPMNParser.parse(process_definition.bpmn_xml)
-            except Exception as e:
-                print(f"解析流程定义失败: {str(e)}")
+        try:
+            process = cls.get_compiled_process(db, workflow.process_definition_id)
+        except Exception as e:
+            print(f"解析流程定义失败: {str(e)}")
         
         # 验证退回目标节点是否合法
-        valid_return_nodes = cls._get_valid_return_nodes(current_node, parsed_process)
-        print(f"DEBUG: current_node={current_node}, return_to_node={return_to_node}, valid_return_nodes={valid_return_nodes}")
+        valid_return_nodes = cls._get_valid_return_nodes(current_node, process)
         if return_to_node not in valid_return_nodes:
             raise ValueError(f"当前节点不能退回到 {return_to_node}")
         
@@ -787,11 +648,8 @@ class WorkflowEngine:
         
         # 从流程定义中获取退回目标节点的名称
         return_to_node_name = return_to_node
-        if parsed_process:
-            for node in parsed_process['nodes']:
-                if node.type == 'task' and cls._map_node_name_to_task_key(node.name) == return_to_node:
-                    return_to_node_name = node.name
-                    break
+        if process:
+            return_to_node_name = process.task_name(return_to_node, return_to_node)
         
         task.reason = f"退回到 {return_to_node_name}"
         
@@ -817,11 +675,8 @@ class WorkflowEngine:
         
         # 从流程定义中获取退回目标节点的node_id
         return_to_node_id = f"UserTask_{return_to_node}"
-        if parsed_process:
-            for node in parsed_process['nodes']:
-                if node.type == 'task' and cls._map_node_name_to_task_key(node.name) == return_to_node:
-                    return_to_node_id = node.id
-                    break
+        if process:
+            return_to_node_id = process.task_node_id(return_to_node, return_to_node_id)
         
         # 创建退回目标节点的新任务
         new_task = WorkflowTask(
@@ -841,63 +696,14 @@ class WorkflowEngine:
         db.commit()
     
     @classmethod
-    def _get_valid_return_nodes(cls, current_node: str, parsed_process: dict = None) -> List[str]:
+    def _get_valid_return_nodes(cls, current_node: str, process: Optional[CompiledProcess] = None) -> List[str]:
         """获取当前节点可以退回的节点列表
         
-        从流程定义中动态获取可退回的节点。
-        默认规则：当前节点可以退回到所有前置的任务节点（除了客户经理节点）
+        从流程定义中动态获取可退回的节点（编译流程模型时已预先计算）。
+        默认规则：当前节点可以退回到所有前置的任务节点（包括客户经理节点）
         """
-        valid_nodes = []
-        
-        if parsed_process:
-            # 从流程图中获取所有前置节点
-            nodes_map = {n.id: n for n in parsed_process['nodes']}
-            flow_graph = parsed_process['flow_graph']
-            
-            # 找到当前节点对应的 BPMN 节点
-            current_bpmn_node = None
-            for node in parsed_process['nodes']:
-                if node.type == 'task' and cls._map_node_name_to_task_key(node.name) == current_node:
-                    current_bpmn_node = node
-                    break
-            
-            if current_bpmn_node:
-                # 递归查找所有前置用户任务节点
-                visited = set()  # 防止循环
-                queue = [current_bpmn_node.id]
-                
-                print(f"DEBUG: 开始递归查找前置节点，起始节点: {current_bpmn_node.id}")
-                
-                while queue:
-                    node_id = queue.pop(0)
-                    if node_id in visited:
-                        print(f"DEBUG: 节点 {node_id} 已访问，跳过")
-                        continue
-                    visited.add(node_id)
-                    
-                    # 查找所有流向当前节点的节点
-                    for source_id, next_node_ids in flow_graph.items():
-                        if node_id in next_node_ids:
-                            predecessor = nodes_map.get(source_id)
-                            if predecessor:
-                                print(f"DEBUG: 找到前置节点 {source_id} (type={predecessor.type}, name={predecessor.name})")
-                                if predecessor.type == 'task':
-                                    task_key = cls._map_node_name_to_task_key(predecessor.name)
-                                    # 允许退回到所有前置任务节点（包括客户经理节点）
-                                    if task_key not in valid_nodes:
-                                        valid_nodes.append(task_key)
-                                        print(f"DEBUG: 添加到可退回节点列表: {predecessor.name} -> {task_key}")
-                                elif predecessor.type == 'gateway':
-                                    print(f"DEBUG: 遇到网关，继续向前查找")
-                                
-                                # 无论什么类型，都继续向前查找（除了开始节点）
-                                if predecessor.type != 'start' and predecessor.id not in visited:
-                                    queue.append(predecessor.id)
-                                    print(f"DEBUG: 继续向前查找: {predecessor.id}")
-                                elif predecessor.type == 'start':
-                                    print(f"DEBUG: 到达开始节点，停止查找")
-                
-                print(f"DEBUG: 最终找到的可退回节点: {valid_nodes}")
+        if process:
+            return list(process.valid_return_nodes.get(current_node, []))
         else:
             # 后备逻辑：硬编码的退回规则
             return_nodes_map = {
@@ -907,58 +713,72 @@ class WorkflowEngine:
                 "final_review": ["manager_identification", "branch_review", "first_approval"]
             }
             return return_nodes_map.get(current_node, [])
-        
-        return valid_nodes
 
 
-def get_user_tasks(db: Session, user: User, status: str) -> List[TaskListItem]:
-    """获取用户的任务列表"""
-    query = db.query(WorkflowTask, GreenIdentification, User).join(
-        GreenIdentification, WorkflowTask.identification_id == GreenIdentification.id
-    ).join(
-        User, WorkflowTask.assignee_id == User.id
-    ).filter(
-        WorkflowTask.assignee_id == user.id
-    )
+def get_user_tasks(db: Session, user: User, status: str, page: Optional[int] = None, page_size: Optional[int] = None) -> tuple[List[TaskListItem], int]:
+    """获取用户的任务列表
+    
+    去重、计数和分页都在数据库中完成，传入 page/page_size 时每页只加载 page_size 条记录；
+    不传时返回全部记录。
+    
+    Returns:
+        (当前页任务列表, 总数)
+    """
+    # 基础过滤条件：当前用户经办的任务
+    conditions = [WorkflowTask.assignee_id == user.id]
     
     # 根据状态过滤任务
     if status == "待处理":
-        query = query.filter(WorkflowTask.status == "待处理")
+        conditions.append(WorkflowTask.status == "待处理")
     elif status == "已完成":
         # 已办任务包括已完成和已退回的任务
-        query = query.filter(WorkflowTask.status.in_(["已完成", "已退回"]))
+        conditions.append(WorkflowTask.status.in_(["已完成", "已退回"]))
+        # 对于已办任务，排除流程已完结的任务
+        conditions.append(GreenIdentification.status != "办结")
+    
+    query = db.query(WorkflowTask, GreenIdentification).join(
+        GreenIdentification, WorkflowTask.identification_id == GreenIdentification.id
+    ).filter(*conditions)
     
-    # 对于已办任务，排除流程已完结的任务
+    # 对于已办任务，对identification_id进行去重，只保留最新的任务记录
+    # 使用窗口函数在数据库中取每个认定最新的一条任务
     if status == "已完成":
-        query = query.filter(GreenIdentification.status != "办结")
+        latest_tasks = db.query(
+            WorkflowTask.id.label("task_id"),
+            func.row_number().over(
+                partition_by=WorkflowTask.identification_id,
+                order_by=(WorkflowTask.started_at.desc(), WorkflowTask.id.desc())
+            ).label("row_num")
+        ).join(
+            GreenIdentification, WorkflowTask.identification_id == GreenIdentification.id
+        ).filter(*conditions).subquery()
+        
+        query = query.join(
+            latest_tasks, WorkflowTask.id == latest_tasks.c.task_id
+        ).filter(latest_tasks.c.row_num == 1)
+    
+    total = query.count()
+    
+    query = query.order_by(WorkflowTask.started_at.desc(), WorkflowTask.id.desc())  # 按任务创建时间倒序排列
     
-    query = query.order_by(WorkflowTask.started_at.desc())  # 按任务创建时间倒序排列
+    if page is not None and page_size is not None:
+        query = query.offset((page - 1) * page_size).limit(page_size)
     
     tasks = query.all()
     
-    # 对于已办任务，对identification_id进行去重，只保留最新的任务记录
-    if status == "已完成":
-        seen_identification_ids = set()
-        unique_tasks = []
-        for task in tasks:
-            identification_id = task[0].identification_id
-            if identification_id not in seen_identification_ids:
-                seen_identification_ids.add(identification_id)
-                unique_tasks.append(task)
-        tasks = unique_tasks
+    # 批量加载整页的最新分类信息和发起人姓名，避免逐行查询
+    latest_categories = get_latest_formatted_categories(
+        db, [identification.id for _, identification in tasks]
+    )
+    initiator_names = get_initiator_names(
+        db, [identification.initiator_id for _, identification in tasks]
+    )
     
     items = []
-    for task, identification, assignee in tasks:
-        # 获取该流程中所有有分类信息的任务，按时间倒序排列，取最新的
-        tasks_with_category = db.query(WorkflowTask).filter(
-            WorkflowTask.identification_id == identification.id,
-            WorkflowTask.formatted_category.isnot(None)
-        ).order_by(WorkflowTask.started_at.desc()).all()
-        
+    for task, identification in tasks:
         # 使用最新节点的绿色分类信息
-        if tasks_with_category and tasks_with_category[0].formatted_category:
-            formatted_category = tasks_with_category[0].formatted_category
-        else:
+        formatted_category = latest_categories.get(identification.id)
+        if not formatted_category:
             formatted_category = get_formatted_category(db, identification)
         
         items.append(TaskListItem(
@@ -975,12 +795,73 @@ def get_user_tasks(db: Session, user: User, status: str) -> List[TaskListItem]:
             formatted_category=formatted_category,
             deadline=identification.deadline,
             status=identification.status,
-            initiator_name=initiator_name(db, identification.initiator_id),
+            initiator_name=initiator_names.get(identification.initiator_id, ""),
             completed_at=identification.completed_at,
             org_name=None
         ))
     
-    return items
+    return items, total
+
+
+def _get_latest_tasks(db: Session, identification_ids: List[int], conditions: list, order_by: tuple) -> dict:
+    """批量获取每个认定按 order_by 排序后的第一条任务（只取 id 和分类信息）
+    
+    Returns:
+        {identification_id: row}，row 包含 id、identification_id、formatted_category
+    """
+    identification_ids = list(set(identification_ids))
+    if not identification_ids:
+        return {}
+    
+    ranked_tasks = db.query(
+        WorkflowTask.id.label("id"),
+        WorkflowTask.identification_id.label("identification_id"),
+        WorkflowTask.formatted_category.label("formatted_category"),
+        func.row_number().over(
+            partition_by=WorkflowTask.identification_id,
+            order_by=order_by
+        ).label("row_num")
+    ).filter(
+        WorkflowTask.identification_id.in_(identification_ids),
+        *conditions
+    ).subquery()
+    
+    rows = db.query(
+        ranked_tasks.c.id,
+        ranked_tasks.c.identification_id,
+        ranked_tasks.c.formatted_category
+    ).filter(ranked_tasks.c.row_num == 1).all()
+    
+    return {row.identification_id: row for row in rows}
+
+
+def get_latest_formatted_categories(db: Session, identification_ids: List[int]) -> Dict[int, str]:
+    """批量获取每个认定最新一条带分类信息任务的格式化分类名称
+    
+    Returns:
+        {identification_id: formatted_category}
+    """
+    rows = _get_latest_tasks(
+        db,
+        identification_ids,
+        [WorkflowTask.formatted_category.isnot(None)],
+        (WorkflowTask.started_at.desc(), WorkflowTask.id.desc())
+    )
+    return {identification_id: row.formatted_category for identification_id, row in rows.items()}
+
+
+def get_initiator_names(db: Session, initiator_ids: List[Optional[int]]) -> Dict[int, str]:
+    """批量获取发起人姓名
+    
+    Returns:
+        {user_id: real_name}
+    """
+    initiator_ids = list({initiator_id for initiator_id in initiator_ids if initiator_id})
+    if not initiator_ids:
+        return {}
+    
+    rows = db.query(User.id, User.real_name).filter(User.id.in_(initiator_ids)).all()
+    return {row.id: row.real_name for row in rows}
 
 
 def initiator_name(db: Session, initiator_id: Optional[int]) -> str:
@@ -990,25 +871,22 @@ def initiator_name(db: Session, initiator_id: Optional[int]) -> str:
     return user.real_name if user else ""
 
 
-def query_tasks(db: Session, query_params: TaskQuery, status: str, user: Optional[User] = None, org_id: Optional[int] = None, restrict_to_assigned: bool = False) -> tuple[List[TaskListItem], int]:
-    """查询任务列表"""
+def query_tasks(db: Session, query_params: TaskQuery, status: str, user: Optional[User] = None, org_id: Optional[int] = None, restrict_to_assigned: bool = False, page: Optional[int] = None, page_size: Optional[int] = None) -> tuple[List[TaskListItem], int]:
+    """查询任务列表
+    
+    传入 page/page_size 时在数据库中分页，只加载当前页的记录；不传时返回全部记录。
+    """
     query = db.query(GreenIdentification, User).outerjoin(
         User, GreenIdentification.initiator_id == User.id
     ).filter(GreenIdentification.status == status)
     
-    # 如果限制只显示用户经办的已办结任务，添加子查询过滤
+    # 如果限制只显示用户经办的已办结任务，使用 EXISTS 子查询过滤（不再把 id 列表加载到内存）
     if restrict_to_assigned and user:
-        # 获取用户在工作流中有任务记录的所有identification_id
-        assigned_identification_ids = db.query(WorkflowTask.identification_id).filter(
+        assigned_task_exists = db.query(WorkflowTask.id).filter(
+            WorkflowTask.identification_id == GreenIdentification.id,
             WorkflowTask.assignee_id == user.id
-        ).distinct().all()
-        assigned_identification_ids = [id[0] for id in assigned_identification_ids]
-        
-        if assigned_identification_ids:
-            query = query.filter(GreenIdentification.id.in_(assigned_identification_ids))
-        else:
-            # 如果用户没有任何任务记录，返回空结果
-            return [], 0
+        ).exists()
+        query = query.filter(assigned_task_exists)
     
     if query_params.customer_name:
         query = query.filter(GreenIdentification.customer_name.like(f"%{query_params.customer_name}%"))
@@ -1049,33 +927,40 @@ def query_tasks(db: Session, query_params: TaskQuery, status: str, user: Optiona
     if org_id:
         query = query.filter(GreenIdentification.org_id == org_id)
     
+    # 只统计主键，避免 COUNT 外层包裹整行投影的子查询
+    total = query.with_entities(func.count(GreenIdentification.id)).scalar()
+    
     # 添加排序逻辑：按办结时间倒序，如果没有办结时间则按创建时间倒序
     if status == TaskStatus.ARCHIVED.value:
-        # MySQL不支持nulls_last()，使用CASE WHEN来模拟
-        from sqlalchemy import case
+        # MySQL 中 NULL 小于任何值，倒序时没有办结时间的记录自然排在最后，
+        # 直接按列排序即可使用 (status, completed_at, created_at) 索引，无需额外排序
         query = query.order_by(
-            case(
-                (GreenIdentification.completed_at == None, 1),
-                (GreenIdentification.completed_at != None, 0),
-                else_=2
-            ).asc(),
             GreenIdentification.completed_at.desc(),
             GreenIdentification.created_at.desc()
         )
     else:
         query = query.order_by(GreenIdentification.created_at.desc())
     
-    total = query.count()
+    if page is not None and page_size is not None:
+        query = query.offset((page - 1) * page_size).limit(page_size)
     
-    items = []
-    for identification, initiator in query.all():
-        # 获取该认定记录的最新已完成任务的绿色分类信息
-        latest_task = db.query(WorkflowTask).filter(
-            WorkflowTask.identification_id == identification.id,
+    rows = query.all()
+    
+    # 批量获取当前页每个认定记录的最新已完成任务的绿色分类信息
+    latest_tasks = _get_latest_tasks(
+        db,
+        [identification.id for identification, _ in rows],
+        [
             WorkflowTask.status == "已完成",
             WorkflowTask.formatted_category.isnot(None),
             WorkflowTask.formatted_category != ""
-        ).order_by(WorkflowTask.completed_at.desc()).first()
+        ],
+        (WorkflowTask.completed_at.desc(), WorkflowTask.id.desc())
+    )
+    
+    items = []
+    for identification, initiator in rows:
+        latest_task = latest_tasks.get(identification.id)
         
         # 如果最新的任务有分类信息，使用最新的；否则使用当前的 identification 信息
         if latest_task and latest_task.formatted_category:
@@ -1106,119 +991,12 @@ def query_tasks(db: Session, query_params: TaskQuery, status: str, user: Optiona
 
 
 def get_formatted_category(db: Session, identification: GreenIdentification) -> Optional[str]:
-    """获取格式化的带编号的分类名称"""
-    large = identification.project_category_large
-    medium = identification.project_category_medium
-    small = identification.project_category_small
-    
-    if not large and not medium and not small:
-        return None
-    
-    # 尝试匹配完整的三级分类
-    result = db.execute(text("""
-        SELECT formatted_name
-        FROM green_project_categories
-        WHERE large_name = :large AND medium_name = :medium AND small_name = :small
-        LIMIT 1
-    """), {"large": large, "medium": medium, "small": small}).fetchone()
-    
-    if result:
-        return result[0]
-    
-    # 如果没有找到三级分类，尝试匹配二级分类
-    result = db.execute(text("""
-        SELECT formatted_name
-        FROM green_project_categories
-        WHERE large_name = :large AND medium_name = :medium AND small_code IS NULL
-        LIMIT 1
-    """), {"large": large, "medium": medium}).fetchone()
-    
-    if result:
-        return result[0]
-    
-    # 如果还是没有，手动拼接带编号的格式
-    # 需要查找编号
-    large_code = None
-    medium_code = None
-    small_code = None
-    
-    if large:
-        result = db.execute(text("""
-            SELECT large_code
-            FROM green_project_categories
-            WHERE large_name = :large
-            ORDER BY large_code DESC
-            LIMIT 1
-        """), {"large": large}).fetchone()
-        if result:
-            large_code = result[0]
-    
-    if medium:
-        # 如果已经知道 large_code，在查询中添加过滤条件
-        if large_code:
-            result = db.execute(text("""
-                SELECT medium_code, large_code
-                FROM green_project_categories
-                WHERE large_name = :large AND medium_name = :medium AND large_code = :large_code
-                LIMIT 1
-            """), {"large": large, "medium": medium, "large_code": large_code}).fetchone()
-        else:
-            result = db.execute(text("""
-                SELECT medium_code, large_code
-                FROM green_project_categories
-                WHERE large_name = :large AND medium_name = :medium
-                ORDER BY large_code DESC, medium_code DESC
-                LIMIT 1
-            """), {"large": large, "medium": medium}).fetchone()
-        
-        if result:
-            medium_code = result[0]
-            # 如果之前没有large_code，使用查询到的large_code
-            if not large_code:
-                large_code = result[1]
-    
-    if small:
-        # 如果已经知道 large_code 和 medium_code，在查询中添加过滤条件
-        if large_code and medium_code:
-            result = db.execute(text("""
-                SELECT small_code, large_code, medium_code
-                FROM green_project_categories
-                WHERE large_name = :large AND medium_name = :medium AND small_name = :small
-                  AND large_code = :large_code AND medium_code = :medium_code
-                LIMIT 1
-            """), {"large": large, "medium": medium, "small": small, "large_code": large_code, "medium_code": medium_code}).fetchone()
-        else:
-            result = db.execute(text("""
-                SELECT small_code, large_code, medium_code
-                FROM green_project_categories
-                WHERE large_name = :large AND medium_name = :medium AND small_name = :small
-                ORDER BY large_code DESC, medium_code DESC, small_code DESC
-                LIMIT 1
-            """), {"large": large, "medium": medium, "small": small}).fetchone()
-        
-        if result:
-            small_code = result[0]
-            # 验证并更新large_code和medium_code以确保一致性
-            if result[1]:
-                large_code = result[1]
-            if result[2]:
-                medium_code = result[2]
-    
-    # 手动拼接带编号的格式
-    parts = []
-    if large_code and large:
-        parts.append(f"{large_code} {large}")
-    elif large:
-        parts.append(large)
+    """获取格式化的带编号的分类名称
     
-    if medium_code and medium:
-        parts.append(f"{medium_code} {medium}")
-    elif medium:
-        parts.append(medium)
-    
-    if small_code and small:
-        parts.append(f"{small_code} {small}")
-    elif small:
-        parts.append(small)
-    
-    return '/'.join(parts) if parts else None
\ No newline at end of file
+    从进程内的目录缓存中查找，不访问数据库（缓存过期时才重新加载目录）
+    """
+    return green_category_catalog.get(db).format(
+        identification.project_category_large,
+        identification.project_category_medium,
+        identification.project_category_small
+    )
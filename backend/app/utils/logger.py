@@ -1,9 +1,11 @@
 """
 日志记录工具函数
+日志通过日志写入队列批量写入数据库，调用方不等待数据库提交
 """
 from datetime import datetime
 from sqlalchemy.orm import Session
 from app.models.log import OperationLog, LoginLog, ExceptionLog
+from app.services.log_sink import log_sink
 
 
 def record_login_log(
@@ -58,7 +60,7 @@ def record_login_log(
             else:
                 device_type = device_type or 'Desktop'
         
-        login_log = LoginLog(
+        log_sink.submit(LoginLog, dict(
             user_name=user_name,
             user_account=user_account,
             ip_address=ip_address,
@@ -69,12 +71,35 @@ def record_login_log(
             login_time=datetime.now(),
             status=status,
             failure_reason=failure_reason
-        )
-        db.add(login_log)
-        db.commit()
+        ), db)
     except Exception as e:
         print(f"记录登录日志失败: {e}")
-        db.rollback()
+
+
+def operation_log_values(
+    user_account: str,
+    user_name: str,
+    operation_menu: str,
+    request_method: str = None,
+    request_url: str = None,
+    ip_address: str = None,
+    user_agent: str = None,
+    status_code: int = 200,
+    request_duration: float = None
+) -> dict:
+    """构建操作日志的字段值（操作时间取记录时刻，不取批量写入时刻）"""
+    return dict(
+        operation_time=datetime.now(),
+        operation_menu=operation_menu,
+        request_url=request_url,
+        operator_name=user_name,
+        operator_account=user_account,
+        request_method=request_method,
+        ip_address=ip_address,
+        user_agent=user_agent,
+        status_code=status_code,
+        request_duration=request_duration
+    )
 
 
 def record_operation_log(
@@ -92,21 +117,18 @@ def record_operation_log(
 ):
     """记录操作日志"""
     try:
-        operation_log = OperationLog(
+        log_sink.submit(OperationLog, operation_log_values(
+            user_account=user_account,
+            user_name=user_name,
             operation_menu=operation_menu,
-            request_url=request_url,
-            operator_name=user_name,
-            operator_account=user_account,
             request_method=request_method,
+            request_url=request_url,
             ip_address=ip_address,
             user_agent=user_agent,
             status_code=status_code
-        )
-        db.add(operation_log)
-        db.commit()
+        ), db)
     except Exception as e:
         print(f"记录操作日志失败: {e}")
-        db.rollback()
 
 
 def record_exception_log(
@@ -124,7 +146,8 @@ def record_exception_log(
 ):
     """记录异常日志"""
     try:
-        exception_log = ExceptionLog(
+        log_sink.submit(ExceptionLog, dict(
+            exception_time=datetime.now(),
             exception_module=exception_module,
             exception_type=exception_type,
             exception_message=exception_message,
@@ -135,9 +158,6 @@ def record_exception_log(
             user_name=user_name,
             user_account=user_account,
             ip_address=ip_address
-        )
-        db.add(exception_log)
-        db.commit()
+        ), db)
     except Exception as e:
-        print(f"记录异常日志失败: {e}")
-        db.rollback()
\ No newline at end of file
+        print(f"记录异常日志失败: {e}")
\ No newline at end of file
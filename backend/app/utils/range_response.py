@@ -0,0 +1,91 @@
+"""
+支持 HTTP Range 请求的文件下载响应
+"""
+import os
+from typing import Dict, Iterator, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+# 每次读取文件的块大小
+RANGE_CHUNK_SIZE = 64 * 1024
+
+
+def parse_range_header(range_header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """解析 Range 请求头，返回闭区间 (start, end)
+
+    只支持单个区间（bytes=start-end、bytes=start-、bytes=-suffix）；
+    格式不支持时返回 None（按完整文件响应），区间无法满足时抛出 ValueError
+    """
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+
+    start_text, sep, end_text = ranges.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else file_size - 1
+        else:
+            # bytes=-N：最后 N 个字节
+            suffix = int(end_text)
+            if suffix <= 0:
+                raise ValueError("无效的范围")
+            start = max(file_size - suffix, 0)
+            end = file_size - 1
+    except ValueError:
+        raise ValueError("无效的范围")
+
+    end = min(end, file_size - 1)
+    if start < 0 or start > end:
+        raise ValueError("无效的范围")
+    return start, end
+
+
+def _iter_file_range(file_path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def range_file_response(
+    request: Request,
+    file_path: str,
+    media_type: str,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """返回文件下载响应，带 Range 请求头时只返回请求的部分（206）"""
+    file_size = os.path.getsize(file_path)
+    headers = dict(headers or {})
+    headers["Accept-Ranges"] = "bytes"
+
+    range_header = request.headers.get("range")
+    if not range_header:
+        return FileResponse(file_path, media_type=media_type, headers=headers)
+
+    try:
+        byte_range = parse_range_header(range_header, file_size)
+    except ValueError:
+        headers["Content-Range"] = f"bytes */{file_size}"
+        return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        return FileResponse(file_path, media_type=media_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        _iter_file_range(file_path, start, end),
+        status_code=206,
+        media_type=media_type,
+        headers=headers
+    )
@@ -0,0 +1,122 @@
+"""
+数据库迁移脚本：为 workflow_tasks、green_identifications 添加复合覆盖索引
+索引定义见 app/models/green_finance.py 中的 __table_args__，本脚本为已有数据库补建这些索引：
+- workflow_tasks(assignee_id, status, started_at, id, identification_id)：待办/已办列表
+- workflow_tasks(identification_id, started_at, formatted_category)：工作流历史、最新分类
+- workflow_tasks(identification_id, status, completed_at, formatted_category)：最新已完成分类
+- workflow_tasks(workflow_instance_id, status, task_key)：撤回时查找任务
+- green_identifications(status, created_at)：任务列表分页
+- green_identifications(status, completed_at, created_at)：已归档列表分页
+
+使用 InnoDB 在线 DDL 添加（ALGORITHM=INPLACE, LOCK=NONE），建索引期间不阻塞读写；已存在的索引跳过。
+执行命令：python -m migrations.add_task_composite_indexes
+回滚命令：python -m migrations.add_task_composite_indexes --rollback
+"""
+
+import sys
+
+from sqlalchemy import text
+from app.database import SessionLocal
+from app.models.green_finance import GreenIdentification, WorkflowTask
+
+# 本次迁移添加的索引
+INDEX_NAMES = [
+    "ix_workflow_tasks_assignee_status_started",
+    "ix_workflow_tasks_ident_started_category",
+    "ix_workflow_tasks_ident_status_completed_category",
+    "ix_workflow_tasks_instance_status_key",
+    "ix_green_identifications_status_created",
+    "ix_green_identifications_status_completed",
+]
+
+
+def get_indexes():
+    """从模型中取出本次迁移的索引定义"""
+    indexes = {
+        index.name: index
+        for table in (WorkflowTask.__table__, GreenIdentification.__table__)
+        for index in table.indexes
+    }
+    return [indexes[name] for name in INDEX_NAMES]
+
+
+def index_exists(db, table_name: str, index_name: str) -> bool:
+    """检查索引是否已存在"""
+    result = db.execute(text("""
+        SELECT 1
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE()
+        AND table_name = :table_name
+        AND index_name = :index_name
+        LIMIT 1
+    """), {"table_name": table_name, "index_name": index_name})
+    return result.fetchone() is not None
+
+
+def migrate():
+    """执行数据库迁移"""
+    db = SessionLocal()
+
+    try:
+        print("开始迁移：添加 workflow_tasks、green_identifications 复合索引")
+
+        for index in get_indexes():
+            table_name = index.table.name
+            if index_exists(db, table_name, index.name):
+                print(f"⚠ {table_name}.{index.name} 已存在，跳过")
+                continue
+
+            columns = ", ".join(column.name for column in index.columns)
+            # DDL 会隐式提交，逐个执行
+            db.execute(text(f"""
+                ALTER TABLE {table_name}
+                ADD INDEX {index.name} ({columns}),
+                ALGORITHM=INPLACE, LOCK=NONE
+            """))
+            print(f"✓ 已添加索引 {table_name}.{index.name} ({columns})")
+
+        # 更新统计信息，让优化器尽快用上新索引
+        db.execute(text("ANALYZE TABLE workflow_tasks, green_identifications"))
+        db.commit()
+        print("\n✓ 迁移完成！")
+
+    except Exception as e:
+        db.rollback()
+        print(f"\n✗ 迁移失败: {e}")
+        raise
+    finally:
+        db.close()
+
+
+def rollback():
+    """回滚：删除本次迁移添加的索引"""
+    db = SessionLocal()
+
+    try:
+        print("开始回滚：删除 workflow_tasks、green_identifications 复合索引")
+
+        for index in reversed(get_indexes()):
+            table_name = index.table.name
+            if not index_exists(db, table_name, index.name):
+                print(f"⚠ {table_name}.{index.name} 不存在，跳过")
+                continue
+
+            db.execute(text(f"ALTER TABLE {table_name} DROP INDEX {index.name}"))
+            print(f"✓ 已删除索引 {table_name}.{index.name}")
+
+        db.commit()
+        print("\n✓ 回滚完成！")
+
+    except Exception as e:
+        db.rollback()
+        print(f"\n✗ 回滚失败: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    if "--rollback" in sys.argv:
+        rollback()
+    else:
+        migrate()
@@ -18,18 +18,19 @@ GREEN_IDENTIFICATION_BPMN = """<?xml version="1.0" encoding="UTF-8"?>
                  xmlns:bpmndi="http://www.omg.org/spec/BPMN/20100524/DI"
                  xmlns:dc="http://www.omg.org/spec/DD/20100524/DC"
                  xmlns:di="http://www.omg.org/spec/DD/20100524/DI"
+                 xmlns:gfms="http://gfms/schema/bpmn"
                  id="Definitions_1"
                  targetNamespace="http://bpmn.io/schema/bpmn">
   <bpmn:process id="green_identification_process" isExecutable="false">
     <bpmn:startEvent id="StartEvent_1" name="开始"/>
     <bpmn:sequenceFlow id="Flow_1" sourceRef="StartEvent_1" targetRef="Task_BranchManager"/>
-    <bpmn:userTask id="Task_BranchManager" name="支行客户经理"/>
+    <bpmn:userTask id="Task_BranchManager" name="支行客户经理" gfms:taskKey="manager_identification"/>
     <bpmn:sequenceFlow id="Flow_2" sourceRef="Task_BranchManager" targetRef="Task_SecondLevelManager"/>
-    <bpmn:userTask id="Task_SecondLevelManager" name="二级分行绿色金融管理岗"/>
+    <bpmn:userTask id="Task_SecondLevelManager" name="二级分行绿色金融管理岗" gfms:taskKey="branch_review"/>
     <bpmn:sequenceFlow id="Flow_3" sourceRef="Task_SecondLevelManager" targetRef="Task_FirstLevelManager"/>
-    <bpmn:userTask id="Task_FirstLevelManager" name="一级分行绿色金融管理岗"/>
+    <bpmn:userTask id="Task_FirstLevelManager" name="一级分行绿色金融管理岗" gfms:taskKey="first_approval"/>
     <bpmn:sequenceFlow id="Flow_4" sourceRef="Task_FirstLevelManager" targetRef="Task_FirstLevelReviewer"/>
-    <bpmn:userTask id="Task_FirstLevelReviewer" name="一级分行绿色金融复核岗"/>
+    <bpmn:userTask id="Task_FirstLevelReviewer" name="一级分行绿色金融复核岗" gfms:taskKey="final_review"/>
     <bpmn:sequenceFlow id="Flow_5" sourceRef="Task_FirstLevelReviewer" targetRef="EndEvent_1"/>
     <bpmn:endEvent id="EndEvent_1" name="结束"/>
   </bpmn:process>
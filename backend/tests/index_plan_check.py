@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+索引执行计划回归检查
+对 workflow_tasks、green_identifications 上的热点查询形状执行 EXPLAIN，检查：
+- 优化器选用的是预期的复合索引
+- 覆盖查询只读索引（Extra 包含 Using index），不回表
+- 排序由索引完成（Extra 不包含 Using filesort）
+
+需要先执行迁移 python -m migrations.add_task_composite_indexes，并且表中有一定数据量
+（数据太少时优化器可能直接全表扫描，见 generate_test_data.py）：
+    python3 tests/index_plan_check.py
+
+有查询不符合预期时以非 0 状态退出
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import text
+
+from app.database import SessionLocal
+
+# (说明, SQL, 预期索引, 是否要求只读索引)
+PLAN_CHECKS = [
+    (
+        "待办列表：办理人 + 状态，每个认定取最新任务",
+        """
+        SELECT id, identification_id, started_at FROM workflow_tasks
+        WHERE assignee_id = :assignee_id AND status = '待处理'
+        ORDER BY started_at DESC, id DESC
+        """,
+        "ix_workflow_tasks_assignee_status_started",
+        True,
+    ),
+    (
+        "已办列表：办理人 + 多个状态",
+        """
+        SELECT id, identification_id, started_at FROM workflow_tasks
+        WHERE assignee_id = :assignee_id AND status IN ('已完成', '已退回')
+        """,
+        "ix_workflow_tasks_assignee_status_started",
+        True,
+    ),
+    (
+        "工作流历史：认定下的任务按开始时间排序",
+        """
+        SELECT * FROM workflow_tasks
+        WHERE identification_id = :identification_id
+        ORDER BY started_at
+        """,
+        "ix_workflow_tasks_ident_started_category",
+        False,
+    ),
+    (
+        "最新带分类的任务（按开始时间）",
+        """
+        SELECT id, identification_id, formatted_category FROM workflow_tasks
+        WHERE identification_id = :identification_id AND formatted_category IS NOT NULL
+        ORDER BY started_at DESC, id DESC
+        """,
+        "ix_workflow_tasks_ident_started_category",
+        True,
+    ),
+    (
+        "最新已完成且带分类的任务（按完成时间）",
+        """
+        SELECT id, identification_id, formatted_category FROM workflow_tasks
+        WHERE identification_id = :identification_id AND status = '已完成'
+        AND formatted_category IS NOT NULL AND formatted_category != ''
+        ORDER BY completed_at DESC, id DESC
+        """,
+        "ix_workflow_tasks_ident_status_completed_category",
+        True,
+    ),
+    (
+        "撤回：按流程实例 + 状态 + 节点查找任务",
+        """
+        SELECT id FROM workflow_tasks
+        WHERE workflow_instance_id = :workflow_instance_id AND status = '待处理' AND task_key = :task_key
+        """,
+        "ix_workflow_tasks_instance_status_key",
+        True,
+    ),
+    (
+        "任务列表：按状态分页，创建时间倒序",
+        """
+        SELECT id FROM green_identifications
+        WHERE status = :status
+        ORDER BY created_at DESC
+        LIMIT 20
+        """,
+        "ix_green_identifications_status_created",
+        True,
+    ),
+    (
+        "已归档列表：按办结时间、创建时间倒序",
+        """
+        SELECT id FROM green_identifications
+        WHERE status = '办结'
+        ORDER BY completed_at DESC, created_at DESC
+        LIMIT 20
+        """,
+        "ix_green_identifications_status_completed",
+        True,
+    ),
+]
+
+
+def find_sample_params(db) -> dict:
+    """从数据库中取查询参数的样本值"""
+    row = db.execute(text("""
+        SELECT assignee_id, identification_id, workflow_instance_id, task_key
+        FROM workflow_tasks
+        WHERE status = '待处理' AND assignee_id IS NOT NULL
+        LIMIT 1
+    """)).fetchone()
+    if not row:
+        raise SystemExit("数据库中没有待处理任务，请先生成测试数据")
+    return {
+        "assignee_id": row[0],
+        "identification_id": row[1],
+        "workflow_instance_id": row[2],
+        "task_key": row[3],
+        "status": "办理中",
+    }
+
+
+def check_plan(db, sql: str, params: dict, expected_index: str, index_only: bool) -> list:
+    """执行 EXPLAIN，返回不符合预期的问题列表"""
+    rows = db.execute(text(f"EXPLAIN {sql}"), params).mappings().all()
+    plan = rows[0]
+    key = plan["key"]
+    extra = plan["Extra"] or ""
+    # 注意 Using index condition（索引条件下推）仍需回表，不算只读索引
+    extra_items = [item.strip() for item in extra.split(";")]
+
+    problems = []
+    if key != expected_index:
+        problems.append(f"使用索引 {key}，预期 {expected_index}")
+    if index_only and "Using index" not in extra_items:
+        problems.append(f"需要回表读取数据行（Extra: {extra}）")
+    if "Using filesort" in extra:
+        problems.append(f"需要额外排序（Extra: {extra}）")
+    return problems
+
+
+def main():
+    db = SessionLocal()
+    try:
+        params = find_sample_params(db)
+
+        print(f"{'='*50}")
+        print("索引执行计划回归检查")
+        print(f"{'='*50}")
+
+        failures = 0
+        for name, sql, expected_index, index_only in PLAN_CHECKS:
+            problems = check_plan(db, sql, params, expected_index, index_only)
+            if problems:
+                failures += 1
+                print(f"  ✗ {name}")
+                for problem in problems:
+                    print(f"      - {problem}")
+            else:
+                print(f"  ✓ {name}: {expected_index}{'（只读索引）' if index_only else ''}")
+    finally:
+        db.close()
+
+    print(f"\n{len(PLAN_CHECKS) - failures}/{len(PLAN_CHECKS)} 个查询符合预期")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
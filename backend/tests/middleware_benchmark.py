@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+中间件开销微基准测试
+不经过网络，通过 httpx 的 ASGITransport 直接调用 ASGI 应用，对比以下三种中间件栈每个请求的耗时：
+- 无中间件
+- 改造前的中间件（BaseHTTPMiddleware 实现的日志记录、速率限制、阻止不安全方法，原样复制在本文件中）
+- 当前的纯 ASGI 中间件
+
+三种中间件栈轮流测量多轮（每轮轮换顺序，抵消机器负载的漂移），报告每种的中位数和最小/最大值；
+请求轮流使用不同的客户端 IP，使两种速率限制器都工作在默认限额和正常的记录规模下：
+    python3 tests/middleware_benchmark.py
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.middleware.logging import LoggingMiddleware
+from app.middleware.rate_limit import RateLimitMiddleware, BlockUnsafeMethodsMiddleware
+
+NUM_REQUESTS = 2000  # 每轮每种中间件栈的请求数（GET、POST 各一半）
+ROUNDS = 10
+NUM_CLIENT_IPS = 4096  # 每个 IP 的请求数远低于默认的 100 次/分钟限额
+
+
+# ---------- 改造前的中间件（BaseHTTPMiddleware 实现，复制自改造前的 app/middleware） ----------
+
+class LegacyRateLimiter:
+    """改造前的滑动窗口速率限制器（每个键保存时间窗口内的请求时间列表）"""
+
+    def __init__(self, max_requests: int = 5, window_seconds: int = 60):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.requests: Dict[str, list] = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def is_allowed(self, key: str) -> bool:
+        current_time = time.time()
+
+        with self.lock:
+            request_times = self.requests[key]
+            request_times = [t for t in request_times if current_time - t < self.window_seconds]
+            self.requests[key] = request_times
+
+            if len(request_times) >= self.max_requests:
+                return False
+
+            request_times.append(current_time)
+            return True
+
+    def get_remaining_time(self, key: str) -> int:
+        current_time = time.time()
+
+        with self.lock:
+            request_times = self.requests[key]
+
+            if not request_times:
+                return 0
+
+            earliest_time = request_times[0]
+            remaining_time = int(self.window_seconds - (current_time - earliest_time))
+
+            return max(0, remaining_time)
+
+
+legacy_login_rate_limiter = LegacyRateLimiter(max_requests=5, window_seconds=60)
+legacy_api_rate_limiter = LegacyRateLimiter(max_requests=100, window_seconds=60)
+
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    """改造前的日志记录中间件（基准测试的请求不带令牌，不会写日志，省略 log_request）"""
+
+    EXCLUDE_PATHS = [
+        '/api/auth/login',
+        '/api/auth/captcha',
+        '/api/health',
+        '/api/dashboard',
+        '/api/logs',
+        '/docs',
+        '/openapi.json',
+    ]
+
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+
+        if self.should_log(request, response):
+            raise RuntimeError("基准测试的请求不应写操作日志")
+
+        return response
+
+    def should_log(self, request: Request, response) -> bool:
+        for exclude_path in self.EXCLUDE_PATHS:
+            if request.url.path.startswith(exclude_path):
+                return False
+
+        if response.status_code >= 400:
+            return False
+
+        auth_header = request.headers.get('authorization')
+        if not auth_header:
+            return False
+
+        if request.method not in ['POST', 'PUT', 'DELETE', 'PATCH']:
+            return False
+
+        return True
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    """改造前的速率限制中间件"""
+
+    async def dispatch(self, request: Request, call_next):
+        client_ip = request.client.host if request.client else "unknown"
+
+        if "/api/auth/login" in request.url.path:
+            if not legacy_login_rate_limiter.is_allowed(client_ip):
+                remaining_time = legacy_login_rate_limiter.get_remaining_time(client_ip)
+                return JSONResponse(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    content={
+                        "detail": "登录尝试次数过多，请稍后再试",
+                        "retry_after": remaining_time
+                    }
+                )
+
+        elif request.url.path.startswith("/api/"):
+            if not legacy_api_rate_limiter.is_allowed(client_ip):
+                remaining_time = legacy_api_rate_limiter.get_remaining_time(client_ip)
+                return JSONResponse(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    content={
+                        "detail": "请求频率过高，请稍后再试",
+                        "retry_after": remaining_time
+                    }
+                )
+
+        response = await call_next(request)
+
+        if "/api/auth/login" in request.url.path:
+            remaining = legacy_login_rate_limiter.get_remaining_time(client_ip)
+            if remaining > 0:
+                response.headers["X-RateLimit-Limit"] = str(legacy_login_rate_limiter.max_requests)
+                response.headers["X-RateLimit-Remaining"] = "0"
+                response.headers["X-RateLimit-Reset"] = str(int(time.time()) + remaining)
+            else:
+                with legacy_login_rate_limiter.lock:
+                    request_times = legacy_login_rate_limiter.requests[client_ip]
+                    response.headers["X-RateLimit-Limit"] = str(legacy_login_rate_limiter.max_requests)
+                    response.headers["X-RateLimit-Remaining"] = str(max(0, legacy_login_rate_limiter.max_requests - len(request_times)))
+                    response.headers["X-RateLimit-Reset"] = str(int(time.time()) + legacy_login_rate_limiter.window_seconds)
+
+        return response
+
+
+class LegacyBlockUnsafeMethodsMiddleware(BaseHTTPMiddleware):
+    """改造前的阻止不安全 HTTP 方法中间件"""
+
+    async def dispatch(self, request: Request, call_next):
+        if request.method.upper() == "TRACE":
+            return JSONResponse(
+                status_code=status.HTTP_405_METHOD_NOT_ALLOWED,
+                content={
+                    "detail": f"Method '{request.method}' not allowed"
+                }
+            )
+
+        return await call_next(request)
+
+
+# ---------- 基准测试 ----------
+
+async def endpoint(request):
+    return PlainTextResponse("ok")
+
+
+class RotateClientIP:
+    """每个请求使用不同的客户端 IP（在所有中间件之外，三种中间件栈的额外开销相同）"""
+
+    def __init__(self, app):
+        self.app = app
+        self.counter = 0
+
+    async def __call__(self, scope, receive, send):
+        self.counter += 1
+        n = self.counter % NUM_CLIENT_IPS
+        scope["client"] = (f"10.0.{n // 256}.{n % 256}", 50000)
+        await self.app(scope, receive, send)
+
+
+def build_app(middlewares):
+    """按 main.py 的顺序添加中间件（后添加的在外层）"""
+    app = Starlette(routes=[Route("/api/bench", endpoint, methods=["GET", "POST"])])
+    for middleware in middlewares:
+        app.add_middleware(middleware)
+    return RotateClientIP(app)
+
+
+async def measure(client: httpx.AsyncClient, num_requests: int) -> float:
+    """返回每个请求的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for i in range(num_requests):
+        if i % 2:
+            response = await client.post("/api/bench")
+        else:
+            response = await client.get("/api/bench")
+        if response.status_code != 200:
+            raise RuntimeError(f"基准测试请求返回 {response.status_code}")
+    return (time.perf_counter() - start) / num_requests * 1_000_000
+
+
+async def main():
+    stacks = {
+        "无中间件": [],
+        "BaseHTTPMiddleware（改造前）": [LegacyLoggingMiddleware, LegacyRateLimitMiddleware, LegacyBlockUnsafeMethodsMiddleware],
+        "纯 ASGI 中间件（当前）": [LoggingMiddleware, RateLimitMiddleware, BlockUnsafeMethodsMiddleware],
+    }
+    names = list(stacks)
+
+    print(f"{'='*50}")
+    print(f"中间件开销微基准测试 - {ROUNDS} 轮，每轮每种 {NUM_REQUESTS} 请求")
+    print(f"{'='*50}")
+
+    clients = {
+        name: httpx.AsyncClient(transport=httpx.ASGITransport(app=build_app(middlewares)), base_url="http://testserver")
+        for name, middlewares in stacks.items()
+    }
+    results = {name: [] for name in names}
+    try:
+        for client in clients.values():
+            await measure(client, 200)
+
+        for round_index in range(ROUNDS):
+            shift = round_index % len(names)
+            for name in names[shift:] + names[:shift]:
+                results[name].append(await measure(clients[name], NUM_REQUESTS))
+    finally:
+        for client in clients.values():
+            await client.aclose()
+
+    medians = {name: statistics.median(samples) for name, samples in results.items()}
+    baseline = medians["无中间件"]
+    for name in names:
+        samples = results[name]
+        print(
+            f"  {name}: 中位数 {medians[name]:.1f} us/请求（{min(samples):.1f} ~ {max(samples):.1f}），"
+            f"中间件开销 {medians[name] - baseline:.1f} us"
+        )
+
+    before, after = names[1], names[2]
+    # 逐轮比较（同一轮内测量时间相邻，受负载漂移影响较小）
+    saved = [b - a for b, a in zip(results[before], results[after])]
+    print(
+        f"\n  改造后每个请求减少 {statistics.median(saved):.1f} us"
+        f"（逐轮差值 {min(saved):.1f} ~ {max(saved):.1f}，"
+        f"{sum(1 for s in saved if s > 0)}/{ROUNDS} 轮改造后更快）"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
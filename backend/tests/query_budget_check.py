@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+SQL 查询预算检查
+不经过网络，通过 httpx 的 ASGITransport 直接调用应用，逐个请求主要的列表和详情接口，检查每个请求中同一形状的 SQL 执行次数是否超出预算（即是否存在循环中逐条查询的 N+1 问题）
+
+使用配置中的数据库（需要已有测试数据，见 generate_test_data.py），以指定用户身份请求：
+    python3 tests/query_budget_check.py [用户名]
+
+有接口超出预算时以非 0 状态退出，可用于提交前检查
+"""
+
+import asyncio
+import os
+import sys
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import text
+
+from app.database import SessionLocal
+from app.main import app
+from app.services.auth import create_access_token
+from app.services.query_budget import QueryBudget, QueryBudgetExceeded
+
+USERNAME = sys.argv[1] if len(sys.argv) > 1 else "admin"
+PAGE_SIZE = 50
+
+# 同一形状的 SQL 在一个请求中最多执行的次数（与分页大小无关，超出即视为 N+1）
+MAX_REPEATS = 3
+
+# (接口, 路径模板)，路径中的参数取自数据库中任务最多的认定记录
+ENDPOINTS = [
+    ("待办任务列表", f"/api/tasks/pending?page_size={PAGE_SIZE}"),
+    ("已办任务列表", f"/api/tasks/completed?page_size={PAGE_SIZE}"),
+    ("已归档任务列表", f"/api/tasks/archived?page_size={PAGE_SIZE}"),
+    ("综合查询", f"/api/tasks/search?page_size={PAGE_SIZE}"),
+    ("综合查询（列表视图）", f"/api/tasks/search?page_size={PAGE_SIZE}&include_history=false"),
+    ("任务详情", "/api/tasks/{task_id}"),
+    ("工作流历史", "/api/identifications/{identification_id}/workflow"),
+    ("工作流实例列表", f"/api/workflow-instances?page_size={PAGE_SIZE}"),
+    ("工作流实例任务", "/api/workflow-instances/{instance_id}/tasks"),
+]
+
+
+def find_sample_ids() -> dict:
+    """取任务最多的认定记录作为详情类接口的样本"""
+    db = SessionLocal()
+    try:
+        row = db.execute(text("""
+            SELECT identification_id, MAX(workflow_instance_id), MAX(id)
+            FROM workflow_tasks
+            WHERE identification_id IS NOT NULL
+            GROUP BY identification_id
+            ORDER BY COUNT(*) DESC
+            LIMIT 1
+        """)).fetchone()
+    finally:
+        db.close()
+    if not row:
+        raise SystemExit("数据库中没有工作流任务，请先生成测试数据")
+    return {"identification_id": row[0], "instance_id": row[1], "task_id": row[2]}
+
+
+async def check_endpoints(client: httpx.AsyncClient, headers: dict, sample_ids: dict) -> int:
+    """逐个检查接口，返回未通过的接口数
+
+    请求与预算在同一上下文中执行，线程池和 run_sync 中执行的 SQL 也会计入预算
+    """
+    failures = 0
+    for name, path in ENDPOINTS:
+        url = path.format(**sample_ids)
+        budget = QueryBudget(max_repeats=MAX_REPEATS, name=f"{name}（GET {url}）")
+        try:
+            with budget:
+                response = await client.get(url, headers=headers)
+        except QueryBudgetExceeded as e:
+            failures += 1
+            print(f"  ✗ {e}")
+            continue
+        if response.status_code != 200:
+            failures += 1
+            print(f"  ✗ {name}（GET {url}）返回 {response.status_code}: {response.text[:200]}")
+            continue
+        print(f"  ✓ {name}: {budget.total} 条 SQL，{len(budget.counts)} 种形状")
+    return failures
+
+
+async def main():
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': USERNAME})}"}
+    sample_ids = find_sample_ids()
+
+    print(f"{'='*50}")
+    print(f"SQL 查询预算检查 - 用户 {USERNAME}，同一形状 SQL 上限 {MAX_REPEATS} 次")
+    print(f"{'='*50}")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        failures = await check_endpoints(client, headers, sample_ids)
+
+    print(f"\n{len(ENDPOINTS) - failures}/{len(ENDPOINTS)} 个接口通过")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
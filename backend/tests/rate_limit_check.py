@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+速率限制语义检查
+使用可注入的时钟驱动 RateLimiter（不需要真实等待，也不需要数据库），检查令牌桶的精确限额语义：
+- 新键恰好允许 max_requests 次请求，之后拒绝
+- 每隔 window_seconds / max_requests 秒补充一个令牌（登录接口为 12 秒），补充前仍然拒绝
+- 边界上的 get_remaining / get_remaining_time（即响应中的 retry_after）取值
+- 空闲键的清理和每个分片的键数上限
+进程内存储和多进程共享存储各检查一遍：
+    python3 tests/rate_limit_check.py
+
+有检查不通过时以非 0 状态退出
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.middleware.rate_limit import RateLimiter
+from app.middleware.rate_limit_backend import MemoryRateLimitBackend, SharedMemoryRateLimitBackend
+
+# 与 login_rate_limiter 相同的配置：5 次/分钟，每 12 秒补充一个令牌
+MAX_REQUESTS = 5
+WINDOW_SECONDS = 60
+REFILL_SECONDS = WINDOW_SECONDS / MAX_REQUESTS
+
+
+class FakeClock:
+    """手动推进的时钟"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+failures = 0
+
+
+def check(name: str, actual, expected):
+    global failures
+    if actual == expected:
+        print(f"  ✓ {name}: {actual}")
+    else:
+        failures += 1
+        print(f"  ✗ {name}: {actual}，预期 {expected}")
+
+
+def check_limit_semantics(backend):
+    """限额、补充速度和边界取值"""
+    clock = FakeClock()
+    limiter = RateLimiter(max_requests=MAX_REQUESTS, window_seconds=WINDOW_SECONDS, name="login", backend=backend, clock=clock)
+    key = "10.0.0.1"
+
+    check("新键剩余次数", limiter.get_remaining(key), MAX_REQUESTS)
+    check("新键重试等待", limiter.get_remaining_time(key), 0)
+
+    allowed = [limiter.is_allowed(key) for _ in range(MAX_REQUESTS)]
+    check(f"同一时刻连续 {MAX_REQUESTS} 次请求", allowed, [True] * MAX_REQUESTS)
+    check("用完后剩余次数", limiter.get_remaining(key), 0)
+    check("用完后重试等待", limiter.get_remaining_time(key), REFILL_SECONDS)
+    check(f"第 {MAX_REQUESTS + 1} 次请求", limiter.is_allowed(key), False)
+    # 被拒绝的请求不消耗令牌，也不推迟补充
+    check("拒绝后重试等待不变", limiter.get_remaining_time(key), REFILL_SECONDS)
+
+    clock.advance(REFILL_SECONDS - 0.1)
+    check(f"{REFILL_SECONDS - 0.1:g} 秒后（补充前）请求", limiter.is_allowed(key), False)
+    check(f"{REFILL_SECONDS - 0.1:g} 秒后重试等待（向上取整）", limiter.get_remaining_time(key), 1)
+
+    clock.advance(0.1)
+    check(f"{REFILL_SECONDS:g} 秒后剩余次数", limiter.get_remaining(key), 1)
+    check(f"{REFILL_SECONDS:g} 秒后重试等待", limiter.get_remaining_time(key), 0)
+    check(f"{REFILL_SECONDS:g} 秒后请求（补充了一个令牌）", limiter.is_allowed(key), True)
+    check("再次请求", limiter.is_allowed(key), False)
+
+    clock.advance(REFILL_SECONDS * 2)
+    check(f"再过 {REFILL_SECONDS * 2:g} 秒剩余次数", limiter.get_remaining(key), 2)
+
+    clock.advance(WINDOW_SECONDS * 10)
+    check("长时间空闲后剩余次数（不超过桶容量）", limiter.get_remaining(key), MAX_REQUESTS)
+    allowed = [limiter.is_allowed(key) for _ in range(MAX_REQUESTS + 1)]
+    check("长时间空闲后连续请求", allowed, [True] * MAX_REQUESTS + [False])
+
+    # 不同限制键、不同限制器互不影响
+    check("其他限制键", limiter.is_allowed("10.0.0.2"), True)
+    other = RateLimiter(max_requests=MAX_REQUESTS, window_seconds=WINDOW_SECONDS, name="api", backend=backend, clock=clock)
+    check("共用存储的其他限制器", other.get_remaining(key), MAX_REQUESTS)
+
+
+def check_memory_eviction():
+    """进程内存储的空闲键清理和键数上限"""
+    clock = FakeClock()
+    max_keys = 10
+    backend = MemoryRateLimitBackend(shards=1, max_keys=max_keys)
+    limiter = RateLimiter(max_requests=MAX_REQUESTS, window_seconds=WINDOW_SECONDS, name="login", backend=backend, clock=clock)
+
+    for i in range(max_keys * 3):
+        limiter.is_allowed(f"10.0.1.{i}")
+    check(f"同一时刻写入 {max_keys * 3} 个键后保存的键数（上限 {max_keys}）", len(backend), max_keys)
+    check("被淘汰的最久未访问的键恢复为满桶", limiter.get_remaining("10.0.1.0"), MAX_REQUESTS)
+    check("最近访问的键仍保留状态", limiter.get_remaining(f"10.0.1.{max_keys * 3 - 1}"), MAX_REQUESTS - 1)
+
+    clock.advance(WINDOW_SECONDS - 1)
+    limiter.is_allowed("10.0.2.1")
+    check("空闲未满一个窗口时不清理", len(backend), max_keys)
+
+    clock.advance(1)
+    limiter.is_allowed("10.0.2.2")
+    check("空闲满一个窗口的键在访问时清理", len(backend), 2)
+
+    sharded = MemoryRateLimitBackend(shards=4, max_keys=40)
+    limiter = RateLimiter(max_requests=MAX_REQUESTS, window_seconds=WINDOW_SECONDS, name="login", backend=sharded, clock=clock)
+    for i in range(1000):
+        limiter.is_allowed(f"10.1.{i // 256}.{i % 256}")
+    check("分片存储写入 1000 个键后不超过总上限", len(sharded) <= 40, True)
+
+
+def main():
+    print(f"{'='*50}")
+    print(f"速率限制语义检查 - {MAX_REQUESTS} 次 / {WINDOW_SECONDS} 秒")
+    print(f"{'='*50}")
+
+    print("\n进程内存储：")
+    check_limit_semantics(MemoryRateLimitBackend())
+    check_memory_eviction()
+
+    if os.name == "posix":
+        print("\n多进程共享存储：")
+        with tempfile.TemporaryDirectory() as directory:
+            check_limit_semantics(SharedMemoryRateLimitBackend(os.path.join(directory, "rate_limit.bin"), slots=1024))
+
+    print(f"\n{'全部通过' if not failures else f'{failures} 项检查未通过'}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+run_sync 并发检查
+异步接口通过 AsyncSession.run_sync 复用同步实现时，同步代码中的数据库加载会让出事件循环；
+此时若进程内缓存持有线程锁加载数据，同一事件循环上的其他请求会阻塞在加锁处，整个进程死锁。
+本脚本清空相关缓存后并发请求这些接口，检查在缓存冷启动时全部请求都能按时返回
+
+使用配置中的数据库（需要已有测试数据，见 generate_test_data.py），以指定用户身份请求：
+    python3 tests/run_sync_concurrency_check.py [用户名]
+
+有请求超时或失败时以非 0 状态退出
+"""
+
+import asyncio
+import os
+import sys
+import threading
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import text
+
+from app.database import SessionLocal
+from app.main import app
+from app.services.auth import create_access_token
+from app.services.green_category import green_category_catalog
+from app.services.org_tree import org_tree_cache
+from app.services.process_model import process_model_cache
+from app.services.task_detail import task_detail_cache
+
+USERNAME = sys.argv[1] if len(sys.argv) > 1 else "admin"
+CONCURRENCY = 8
+TIMEOUT_SECONDS = 30
+
+# 通过 run_sync 执行同步实现的接口
+ENDPOINTS = [
+    ("首页统计", "/api/dashboard"),
+    ("待办任务列表", "/api/tasks/pending"),
+    ("任务详情", "/api/tasks/{task_id}"),
+]
+
+
+def find_sample_task_id() -> int:
+    db = SessionLocal()
+    try:
+        row = db.execute(text("SELECT MAX(id) FROM workflow_tasks")).fetchone()
+    finally:
+        db.close()
+    if not row or row[0] is None:
+        raise SystemExit("数据库中没有工作流任务，请先生成测试数据")
+    return row[0]
+
+
+def clear_caches():
+    """清空 run_sync 路径上会用到的进程内缓存，使并发请求同时触发加载"""
+    green_category_catalog.invalidate()
+    org_tree_cache.invalidate()
+    process_model_cache.invalidate()
+    task_detail_cache.invalidate()
+
+
+def watchdog_timeout(name: str, url: str):
+    print(f"  ✗ {name}（GET {url}）: {CONCURRENCY} 个并发请求 {TIMEOUT_SECONDS} 秒内未返回，疑似死锁")
+    os._exit(1)
+
+
+async def check_endpoint(client: httpx.AsyncClient, headers: dict, name: str, url: str) -> bool:
+    clear_caches()
+    # 死锁时事件循环线程被阻塞，asyncio 的超时不会触发，由独立线程计时
+    watchdog = threading.Timer(TIMEOUT_SECONDS, watchdog_timeout, args=(name, url))
+    watchdog.start()
+    try:
+        responses = await asyncio.gather(*[client.get(url, headers=headers) for _ in range(CONCURRENCY)])
+    finally:
+        watchdog.cancel()
+    failed = [r for r in responses if r.status_code != 200]
+    if failed:
+        print(f"  ✗ {name}（GET {url}）返回 {failed[0].status_code}: {failed[0].text[:200]}")
+        return False
+    print(f"  ✓ {name}: {CONCURRENCY} 个并发请求全部返回")
+    return True
+
+
+async def main():
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': USERNAME})}"}
+    task_id = find_sample_task_id()
+
+    print(f"{'='*50}")
+    print(f"run_sync 并发检查 - 用户 {USERNAME}，并发 {CONCURRENCY}")
+    print(f"{'='*50}")
+
+    failures = 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        for name, path in ENDPOINTS:
+            if not await check_endpoint(client, headers, name, path.format(task_id=task_id)):
+                failures += 1
+
+    print(f"\n{len(ENDPOINTS) - failures}/{len(ENDPOINTS)} 个接口通过")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
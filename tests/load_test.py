@@ -5,6 +5,7 @@
 """
 
 import requests
+import sys
 import time
 import threading
 import statistics
@@ -14,6 +15,13 @@ BASE_URL = "http://localhost:8000"
 USERNAME = "tyyzy"
 PASSWORD = "123456"
 
+def percentile(times, p):
+    """计算第 p 百分位数"""
+    if len(times) < 100:
+        return max(times)
+    return statistics.quantiles(times, n=100)[p - 1]
+
+
 class LoadTester:
     def __init__(self):
         self.token = None
@@ -199,6 +207,166 @@ class LoadTester:
         self.results['online_report'] = times
         self.print_stats('在线报表接口', times, errors, num_requests, total_time)
 
+    def _measure_p99(self, path, num_requests, concurrency):
+        """并发请求指定接口，返回 (P99 响应时间, 成功数, 失败状态码分布)
+
+        只统计 200 响应的耗时：被限流（429）等快速拒绝的响应会拉低 P99，不能反映接口本身的耗时
+        """
+        times = []
+        failures = {}
+        lock = threading.Lock()
+
+        def worker():
+            for i in range(num_requests // concurrency):
+                start = time.time()
+                try:
+                    response = requests.get(
+                        f"{BASE_URL}{path}",
+                        headers={"Authorization": f"Bearer {self.token}"},
+                        timeout=30
+                    )
+                    elapsed = (time.time() - start) * 1000
+                    code = response.status_code
+                except Exception as e:
+                    code = 'error'
+                with lock:
+                    if code == 200:
+                        times.append(elapsed)
+                    else:
+                        failures[code] = failures.get(code, 0) + 1
+
+        threads = [threading.Thread(target=worker) for i in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return (percentile(times, 99) if times else None), len(times), failures
+
+    def test_login_storm(self, num_requests=200, concurrency=10, login_concurrency=20):
+        """登录风暴测试：对比登录高峰期间其他接口的 P99 响应时间
+
+        先测量工作台和待办任务接口的基线 P99，再在持续并发登录的同时重复测量。
+        登录和 API 接口有按 IP 的限流，压测时所有请求来自同一 IP，需要先调高服务端限额，
+        否则大部分请求会被 429 拒绝，测不到 bcrypt 的开销：
+            RATE_LIMIT_LOGIN_PER_MINUTE=100000 RATE_LIMIT_API_PER_MINUTE=100000 uvicorn app.main:app
+        """
+        print(f"\n{'='*50}")
+        print(f"登录风暴测试 - {login_concurrency} 个并发登录")
+        print(f"{'='*50}")
+
+        paths = {
+            '工作台接口': "/api/dashboard",
+            '待办任务接口': "/api/tasks/pending?page=1&page_size=10",
+        }
+
+        baseline = {name: self._measure_p99(path, num_requests, concurrency) for name, path in paths.items()}
+
+        stop = threading.Event()
+        login_status = {}
+        login_lock = threading.Lock()
+
+        def login_worker():
+            while not stop.is_set():
+                try:
+                    response = requests.post(
+                        f"{BASE_URL}/api/auth/login",
+                        json={"username": USERNAME, "password": PASSWORD},
+                        timeout=30
+                    )
+                    code = response.status_code
+                except Exception as e:
+                    code = 'error'
+                with login_lock:
+                    login_status[code] = login_status.get(code, 0) + 1
+
+        login_threads = [threading.Thread(target=login_worker) for i in range(login_concurrency)]
+        for t in login_threads:
+            t.start()
+        time.sleep(1)  # 等待登录请求堆积
+
+        try:
+            storm_start = time.time()
+            storm = {name: self._measure_p99(path, num_requests, concurrency) for name, path in paths.items()}
+            storm_time = time.time() - storm_start
+        finally:
+            stop.set()
+            for t in login_threads:
+                t.join()
+
+        # 200（登录成功）和 401（密码错误）都执行了 bcrypt 校验；429（限流）、503（登录线程池排队已满）没有
+        bcrypt_logins = login_status.get(200, 0) + login_status.get(401, 0)
+        total_logins = sum(login_status.values())
+
+        print(f"✓ 登录风暴测试结果:")
+        print(f"  登录请求状态码分布: {login_status}")
+        print(f"  执行了 bcrypt 校验的登录: {bcrypt_logins}/{total_logins}（测量期间约 {bcrypt_logins / storm_time:.1f} 次/秒）")
+        if total_logins and bcrypt_logins < total_logins / 2:
+            print(f"  ⚠ 大部分登录请求未执行 bcrypt 校验，结果不能反映登录高峰的影响（检查服务端限流配置）")
+        for name in paths:
+            base_p99, base_ok, base_failures = baseline[name]
+            storm_p99, storm_ok, storm_failures = storm[name]
+            if base_p99 is None or storm_p99 is None:
+                print(f"  {name}: 无成功响应（失败 基线 {base_failures}，登录风暴 {storm_failures}）")
+                continue
+            print(
+                f"  {name}: 基线 P99 {base_p99:.2f} ms（成功 {base_ok}，失败 {base_failures or 0}），"
+                f"登录风暴 P99 {storm_p99:.2f} ms（成功 {storm_ok}，失败 {storm_failures or 0}），"
+                f"变化 {storm_p99 / base_p99:.2f} 倍"
+            )
+
+    def test_throughput(self, num_requests=200, concurrency_levels=(1, 10, 50)):
+        """吞吐量测试：对比不同并发数下的 RPS
+
+        接口在事件循环上执行阻塞的数据库查询时，提高并发数 RPS 基本不变；
+        数据库查询在线程池中执行时，RPS 应随并发数提高（直到数据库连接池饱和）
+        """
+        print(f"\n{'='*50}")
+        print(f"吞吐量测试 - {num_requests} 请求, 并发数 {list(concurrency_levels)}")
+        print(f"{'='*50}")
+
+        paths = {
+            '工作台接口': "/api/dashboard",
+            '待办任务接口': "/api/tasks/pending?page=1&page_size=10",
+        }
+
+        for name, path in paths.items():
+            base_rps = None
+            for concurrency in concurrency_levels:
+                count = 0
+                errors = 0
+                lock = threading.Lock()
+
+                def worker():
+                    nonlocal count, errors
+                    for i in range(num_requests // concurrency):
+                        try:
+                            response = requests.get(
+                                f"{BASE_URL}{path}",
+                                headers={"Authorization": f"Bearer {self.token}"},
+                                timeout=30
+                            )
+                            ok = response.status_code == 200
+                        except Exception as e:
+                            ok = False
+                        with lock:
+                            count += 1
+                            if not ok:
+                                errors += 1
+
+                threads = [threading.Thread(target=worker) for i in range(concurrency)]
+                start_time = time.time()
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                total_time = time.time() - start_time
+
+                rps = count / total_time if total_time > 0 else 0
+                if base_rps is None:
+                    base_rps = rps
+                speedup = rps / base_rps if base_rps else 0
+                print(f"  {name} 并发 {concurrency}: RPS {rps:.2f}（失败 {errors}），相对并发 1 提升 {speedup:.2f} 倍")
+
     def print_stats(self, name, times, errors, total_requests, total_time=None):
         """打印统计信息"""
         if not times:
@@ -211,6 +379,7 @@ class LoadTester:
         min_time = min(times)
         max_time = max(times)
         p95_time = statistics.quantiles(times, n=20)[18] if len(times) >= 20 else max_time
+        p99_time = percentile(times, 99)
 
         print(f"✓ {name} 结果:")
         print(f"  总请求数: {total_requests}")
@@ -222,14 +391,18 @@ class LoadTester:
         print(f"  最小响应时间: {min_time:.2f} ms")
         print(f"  最大响应时间: {max_time:.2f} ms")
         print(f"  P95 响应时间: {p95_time:.2f} ms")
+        print(f"  P99 响应时间: {p99_time:.2f} ms")
 
         if total_time:
             rps = (total_requests / total_time) * 1000
             print(f"  总耗时: {total_time:.2f} ms")
             print(f"  RPS (每秒请求数): {rps:.2f}")
 
-    def run_all_tests(self):
-        """运行所有测试"""
+    def run_all_tests(self, login_storm=False):
+        """运行所有测试
+
+        登录风暴测试会持续并发登录，需要调高服务端限流配置，只在显式指定 --login-storm 时执行
+        """
         print(f"\n{'#'*50}")
         print(f"# 绿色金融管理系统压力测试")
         print(f"# 测试时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -245,6 +418,9 @@ class LoadTester:
         self.test_dashboard(num_requests=100, concurrency=10)
         self.test_pending_tasks(num_requests=100, concurrency=10)
         self.test_online_report(num_requests=50, concurrency=5)
+        self.test_throughput(num_requests=200, concurrency_levels=(1, 10, 50))
+        if login_storm:
+            self.test_login_storm(num_requests=200, concurrency=10, login_concurrency=20)
 
         # 汇总报告
         print(f"\n{'='*50}")
@@ -256,4 +432,4 @@ class LoadTester:
 
 if __name__ == "__main__":
     tester = LoadTester()
-    tester.run_all_tests()
\ No newline at end of file
+    tester.run_all_tests(login_storm="--login-storm" in sys.argv)
\ No newline at end of file